@@ -0,0 +1,256 @@
+# Own
+import mHLTVAPI
+from csgoDB import DB
+from MinerPipeline import MinerPipeline
+from FixtureServer import FIXTUREDIR, ServeFixtures
+from ParseBenchmark import LoadFixtures, RunParseBenchmark, RunExtractBenchmark, CheckExtractors
+from Records import MatchRecord, MapRecord
+import RateLimiter
+import HLTVCache
+import LogConfig
+
+# Standard
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import tempfile
+import time
+
+'''
+Benchmark suite, results are written as JSON for tracking regressions.
+-parse:  parse throughput per page type over fixture pages, for every parser configuration
+-insert: csgoDB insert throughput of synthetic matches, batched and one map at a time
+-query:  latency of DB Get*ByID queries with 10k and 100k synthetic maps
+-miner:  end-to-end MinerPipeline throughput against FixtureServer serving fixture pages
+Committed fixtures are synthetic, real pages are recorded with: python FixtureServer.py corpus fixtures
+Usage:
+python Benchmarks.py [--fixtures dir] [--sizes 10000 100000] [--output bench.json] [--only parse insert query miner]
+'''
+
+SIZES   = [10000, 100000]  # Maps in query benchmark databases
+QUERIES = 1000             # Queries timed per query function
+TEAMS   = 200              # Teams in synthetic data, 5 fixed players each
+MAPNAMES = ["Mirage", "Inferno", "Nuke", "Overpass", "Dust2", "Train", "Vertigo"]
+
+# Build synthetic match with maps in GetMatch result form
+# Parameters:
+# matchID : matchID, (int)
+# mapID   : first mapID of match, (int)
+# rng     : random source, (random.Random)
+#
+# Returns: MatchRecord
+def SyntheticMatch(matchID, mapID, rng):
+	t1, t2 = rng.sample(range(0, TEAMS), 2)
+	maps = []
+	for i in range(0, rng.choice((1, 2, 3))):
+		values = [mapID + i, rng.choice(MAPNAMES), "team{}".format(t1), "team{}".format(t2),
+			rng.randint(3, 12), rng.randint(3, 12), rng.randint(2, 8), rng.randint(2, 8), 0, 0, rng.choice(("ct", "t"))]
+		for p in range(0, 10):
+			team = t1 if p < 5 else t2
+			values += ["team{}_p{}".format(team, p % 5), rng.randint(5, 30), rng.randint(0, 10), rng.randint(5, 25),
+				round(rng.uniform(40, 120), 1), rng.randint(0, 15), rng.randint(0, 4), rng.randint(-4, 4), round(rng.uniform(0.4, 1.8), 2)]
+		maps.append(MapRecord(values=values))
+	day = datetime.datetime(2015, 1, 1) + datetime.timedelta(minutes=matchID * 37)
+	return MatchRecord(matchID, day.strftime("%Y-%m-%d %H:%M"), "event{}".format(matchID % 50), maps)
+
+# Generate synthetic matches until amount of maps is reached
+# Returns: list of GetMatch results
+def SyntheticMatches(maps, seed=1):
+	rng = random.Random(seed)
+	matches = []
+	matchID = 1
+	mapID = 1
+	while mapID <= maps:
+		match = SyntheticMatch(matchID, mapID, rng)
+		matches.append(match)
+		matchID += 1
+		mapID += len(match.maps)
+	return matches
+
+# Summary of latency samples in microseconds
+def latencyStats(samples):
+	samples = sorted(samples)
+	n = len(samples)
+	return {
+		"mean_us": sum(samples) / n * 1e6,
+		"p50_us": samples[n // 2] * 1e6,
+		"p95_us": samples[min(n - 1, int(n * 0.95))] * 1e6,
+		"max_us": samples[-1] * 1e6,
+	}
+
+# Parse throughput of every page kind in fixtures
+def BenchParse(fixtureDir, repeats=5):
+	return {
+		"pages": {k: len(v) for k, v in LoadFixtures(fixtureDir).items()},
+		"pages_per_sec": RunParseBenchmark(fixtureDir, repeats),
+		"mapstats_extract_pages_per_sec": RunExtractBenchmark(fixtureDir, repeats * 4),
+		"mapstats_extract_mismatches": CheckExtractors(fixtureDir),
+	}
+
+# Insert throughput of batched and single map inserts
+# Parameters:
+# workDir : directory for benchmark databases, (str)
+# maps    : amount of maps inserted, (int)
+def BenchInsert(workDir, maps=5000):
+	matches = SyntheticMatches(maps)
+	nmaps = sum(len(m.maps) for m in matches)
+	res = {"maps": nmaps}
+
+	db = DB(os.path.join(workDir, "insert_batch.db"), profile="bulk")
+	starttime = time.perf_counter()
+	with db.WriteBatch() as batch:
+		for match in matches:
+			batch.Add(match)
+	elapsed = time.perf_counter() - starttime
+	db.Close()
+	res["batch_maps_per_sec"] = nmaps / elapsed
+
+	# Single map commits are slow, time only part of data
+	single = matches[:max(1, len(matches) // 10)]
+	db = DB(os.path.join(workDir, "insert_single.db"))
+	starttime = time.perf_counter()
+	n = 0
+	for match in single:
+		db.InsertMatch(match)
+		for record in match.maps:
+			db.InsertMap(record, matchID=match.matchID)
+			n += 1
+	elapsed = time.perf_counter() - starttime
+	db.Close()
+	res["single_maps_per_sec"] = n / elapsed
+	return res
+
+# Query latency of Get*ByID functions on database of given size
+# Parameters:
+# workDir : directory for benchmark databases, (str)
+# size    : amount of maps in database, (int)
+def BenchQuery(workDir, size, queries=QUERIES):
+	matches = SyntheticMatches(size)
+	path = os.path.join(workDir, "query_{}.db".format(size))
+	db = DB(path, profile="bulk")
+	db.InsertMatchesWithMaps(matches)
+	db.Close()
+
+	reader = DB(path, profile="analytics", readonly=True)
+	rng = random.Random(2)
+	matchIDs = [rng.choice(matches).matchID for i in range(0, queries)]
+	mapIDs = [rng.randint(1, size) for i in range(0, queries)]
+	players = ["team{}_p{}".format(rng.randrange(TEAMS), rng.randrange(5)) for i in range(0, max(1, queries // 10))]
+
+	funcs = [
+		("GetMatchByID", reader.GetMatchByID, matchIDs),
+		("GetMapByID", reader.GetMapByID, mapIDs),
+		("GetMapsByMatchID", reader.GetMapsByMatchID, matchIDs),
+		("GetPlayerStatsByMapID", reader.GetPlayerStatsByMapID, mapIDs),
+		("GetPlayerStatsByMatchID", reader.GetPlayerStatsByMatchID, matchIDs),
+		("GetPlayerMapStatsByMapID", reader.GetPlayerMapStatsByMapID, mapIDs),
+		("GetMapsByPlayer", reader.GetMapsByPlayer, players),
+	]
+	res = {"maps": sum(len(m.maps) for m in matches), "matches": len(matches)}
+	for name, func, args in funcs:
+		samples = []
+		for a in args:
+			starttime = time.perf_counter()
+			func(a)
+			samples.append(time.perf_counter() - starttime)
+		res[name] = latencyStats(samples)
+	reader.Close()
+	return res
+
+# End-to-end miner throughput against local fixture server
+# Parameters:
+# fixtureDir : fixture directory with results, match, match stats and map stats pages, (str)
+# workDir    : directory for benchmark database, (str)
+# pages      : results pages mined, (int)
+def BenchMiner(fixtureDir, workDir, pages=1):
+	if not os.path.exists(os.path.join(fixtureDir, "results__offset_0.html")):
+		return {"skipped": "no results page in " + fixtureDir}
+
+	oldURL = mHLTVAPI.HLTV_URL
+	oldCache = HLTVCache.cache
+	HLTVCache.cache = None  # Measure requests and parsing, not page cache
+	RateLimiter.limiter.Configure(rate=1000.0, burst=1000, adaptive=False)
+	server = ServeFixtures(fixtureDir)
+	try:
+		pipeline = MinerPipeline(os.path.join(workDir, "miner.db"))
+		starttime = time.perf_counter()
+		try:
+			asyncio.run(pipeline.RunBackfill(pages))
+		finally:
+			pipeline.Close()
+		elapsed = time.perf_counter() - starttime
+	finally:
+		server.shutdown()
+		mHLTVAPI.SetBaseURL(oldURL)
+		HLTVCache.cache = oldCache
+		RateLimiter.limiter.Configure(RateLimiter.TARGETRATE, RateLimiter.BURST, True)
+
+	return {
+		"pages": pipeline.pagesDone,
+		"matches_written": pipeline.matchesWritten,
+		"matches_failed": pipeline.matchesFailed,
+		"seconds": elapsed,
+		"matches_per_sec": pipeline.matchesWritten / elapsed,
+	}
+
+# Run selected benchmarks
+# Parameters:
+# fixtureDir : fixture directory, (str)
+# sizes      : database sizes of query benchmark, [(int)]
+# only       : benchmarks to run, [(str)]
+#
+# Returns: results dict
+def RunBenchmarks(fixtureDir=FIXTUREDIR, sizes=SIZES, only=("parse", "insert", "query", "miner")):
+	results = {
+		"time": datetime.datetime.now().isoformat(timespec="seconds"),
+		"python": platform.python_version(),
+		"platform": platform.platform(),
+		"htmlparser": mHLTVAPI.HTMLPARSER,
+	}
+	workDir = tempfile.mkdtemp(prefix="csgobench")
+	try:
+		if "parse" in only:
+			print("Benchmarking parsing")
+			results["parse"] = BenchParse(fixtureDir)
+		if "insert" in only:
+			print("Benchmarking inserts")
+			results["insert"] = BenchInsert(workDir)
+		if "query" in only:
+			results["query"] = {}
+			for size in sizes:
+				print("Benchmarking queries with {} maps".format(size))
+				results["query"][str(size)] = BenchQuery(workDir, size)
+		if "miner" in only:
+			print("Benchmarking miner")
+			results["miner"] = BenchMiner(fixtureDir, workDir)
+	finally:
+		shutil.rmtree(workDir, ignore_errors=True)
+	return results
+
+def main():
+	parser = argparse.ArgumentParser(description="Runs benchmarks and writes results as JSON")
+	parser.add_argument("--fixtures", default=FIXTUREDIR, help="fixture directory")
+	parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="maps in query benchmark databases")
+	parser.add_argument("--output", default=None, help="JSON output file, printed if not given")
+	parser.add_argument("--only", nargs="+", default=["parse", "insert", "query", "miner"],
+		choices=["parse", "insert", "query", "miner"], help="benchmarks to run")
+	args = parser.parse_args()
+	# Per page messages of miner benchmark would drown results
+	LogConfig.Configure("WARNING")
+
+	results = RunBenchmarks(args.fixtures, args.sizes, args.only)
+	out = json.dumps(results, indent=2)
+	if args.output != None:
+		with open(args.output, "w") as f:
+			f.write(out)
+		print("Wrote results to", args.output)
+	else:
+		print(out)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,183 @@
+# Own
+from csgoDB import MAPCOLUMNS
+
+# pip
+import numpy as np
+
+'''
+Loads csgoDB data to compact columnar NumPy arrays for analysis.
+-Maps are loaded from MapData joined with MatchData, ordered by match time and MapID,
+ maps of unknown match time last like csgoDB rates them
+-Player lines are loaded from PlayerMapStats, one row per player and map
+-Team, player, map and event names are interned to integer codes
+Usage:
+data = LoadDataset(DB("mcsgo.db").OpenReader())
+data.maps["Team1"], data.teams.names[code], data.players["Rating"] ...
+'''
+
+CHUNKSIZE = 20000  # Rows fetched from sqlite at once
+
+# Maps, one row per map in time order
+MAPDTYPE = np.dtype([
+	("MapID",        "i8"),
+	("MatchID",      "i8"),            # -1 if map is not linked to match
+	("Time",         "datetime64[m]"), # NaT if match time is unknown
+	("Event",        "i4"),            # Code in Dataset.events
+	("Map",          "i4"),            # Code in Dataset.mapnames
+	("Team1",        "i4"),            # Code in Dataset.teams
+	("Team2",        "i4"),
+	("T1firsthalf",  "i2"),
+	("T2firsthalf",  "i2"),
+	("T1secondhalf", "i2"),
+	("T2secondhalf", "i2"),
+	("T1overtime",   "i2"),
+	("T2overtime",   "i2"),
+	("T1startside",  "i1"),            # 1 ct, 0 t
+])
+
+# Player lines, one row per player and map
+PLAYERDTYPE = np.dtype([
+	("MapID",               "i8"),
+	("TeamIdx",             "i1"),  # 0 Team1, 1 Team2
+	("Slot",                "i1"),
+	("Player",              "i4"),  # Code in Dataset.playerNames
+	("Kills",               "i2"),
+	("Assists",             "i2"),
+	("Deaths",              "i2"),
+	("ADR",                 "f4"),
+	("HeadShots",           "i2"),
+	("FlashAssists",        "i2"),
+	("FirstKillDifference", "i2"),
+	("Rating",              "f4"),
+])
+
+# Interns names to integer codes
+class NameCodes:
+	def __init__(self):
+		self.names = []
+		self.codes = {}
+
+	# Returns: code of name, new code if name is not seen yet, (int)
+	def Code(self, name):
+		code = self.codes.get(name)
+		if code == None:
+			code = len(self.names)
+			self.codes[name] = code
+			self.names.append(name)
+		return code
+
+	# Returns: code of name or -1 if name is not known, (int)
+	def Find(self, name):
+		return self.codes.get(name, -1)
+
+	def __len__(self):
+		return len(self.names)
+
+class Dataset:
+	def __init__(self, maps, players, teams, playerNames, mapnames, events):
+		self.maps = maps
+		self.players = players
+		self.teams = teams
+		self.playerNames = playerNames
+		self.mapnames = mapnames
+		self.events = events
+
+	# Row of each player line in maps array, -1 if map is not loaded
+	# Returns: int array with length of players
+	def PlayerMapRows(self):
+		order = np.argsort(self.maps["MapID"], kind="stable")
+		sortedIDs = self.maps["MapID"][order]
+		pos = np.searchsorted(sortedIDs, self.players["MapID"])
+		pos = np.minimum(pos, max(len(sortedIDs) - 1, 0))
+		if len(sortedIDs) == 0:
+			return np.full(len(self.players), -1, dtype=np.int64)
+		found = sortedIDs[pos] == self.players["MapID"]
+		return np.where(found, order[pos], -1)
+
+# Convert match time strings to datetime64
+def parseTimes(values):
+	try:
+		return np.array([v if v else "NaT" for v in values], dtype="datetime64[m]")
+	except ValueError:
+		res = np.empty(len(values), dtype="datetime64[m]")
+		for i, v in enumerate(values):
+			try:
+				res[i] = np.datetime64(v.strip(), "m") if v else np.datetime64("NaT")
+			except ValueError:
+				res[i] = np.datetime64("NaT")
+		return res
+
+# Load maps to structured array
+# Parameters:
+# db : csgoDB.DB, (DB)
+#
+# Returns: maps array of MAPDTYPE
+def loadMaps(db, teams, mapnames, events, chunkSize=CHUNKSIZE):
+	mapcols = ", ".join("m." + c.strip() for c in MAPCOLUMNS.split(","))
+	c = db.dbconn.cursor()
+	c.execute('''SELECT {}, m.MatchID, mt.MatchTime, mt.EventName FROM MapData m
+		LEFT JOIN MatchData mt ON mt.MatchID = m.MatchID
+		ORDER BY mt.MatchTime IS NULL, mt.MatchTime, m.MapID'''.format(mapcols))
+
+	chunks = []
+	while True:
+		rows = c.fetchmany(chunkSize)
+		if len(rows) == 0:
+			break
+		arr = np.empty(len(rows), dtype=MAPDTYPE)
+		cols = list(zip(*rows))
+		arr["MapID"] = cols[0]
+		arr["Map"] = [mapnames.Code(v) for v in cols[1]]
+		arr["Team1"] = [teams.Code(v) for v in cols[2]]
+		arr["Team2"] = [teams.Code(v) for v in cols[3]]
+		for i, name in enumerate(("T1firsthalf", "T2firsthalf", "T1secondhalf", "T2secondhalf", "T1overtime", "T2overtime")):
+			arr[name] = [v if v != None else 0 for v in cols[4 + i]]
+		arr["T1startside"] = [1 if v == "ct" else 0 for v in cols[10]]
+		arr["MatchID"] = [v if v != None else -1 for v in cols[11]]
+		arr["Time"] = parseTimes(cols[12])
+		arr["Event"] = [events.Code(v) if v != None else -1 for v in cols[13]]
+		chunks.append(arr)
+
+	if len(chunks) == 0:
+		return np.empty(0, dtype=MAPDTYPE)
+	return np.concatenate(chunks)
+
+# Load player lines to structured array
+# Returns: players array of PLAYERDTYPE
+def loadPlayers(db, playerNames, chunkSize=CHUNKSIZE):
+	c = db.dbconn.cursor()
+	c.execute('''SELECT * FROM PlayerMapStats ORDER BY MapID, TeamIdx, Slot''')
+
+	chunks = []
+	while True:
+		rows = c.fetchmany(chunkSize)
+		if len(rows) == 0:
+			break
+		arr = np.empty(len(rows), dtype=PLAYERDTYPE)
+		cols = list(zip(*rows))
+		arr["MapID"] = cols[0]
+		arr["TeamIdx"] = cols[1]
+		arr["Slot"] = cols[2]
+		arr["Player"] = [playerNames.Code(v) for v in cols[3]]
+		for i, name in enumerate(PLAYERDTYPE.names[4:]):
+			arr[name] = [v if v != None else 0 for v in cols[4 + i]]
+		chunks.append(arr)
+
+	if len(chunks) == 0:
+		return np.empty(0, dtype=PLAYERDTYPE)
+	return np.concatenate(chunks)
+
+# Load whole database to columnar dataset
+# Parameters:
+# db        : csgoDB.DB, preferably reader from DB.OpenReader, (DB)
+# chunkSize : rows fetched at once, (int)
+#
+# Returns: Dataset
+def LoadDataset(db, chunkSize=CHUNKSIZE):
+	teams = NameCodes()
+	playerNames = NameCodes()
+	mapnames = NameCodes()
+	events = NameCodes()
+	maps = loadMaps(db, teams, mapnames, events, chunkSize)
+	players = loadPlayers(db, playerNames, chunkSize)
+	return Dataset(maps, players, teams, playerNames, mapnames, events)
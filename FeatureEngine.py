@@ -0,0 +1,261 @@
+# pip
+import numpy as np
+
+'''
+Vectorized team and player features over whole map history.
+Every feature of a map is computed only from maps of earlier matches of the team/player,
+so features can be used to train predictions without leaking the result.
+Rolling aggregates are differences of cumulative sums over time ordered groups,
+so whole history is computed in a few NumPy passes.
+Usage:
+data = LoadDataset(db)
+X1, X2, y = ComputeMapFeatures(data)
+'''
+
+WINDOW = 30  # Rolling window in maps, 0 uses whole history
+
+# Team feature columns
+FEATURES = [
+	"Maps",       # Maps in window
+	"WinRate",    # Maps won / maps
+	"RoundDiff",  # Average round difference per map
+	"MapWinRate", # Win rate on same map
+	"CTWinRate",  # CT rounds won / CT rounds played
+	"TWinRate",   # T rounds won / T rounds played
+	"Rating",     # Average player rating
+	"ADR",        # Average player ADR
+	"KD",         # Kills / deaths of team
+	"FKDiff",     # First kill difference per map
+]
+
+# Player feature columns
+PLAYERFEATURES = ["Maps", "Rating", "ADR", "KD", "FKDiff"]
+
+# Default values when there is no history
+DEFAULTS = {"WinRate": 0.5, "MapWinRate": 0.5, "CTWinRate": 0.5, "TWinRate": 0.5, "Rating": 1.0, "KD": 1.0}
+
+# Team rows, two per map
+TEAMROWDTYPE = np.dtype([
+	("MapRow",   "i8"), # Row in Dataset.maps
+	("Team",     "i4"),
+	("TeamIdx",  "i1"), # 0 Team1, 1 Team2
+	("Opponent", "i4"),
+	("Map",      "i4"),
+	("MatchKey", "i8"), # MatchID, or -MapID if map has no match
+	("Won",      "f4"),
+	("RoundDiff","f4"),
+	("CTWon",    "f4"),
+	("CTPlayed", "f4"),
+	("TWon",     "f4"),
+	("TPlayed",  "f4"),
+	("Rating",   "f4"), # Sum of player ratings
+	("ADR",      "f4"), # Sum of player ADR
+	("Players",  "f4"), # Player lines found
+	("Kills",    "f4"),
+	("Deaths",   "f4"),
+	("FKDiff",   "f4"),
+])
+
+# Divide with default where denominator is zero
+def ratio(a, b, default):
+	return np.divide(a, b, out=np.full(np.shape(a), default, dtype=np.float64), where=b != 0)
+
+# Key of match each map belongs to
+def matchKeys(maps):
+	return np.where(maps["MatchID"] >= 0, maps["MatchID"], -maps["MapID"])
+
+# Sums of values over previous rows of same group, excluding rows of same block (match)
+# Rows must be sorted by group and time
+# Parameters:
+# groups : group of each row, (int array)
+# blocks : block of each row, rows of same block are contiguous within group, (int array)
+# values : values to sum, (n,) or (n, k) array
+# window : max amount of previous rows, 0 for all
+#
+# Returns: sums of previous rows and amount of rows summed
+def RollingSums(groups, blocks, values, window=WINDOW):
+	n = len(groups)
+	values = np.asarray(values, dtype=np.float64)
+	cs = np.zeros((n + 1,) + values.shape[1:])
+	np.cumsum(values, axis=0, out=cs[1:])
+
+	idx = np.arange(n)
+	newGroup = np.ones(n, dtype=bool)
+	newGroup[1:] = groups[1:] != groups[:-1]
+	newBlock = newGroup.copy()
+	newBlock[1:] |= blocks[1:] != blocks[:-1]
+	groupStart = np.maximum.accumulate(np.where(newGroup, idx, 0))
+	blockStart = np.maximum.accumulate(np.where(newBlock, idx, 0))
+
+	lower = groupStart
+	if window > 0:
+		lower = np.maximum(groupStart, blockStart - window)
+	return cs[blockStart] - cs[lower], blockStart - lower
+
+# Sums of values over last rows of each group, including newest
+# Returns: group of each result, sums, amount of rows summed
+def LatestSums(groups, values, window=WINDOW):
+	n = len(groups)
+	values = np.asarray(values, dtype=np.float64)
+	cs = np.zeros((n + 1,) + values.shape[1:])
+	np.cumsum(values, axis=0, out=cs[1:])
+
+	last = np.ones(n, dtype=bool)
+	last[:-1] = groups[1:] != groups[:-1]
+	ends = np.flatnonzero(last) + 1
+	starts = np.r_[0, ends[:-1]]
+	if window > 0:
+		starts = np.maximum(starts, ends - window)
+	return groups[ends - 1], cs[ends] - cs[starts], ends - starts
+
+# Build two team rows per map with results and summed player stats
+# Parameters:
+# data : DataLoader.Dataset
+#
+# Returns: structured array of TEAMROWDTYPE, ordered by team and time
+def TeamMapRows(data):
+	maps = data.maps
+	n = len(maps)
+	rows = np.zeros(2 * n, dtype=TEAMROWDTYPE)
+	mapRow = np.arange(n)
+
+	t1 = maps["T1firsthalf"].astype(np.int32) + maps["T1secondhalf"] + maps["T1overtime"]
+	t2 = maps["T2firsthalf"].astype(np.int32) + maps["T2secondhalf"] + maps["T2overtime"]
+	ct1 = maps["T1startside"] == 1  # Team1 played first half on CT
+	h1 = (maps["T1firsthalf"] + maps["T2firsthalf"]).astype(np.float32)
+	h2 = (maps["T1secondhalf"] + maps["T2secondhalf"]).astype(np.float32)
+
+	for side in (0, 1):
+		r = rows[side * n:(side + 1) * n]
+		r["MapRow"] = mapRow
+		r["TeamIdx"] = side
+		r["Map"] = maps["Map"]
+		r["MatchKey"] = matchKeys(maps)
+		own, opp = (t1, t2) if side == 0 else (t2, t1)
+		r["Team"] = maps["Team1"] if side == 0 else maps["Team2"]
+		r["Opponent"] = maps["Team2"] if side == 0 else maps["Team1"]
+		r["Won"] = own > opp
+		r["RoundDiff"] = own - opp
+
+		# Team on CT in first half is on T in second half
+		first = maps["T1firsthalf"] if side == 0 else maps["T2firsthalf"]
+		second = maps["T1secondhalf"] if side == 0 else maps["T2secondhalf"]
+		ctFirst = ct1 if side == 0 else ~ct1
+		r["CTWon"] = np.where(ctFirst, first, second)
+		r["CTPlayed"] = np.where(ctFirst, h1, h2)
+		r["TWon"] = np.where(ctFirst, second, first)
+		r["TPlayed"] = np.where(ctFirst, h2, h1)
+
+	# Sum player lines to their team rows
+	players = data.players
+	pmap = data.PlayerMapRows()
+	found = pmap >= 0
+	target = pmap[found] + n * players["TeamIdx"][found].astype(np.int64)
+	p = players[found]
+	for col, values in (("Rating", p["Rating"]), ("ADR", p["ADR"]), ("Kills", p["Kills"]),
+			("Deaths", p["Deaths"]), ("FKDiff", p["FirstKillDifference"])):
+		rows[col] = np.bincount(target, weights=values, minlength=2 * n)
+	rows["Players"] = np.bincount(target, minlength=2 * n)
+
+	order = np.lexsort((rows["MapRow"], rows["Team"]))
+	return rows[order]
+
+# Turn summed team rows to FEATURES columns
+def teamFeatureColumns(sums, counts, mapSums, mapCounts):
+	s = lambda name: sums[:, SUMCOLS.index(name)]
+	feats = np.empty((len(counts), len(FEATURES)), dtype=np.float32)
+	feats[:, 0] = counts
+	feats[:, 1] = ratio(s("Won"), counts, DEFAULTS["WinRate"])
+	feats[:, 2] = ratio(s("RoundDiff"), counts, 0.0)
+	feats[:, 3] = ratio(mapSums, mapCounts, DEFAULTS["MapWinRate"])
+	feats[:, 4] = ratio(s("CTWon"), s("CTPlayed"), DEFAULTS["CTWinRate"])
+	feats[:, 5] = ratio(s("TWon"), s("TPlayed"), DEFAULTS["TWinRate"])
+	feats[:, 6] = ratio(s("Rating"), s("Players"), DEFAULTS["Rating"])
+	feats[:, 7] = ratio(s("ADR"), s("Players"), 0.0)
+	feats[:, 8] = ratio(s("Kills"), s("Deaths"), DEFAULTS["KD"])
+	feats[:, 9] = ratio(s("FKDiff"), counts, 0.0)
+	return feats
+
+# Team row columns summed over window
+SUMCOLS = ["Won", "RoundDiff", "CTWon", "CTPlayed", "TWon", "TPlayed", "Rating", "ADR", "Players", "Kills", "Deaths", "FKDiff"]
+
+# Compute pre-match features of every team row
+# Parameters:
+# data   : DataLoader.Dataset
+# window : rolling window in maps, 0 uses whole history
+#
+# Returns: team rows (TeamMapRows) and features (rows, len(FEATURES)) in same order
+def ComputeTeamFeatures(data, window=WINDOW):
+	rows = TeamMapRows(data)
+	values = np.stack([rows[c] for c in SUMCOLS], axis=1)
+	sums, counts = RollingSums(rows["Team"], rows["MatchKey"], values, window)
+
+	# Same map history, grouped by team and map
+	mapGroup = rows["Team"].astype(np.int64) * max(len(data.mapnames), 1) + rows["Map"]
+	order = np.lexsort((rows["MapRow"], mapGroup))
+	mapSums = np.empty(len(rows))
+	mapCounts = np.empty(len(rows))
+	ms, mc = RollingSums(mapGroup[order], rows["MatchKey"][order], rows["Won"][order], window)
+	mapSums[order] = ms
+	mapCounts[order] = mc
+
+	return rows, teamFeatureColumns(sums, counts, mapSums, mapCounts)
+
+# Compute pre-match features of both teams of every map
+# Parameters:
+# data   : DataLoader.Dataset
+# window : rolling window in maps, 0 uses whole history
+#
+# Returns: Team1 features, Team2 features (maps, len(FEATURES)) and Team1 win (maps,) in Dataset.maps order
+def ComputeMapFeatures(data, window=WINDOW):
+	rows, feats = ComputeTeamFeatures(data, window)
+	n = len(data.maps)
+	X = np.empty((2, n, len(FEATURES)), dtype=np.float32)
+	X[rows["TeamIdx"], rows["MapRow"]] = feats
+	won = np.zeros(n, dtype=np.float32)
+	t1 = rows["TeamIdx"] == 0
+	won[rows["MapRow"][t1]] = rows["Won"][t1]
+	return X[0], X[1], won
+
+# Compute current features of every team from its latest maps
+# Parameters:
+# data   : DataLoader.Dataset
+# window : rolling window in maps, 0 uses whole history
+#
+# Returns: features (len(Dataset.teams), len(FEATURES)), teams without maps get defaults
+def CurrentTeamFeatures(data, window=WINDOW):
+	rows = TeamMapRows(data)
+	nteams = len(data.teams)
+	values = np.stack([rows[c] for c in SUMCOLS], axis=1)
+	sums = np.zeros((nteams, len(SUMCOLS)))
+	counts = np.zeros(nteams)
+	teams, s, c = LatestSums(rows["Team"], values, window)
+	sums[teams] = s
+	counts[teams] = c
+	# Same map win rate depends on map, so use overall win rate here
+	return teamFeatureColumns(sums, counts, sums[:, 0], counts)
+
+# Compute pre-match features of every player line
+# Parameters:
+# data   : DataLoader.Dataset
+# window : rolling window in maps, 0 uses whole history
+#
+# Returns: features (len(Dataset.players), len(PLAYERFEATURES)) in Dataset.players order
+def ComputePlayerFeatures(data, window=WINDOW):
+	players = data.players
+	pmap = data.PlayerMapRows()
+	timeRow = np.where(pmap >= 0, pmap, -1)
+	keys = np.where(pmap >= 0, matchKeys(data.maps)[np.maximum(pmap, 0)], -players["MapID"])
+	order = np.lexsort((timeRow, players["Player"]))
+
+	p = players[order]
+	values = np.stack([p["Rating"], p["ADR"], p["Kills"], p["Deaths"], p["FirstKillDifference"]], axis=1)
+	sums, counts = RollingSums(p["Player"], keys[order], values, window)
+
+	feats = np.empty((len(players), len(PLAYERFEATURES)), dtype=np.float32)
+	feats[order, 0] = counts
+	feats[order, 1] = ratio(sums[:, 0], counts, DEFAULTS["Rating"])
+	feats[order, 2] = ratio(sums[:, 1], counts, 0.0)
+	feats[order, 3] = ratio(sums[:, 2], sums[:, 3], DEFAULTS["KD"])
+	feats[order, 4] = ratio(sums[:, 4], counts, 0.0)
+	return feats
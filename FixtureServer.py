@@ -0,0 +1,291 @@
+# Own
+import mHLTVAPI
+import LogConfig
+
+# Standard
+import logging
+import os
+import random
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+'''
+Local stand-in for hltv.org serving saved html pages.
+-RecordFixture(url, dir) saves page from hltv to fixture directory
+-RecordCorpus(dir) saves results, match, match stats, map stats, event archive and upcoming pages
+-WriteSyntheticCorpus(dir) writes small generated corpus with same page structure as hltv,
+ committed fixtures directory is made with it so benchmarks and tests run without network
+-ServeFixtures(dir) starts local server and points mHLTVAPI requests to it
+
+Usage:
+python FixtureServer.py record fixtures /results?offset=0 /matches/2337682/...
+python FixtureServer.py corpus fixtures [results pages] [matches per page]
+python FixtureServer.py synthetic fixtures [matches]
+python FixtureServer.py serve fixtures 8080
+'''
+
+log = logging.getLogger(__name__)
+
+FIXTUREDIR = "fixtures"
+
+SYNTHETICTEAMS  = ["Astralis", "NaVi", "Liquid", "G2", "FaZe", "Vitality"]
+SYNTHETICMATCH  = 2330000  # MatchID of first synthetic match
+SYNTHETICMAP    = 90001    # MapID of first synthetic map
+SYNTHETICMAPS   = ["Mirage", "Inferno", "Nuke", "Overpass", "Dust2", "Train", "Vertigo"]
+SYNTHETICEVENTS = 50       # Events on synthetic event archive page
+SYNTHETICUPCOMING = 4      # Matches on synthetic upcoming page
+SYNTHETICUPCOMINGTIME = 1580544000000  # Start of first upcoming match, unix ms
+
+# Get path of saved page inside fixture directory
+# Parameters:
+# fixtureDir : fixture directory, (str)
+# url        : page url in hltv, (str)
+#
+# Returns: path to fixture file, (str)
+def FixturePath(fixtureDir, url):
+	name = url.lstrip("/").replace("?", "__").replace("=", "_").replace("&", "_")
+	return os.path.join(fixtureDir, name + ".html")
+
+# Requests page from hltv and saves it to fixture directory
+# Parameters:
+# url        : page url in hltv, (str)
+# fixtureDir : fixture directory, (str)
+#
+# Returns: True if success, False otherwise
+def RecordFixture(url, fixtureDir=FIXTUREDIR):
+	req = mHLTVAPI.requestHLTV(url)
+	if req == None or req.status_code != 200:
+		log.warning("Failed to record fixture: %s", url)
+		return False
+
+	path = FixturePath(fixtureDir, url)
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	with open(path, "wb") as f:
+		f.write(req.content)
+	return True
+
+# Record corpus of every page kind the miner parses
+# Matches are followed from results pages to their match stats and map stats pages
+# Parameters:
+# fixtureDir     : fixture directory, (str)
+# resultsPages   : amount of results and event archive pages, (int)
+# matchesPerPage : matches recorded from each results page, (int)
+#
+# Returns: amount of recorded pages, (int)
+def RecordCorpus(fixtureDir=FIXTUREDIR, resultsPages=1, matchesPerPage=10):
+	recorded = 0
+	urls = ["/matches"]
+	for X in range(0, resultsPages):
+		urls.append("/events/archive?offset=" + str(X * 50))
+	for url in urls:
+		recorded += RecordFixture(url, fixtureDir)
+
+	for X in range(0, resultsPages):
+		url = "/results?offset=" + str(X * 100)
+		if not RecordFixture(url, fixtureDir):
+			break
+		recorded += 1
+		with open(FixturePath(fixtureDir, url), "rb") as f:
+			matchURLs = mHLTVAPI.ParseMatchResultsPage(f.read())[:matchesPerPage]
+		for matchURL in matchURLs:
+			if not RecordFixture(matchURL, fixtureDir):
+				continue
+			recorded += 1
+			with open(FixturePath(fixtureDir, matchURL), "rb") as f:
+				links = mHLTVAPI.ParseMatchPage(f.read(), matchURL)
+			if links == None:
+				continue
+			matchLink, mapLinks = links
+			for url in [matchLink] + mapLinks:
+				recorded += RecordFixture(url, fixtureDir)
+	log.info("Recorded %s pages to %s", recorded, fixtureDir)
+	return recorded
+
+def writeFixture(fixtureDir, url, html):
+	path = FixturePath(fixtureDir, url)
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	with open(path, "w", encoding="utf-8") as f:
+		f.write(html)
+
+# Round score of map won by team1 or team2, maps are played to 16 and 15-15 goes to overtime
+# Returns: (first half (t1, t2), second half (t1, t2), overtime (t1, t2) or None)
+def syntheticScore(rng, team1Won, overtime):
+	if overtime:
+		a = rng.randint(4, 11)
+		otLoser = rng.randint(0, 2)
+		return (a, 15 - a), (15 - a, a), (4, otLoser) if team1Won else (otLoser, 4)
+	loser = rng.randint(3, 14)
+	w1 = rng.randint(max(1, 15 - loser), 15)
+	first, second = (w1, 15 - w1), (16 - w1, loser - 15 + w1)
+	if not team1Won:
+		first, second = first[::-1], second[::-1]
+	return first, second, None
+
+# Map stats page
+# Returns: (html, rounds of team1, rounds of team2)
+def syntheticMapStats(rng, team1, team2, team1Won, overtime):
+	header = "<thead><tr>" + "".join('<th class="{}">{}</th>'.format(c, c) for c in
+		["st-player", "st-kills", "st-assists", "st-deaths", "st-kdratio", "st-kddiff", "st-adr", "st-fkdiff", "st-rating"]) + "</tr></thead>"
+	def rows(team):
+		res = []
+		for i in range(0, 5):
+			res.append('''<tr>
+<td class="st-player"><a href="/stats/players/{}/x">{}_p{}</a></td>
+<td class="st-kills">{} ({})</td>
+<td class="st-assists">{} ({})</td>
+<td class="st-deaths">{}</td>
+<td class="st-kdratio">1.0</td>
+<td class="st-kddiff">+1</td>
+<td class="st-adr">{:.1f}</td>
+<td class="st-fkdiff">{:+d}</td>
+<td class="st-rating">{:.2f}</td>
+</tr>'''.format(i + 1, team, i, rng.randint(5, 30), rng.randint(1, 10), rng.randint(0, 8), rng.randint(0, 3),
+				rng.randint(5, 30), rng.uniform(40, 120), rng.randint(-4, 4), rng.uniform(0.5, 1.6)))
+		return "\n".join(res)
+
+	first, second, ot = syntheticScore(rng, team1Won, overtime)
+	total1 = first[0] + second[0] + (ot[0] if ot != None else 0)
+	total2 = first[1] + second[1] + (ot[1] if ot != None else 0)
+	side1 = rng.choice(["ct", "t"])
+	side2 = "t" if side1 == "ct" else "ct"
+	score = '<span class="{}">{}</span> : <span class="{}">{}</span>'.format(
+		"won" if team1Won else "lost", total1, "lost" if team1Won else "won", total2)
+	score += ' ( <span class="{}-color">{}</span> : <span class="{}-color">{}</span> )'.format(side1, first[0], side2, first[1])
+	score += ' ( <span class="{}-color">{}</span> : <span class="{}-color">{}</span> )'.format(side2, second[0], side1, second[1])
+	if ot != None:
+		score += " ({}:{})".format(ot[0], ot[1])
+	return '''<html><body><div class="match-info-box-con"><div class="match-info-box">
+<div class="team-left"><a title="{0}"></a></div><div class="team-right"><a title="{1}"></a></div>
+<div class="small-text">Map</div>{2}
+<div class="match-info-row"><div class="right">{3}</div></div></div></div>
+<table class="stats-table">{4}<tbody>{5}</tbody></table>
+<table class="stats-table">{4}<tbody>{6}</tbody></table></body></html>'''.format(
+		team1, team2, rng.choice(SYNTHETICMAPS), score, header, rows(team1), rows(team2)), total1, total2
+
+# Write generated corpus of results, match, match stats, map stats, event archive and upcoming pages
+# Pages have markup parsers of mHLTVAPI read, round scores add up and map winners match
+# series score, player stats are random but seeded
+# Parameters:
+# fixtureDir : fixture directory, (str)
+# matches    : amount of matches, every second one is best of three, (int)
+# seed       : random seed, same seed writes same pages, (int)
+#
+# Returns: amount of written pages, (int)
+def WriteSyntheticCorpus(fixtureDir=FIXTUREDIR, matches=10, seed=1):
+	rng = random.Random(seed)
+	written = 0
+	matchURLs = []
+	mapID = SYNTHETICMAP
+	for m in range(0, matches):
+		matchID = SYNTHETICMATCH + m
+		team1, team2 = rng.sample(SYNTHETICTEAMS, 2)
+		team1Won = rng.random() < 0.5
+		matchURL = "/matches/{}/{}-vs-{}".format(matchID, team1, team2)
+		matchURLs.append(matchURL)
+
+		# Best of three is 2-0 or 2-1, loser of 2-1 takes first or second map
+		if m % 2:
+			winners = [team1Won] * rng.choice([2, 3])
+			if len(winners) == 3:
+				winners[rng.randint(0, 1)] = not team1Won
+		else:
+			winners = [team1Won]
+
+		# Best of one shows round score, best of three map score
+		score1, score2 = winners.count(True), winners.count(False)
+		mapURLs = []
+		for k, won in enumerate(winners):
+			mapURL = "/stats/matches/mapstatsid/{}/{}-vs-{}".format(mapID, team1, team2)
+			mapURLs.append(mapURL)
+			html, rounds1, rounds2 = syntheticMapStats(rng, team1, team2, won, k == 1)
+			writeFixture(fixtureDir, mapURL, html)
+			if len(winners) == 1:
+				score1, score2 = rounds1, rounds2
+			mapID += 1
+		written += len(mapURLs)
+
+		holders = "".join('<div class="mapholder"><a href="{}">map</a></div>'.format(u) for u in mapURLs)
+		writeFixture(fixtureDir, matchURL, '''<html><body><div class="team1-gradient"><a>x</a><div>{}</div><div>{}</div></div><div class="team2-gradient"><a>x</a><div>{}</div><div>{}</div></div>
+{}<div class="small-padding stats-detailed-stats"><a href="/stats/matches/{}/x">Detailed stats</a></div></body></html>'''.format(team1, score1, team2, score2, holders, matchID))
+		writeFixture(fixtureDir, "/stats/matches/{}/x".format(matchID), '''<html><body><div class="match-info-box-con"><div class="match-info-box"><a class="block text-ellipsis" href="/events/1/x">Event {}</a><div class="small-text"><span>2020-01-{:02d} {:02d}:00</span></div></div></div></body></html>'''.format(m % 3, m % 28 + 1, 10 + m % 10))
+		written += 2
+
+	results = "".join('<div class="result-con"><a href="{}">r</a></div>'.format(u) for u in reversed(matchURLs))
+	writeFixture(fixtureDir, "/results?offset=0", "<html><body><div class='results'>{}</div></body></html>".format(results))
+
+	types = ["Online", "Local LAN", "Reg. LAN", "Intl. LAN"]
+	events = "".join('''<a class="a-reset small-event standard-box" href="/events/{0}/e"><div class="ev"><table><tr><td class="col-value event-col">Event {0}</td><td class="col-value small-col">{1}</td><td class="col-value small-col prizePoolEllipsis">{2}</td><td class="col-value small-col gtSmartphone-only">{3}</td></tr></table></div></a>'''.format(
+		i, "16+" if i % 2 else "8", "$200,000" if i % 3 else "Other", types[i % 4]) for i in range(0, SYNTHETICEVENTS))
+	writeFixture(fixtureDir, "/events/archive?offset=0", "<html><body>{}</body></html>".format(events))
+
+	# Upcoming matches start after last synthetic match, last one has no decided opponent yet
+	upcoming = []
+	for i in range(0, SYNTHETICUPCOMING):
+		team1, team2 = rng.sample(SYNTHETICTEAMS, 2)
+		teams = '<div class="team">{}</div>'.format(team1)
+		if i < SYNTHETICUPCOMING - 1:
+			teams += '<div class="team">{}</div>'.format(team2)
+		upcoming.append('''<a href="/matches/{}/{}-vs-{}" class="upcoming-match"><table><tr><td><div class="time" data-unix="{}">12:00</div></td><td>{}</td><td><span class="event-name">Event {}</span></td><td><div class="map-text">{}</div></td></tr></table></a>'''.format(
+			SYNTHETICMATCH + matches + i, team1, team2, SYNTHETICUPCOMINGTIME + i * 3600000, teams, i % 3, "bo3" if i % 2 else "bo1"))
+	writeFixture(fixtureDir, "/matches", "<html><body><div class='upcoming-matches'>{}</div></body></html>".format("".join(upcoming)))
+	written += 3
+	log.info("Wrote %s synthetic pages to %s", written, fixtureDir)
+	return written
+
+def _makeHandler(fixtureDir):
+	class FixtureHandler(BaseHTTPRequestHandler):
+		def do_GET(self):
+			path = FixturePath(fixtureDir, self.path)
+			if not os.path.isfile(path):
+				self.send_error(404)
+				return
+			with open(path, "rb") as f:
+				content = f.read()
+			self.send_response(200)
+			self.send_header("Content-Type", "text/html; charset=utf-8")
+			self.send_header("Content-Length", str(len(content)))
+			self.end_headers()
+			self.wfile.write(content)
+
+		def log_message(self, format, *args):
+			pass
+	return FixtureHandler
+
+# Starts local server serving fixtures in background thread
+# Parameters:
+# fixtureDir : fixture directory, (str)
+# port       : port to listen, 0 picks free port, (int)
+# redirect   : point mHLTVAPI requests to started server, (bool)
+#
+# Returns: running server, call shutdown() to stop it
+def ServeFixtures(fixtureDir=FIXTUREDIR, port=0, redirect=True):
+	server = ThreadingHTTPServer(("127.0.0.1", port), _makeHandler(fixtureDir))
+	threading.Thread(target=server.serve_forever, daemon=True).start()
+	if redirect:
+		mHLTVAPI.SetBaseURL("http://127.0.0.1:{}".format(server.server_address[1]))
+	return server
+
+def main():
+	LogConfig.Configure()
+	if len(sys.argv) < 3:
+		print("Usage: python FixtureServer.py record <dir> <url>... | corpus <dir> [pages] [matches] | synthetic <dir> [matches] | serve <dir> [port]")
+		return
+	mode, fixtureDir = sys.argv[1], sys.argv[2]
+	if mode == "record":
+		for url in sys.argv[3:]:
+			RecordFixture(url, fixtureDir)
+	elif mode == "corpus":
+		pages = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+		matches = int(sys.argv[4]) if len(sys.argv) > 4 else 10
+		RecordCorpus(fixtureDir, pages, matches)
+	elif mode == "synthetic":
+		WriteSyntheticCorpus(fixtureDir, int(sys.argv[3]) if len(sys.argv) > 3 else 10)
+	elif mode == "serve":
+		port = int(sys.argv[3]) if len(sys.argv) > 3 else 8080
+		server = ServeFixtures(fixtureDir, port, False)
+		log.info("Serving %s at http://127.0.0.1:%s", fixtureDir, server.server_address[1])
+		threading.Event().wait()
+
+if __name__ == "__main__":
+	main()
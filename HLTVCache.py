@@ -0,0 +1,195 @@
+# Standard
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+
+'''
+Persistent on-disk cache of raw hltv pages, used by requestHLTV.
+-Pages are stored zlib compressed in a sqlite file, keyed by url
+-Every page kind has its own time to live, finished map stats never expire
+-Expired pages are revalidated with If-None-Match / If-Modified-Since
+-Least recently used pages are evicted when cache grows over its size limit
+-In offline mode pages are only replayed from cache, network is never touched
+'''
+
+log = logging.getLogger(__name__)
+
+CACHEFILE = "hltvcache.db"
+MAXSIZE   = 2 * 1024 ** 3  # Max total compressed size in bytes
+
+# Time to live in seconds per page kind, None never expires
+PAGETTL = {
+	"results":  10 * 60,
+	"upcoming": 60,
+	"match":    24 * 3600,
+	"matchstats": None,
+	"mapstats": None,
+	"events":   24 * 3600,
+	"other":    3600,
+}
+
+# Get page kind of url
+# Parameters:
+# url : page url in hltv, (str)
+#
+# Returns: key of PAGETTL, (str)
+def PageKind(url):
+	if url.startswith("/results"):
+		return "results"
+	if url.startswith("/stats/matches/mapstatsid/"):
+		return "mapstats"
+	if url.startswith("/stats/matches/"):
+		return "matchstats"
+	if url == "/matches" or url.startswith("/matches?"):
+		return "upcoming"
+	if url.startswith("/matches/"):
+		return "match"
+	if url.startswith("/events"):
+		return "events"
+	return "other"
+
+# Response replayed from cache, has same fields as requests response that parsers use
+class CachedResponse:
+	def __init__(self, url, content, headers=None):
+		self.url = url
+		self.content = content
+		self.status_code = 200
+		self.headers = headers if headers != None else {}
+		self.fromCache = True
+
+# Cache entry found by Lookup
+class CacheEntry:
+	def __init__(self, url, content, etag, lastModified, fetched):
+		self.url = url
+		self.content = content
+		self.etag = etag
+		self.lastModified = lastModified
+		self.fetched = fetched
+
+	# Returns: True if entry is still fresh
+	def IsFresh(self, now=None):
+		ttl = PAGETTL[PageKind(self.url)]
+		if ttl == None:
+			return True
+		if now == None:
+			now = time.time()
+		return now - self.fetched < ttl
+
+	# Returns: headers to revalidate entry with server, (dict)
+	def ConditionalHeaders(self):
+		headers = {}
+		if self.etag:
+			headers["If-None-Match"] = self.etag
+		if self.lastModified:
+			headers["If-Modified-Since"] = self.lastModified
+		return headers
+
+	def Response(self):
+		return CachedResponse(self.url, self.content)
+
+class PageCache:
+	def __init__(self, path=CACHEFILE, maxSize=MAXSIZE, offline=False):
+		self.path = path
+		self.maxSize = maxSize
+		self.offline = offline
+		self.lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+
+		self.conn = sqlite3.connect(path, check_same_thread=False)
+		self.conn.execute("PRAGMA journal_mode = WAL")
+		self.conn.execute('''CREATE TABLE IF NOT EXISTS Pages (
+			URL varchar primary key,
+			Content blob,
+			Size integer,
+			ETag varchar,
+			LastModified varchar,
+			Fetched real,
+			LastAccess real)''')
+		self.conn.execute("CREATE INDEX IF NOT EXISTS PagesLastAccess ON Pages (LastAccess)")
+		self.conn.commit()
+		self.size = self.conn.execute("SELECT COALESCE(SUM(Size), 0) FROM Pages").fetchone()[0]
+
+	# Find page from cache
+	# Parameters:
+	# url : page url in hltv, (str)
+	#
+	# Returns: CacheEntry or None
+	def Lookup(self, url):
+		with self.lock:
+			row = self.conn.execute('''SELECT Content, ETag, LastModified, Fetched FROM Pages WHERE URL = ?''', (url,)).fetchone()
+			if row == None:
+				self.misses += 1
+				return None
+			self.hits += 1
+			self.conn.execute("UPDATE Pages SET LastAccess = ? WHERE URL = ?", (time.time(), url))
+			self.conn.commit()
+		return CacheEntry(url, zlib.decompress(row[0]), row[1], row[2], row[3])
+
+	# Store page to cache
+	# Parameters:
+	# url : page url in hltv, (str)
+	# res : response to store, needs content and headers
+	def Store(self, url, res):
+		blob = zlib.compress(res.content, 6)
+		now = time.time()
+		with self.lock:
+			old = self.conn.execute("SELECT Size FROM Pages WHERE URL = ?", (url,)).fetchone()
+			if old != None:
+				self.size -= old[0]
+			self.conn.execute('''INSERT OR REPLACE INTO Pages VALUES (?, ?, ?, ?, ?, ?, ?)''',
+				(url, blob, len(blob), res.headers.get("ETag"), res.headers.get("Last-Modified"), now, now))
+			self.size += len(blob)
+			if self.size > self.maxSize:
+				self.evict()
+			self.conn.commit()
+
+	# Mark page as fetched now, used when server answered 304 Not Modified
+	def Touch(self, url):
+		now = time.time()
+		with self.lock:
+			self.conn.execute("UPDATE Pages SET Fetched = ?, LastAccess = ? WHERE URL = ?", (now, now, url))
+			self.conn.commit()
+
+	# Remove least recently used pages until cache is 90% of max size, lock must be held
+	def evict(self):
+		target = int(self.maxSize * 0.9)
+		c = self.conn.cursor()
+		removed = []
+		for url, size in c.execute("SELECT URL, Size FROM Pages ORDER BY LastAccess"):
+			if self.size <= target:
+				break
+			removed.append((url,))
+			self.size -= size
+		self.conn.executemany("DELETE FROM Pages WHERE URL = ?", removed)
+		log.info("Evicted %s pages from cache", len(removed))
+
+	def Close(self):
+		with self.lock:
+			self.conn.close()
+
+# Cache used by requestHLTV, None if caching is disabled
+cache = None
+
+# Enable cache for all requests to hltv
+# Parameters:
+# path    : cache file, (str)
+# maxSize : max total compressed size in bytes, (int)
+# offline : only replay pages from cache, (bool)
+#
+# Returns: opened PageCache
+def OpenCache(path=CACHEFILE, maxSize=MAXSIZE, offline=False):
+	global cache
+	if cache != None:
+		cache.Close()
+	cache = PageCache(path, maxSize, offline)
+	return cache
+
+# Disable cache
+def CloseCache():
+	global cache
+	if cache != None:
+		cache.Close()
+	cache = None
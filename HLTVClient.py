@@ -0,0 +1,126 @@
+# Own
+import RateLimiter
+import Metrics
+
+# pip
+import requests
+from requests.adapters import HTTPAdapter
+
+# Standard
+import email.utils
+import logging
+import random
+import threading
+import time
+
+'''
+Shared http client used by all requests to hltv.
+-One pooled session per process, connections are kept alive per host
+-Failed requests (429, 5xx, connection errors) are retried with exponential backoff,
+ Retry-After header of response is respected
+-Every attempt takes a token from shared RateLimiter.limiter
+'''
+
+log = logging.getLogger(__name__)
+
+POOLSIZE    = 16   # Max kept-alive connections per host
+POOLHOSTS   = 4    # Amount of hosts to keep connection pools for
+MAXRETRIES  = 4    # Retries after first failed attempt
+BACKOFFBASE = 1.0  # Seconds to wait after first failure, doubled every retry
+BACKOFFMAX  = 60.0 # Maximum seconds to wait between retries
+TIMEOUT     = 20.0 # Seconds to wait for server response
+
+RETRYSTATUS = (429, 500, 502, 503, 504)
+
+_session = None
+_sessionLock = threading.Lock()
+
+# Configure shared session, replaces existing session
+# Parameters:
+# poolSize   : max kept-alive connections per host, (int)
+# maxRetries : retries after first failed attempt, (int)
+# backoff    : seconds to wait after first failure, (float)
+def ConfigureSession(poolSize=None, maxRetries=None, backoff=None):
+	global POOLSIZE, MAXRETRIES, BACKOFFBASE, _session
+	with _sessionLock:
+		if poolSize != None:
+			POOLSIZE = poolSize
+		if maxRetries != None:
+			MAXRETRIES = maxRetries
+		if backoff != None:
+			BACKOFFBASE = backoff
+		if _session != None:
+			_session.close()
+		_session = None
+
+# Returns shared session, created on first call
+def GetSession():
+	global _session
+	with _sessionLock:
+		if _session == None:
+			sess = requests.Session()
+			adapter = HTTPAdapter(pool_connections=POOLHOSTS, pool_maxsize=POOLSIZE)
+			sess.mount("https://", adapter)
+			sess.mount("http://", adapter)
+			_session = sess
+		return _session
+
+# Parse Retry-After header to seconds
+# Parameters:
+# value : header value, seconds or http date, (str)
+#
+# Returns: seconds to wait or None
+def parseRetryAfter(value):
+	if value == None:
+		return None
+	try:
+		return max(0.0, float(value))
+	except ValueError:
+		pass
+	try:
+		when = email.utils.parsedate_to_datetime(value)
+		return max(0.0, when.timestamp() - time.time())
+	except (TypeError, ValueError):
+		return None
+
+# Seconds to wait before retry
+def backoffTime(attempt, retryAfter=None):
+	if retryAfter != None:
+		return min(retryAfter, BACKOFFMAX)
+	return min(BACKOFFBASE * (2 ** attempt) * (0.5 + random.random()), BACKOFFMAX)
+
+# Get url with shared session, retries failed requests
+# Parameters:
+# url     : full url, (str)
+# headers : request headers, (dict)
+#
+# Returns: response or None if all attempts failed
+def Get(url, headers=None):
+	sess = GetSession()
+	for attempt in range(0, MAXRETRIES + 1):
+		retryAfter = None
+		Metrics.Observe("ratelimiter_wait_seconds", RateLimiter.limiter.Acquire())
+		if attempt > 0:
+			Metrics.Inc("hltv_retries_total")
+		starttime = time.monotonic()
+		try:
+			res = sess.get(url, headers=headers, timeout=TIMEOUT)
+			RateLimiter.limiter.Feedback(res.status_code, time.monotonic() - starttime)
+			Metrics.Inc("hltv_responses_total", status=res.status_code)
+			if res.status_code not in RETRYSTATUS:
+				if res.status_code >= 400:
+					log.warning("Request failed with status %s: %s", res.status_code, url)
+					return None
+				return res
+			log.warning("Request got status %s: %s", res.status_code, url)
+			retryAfter = parseRetryAfter(res.headers.get("Retry-After"))
+		except requests.RequestException as e:
+			RateLimiter.limiter.Feedback(None, time.monotonic() - starttime)
+			Metrics.Inc("hltv_responses_total", status="error")
+			log.error("Request error: %s url: %s", e, url)
+
+		if attempt < MAXRETRIES:
+			time.sleep(backoffTime(attempt, retryAfter))
+
+	log.error("Giving up request after %s attempts: %s", MAXRETRIES + 1, url)
+	return None
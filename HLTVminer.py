@@ -1,11 +1,24 @@
 # Own
 from mHLTVAPI import *
+from MinerPipeline import MinerPipeline
+from mHLTVAsync import GetFinishedEventsAsync, MAXCONCURRENCY
+from UpcomingPoller import UpcomingPoller
+from Predictor import Predictor
 from csgoDB import *
+from DataLoader import LoadDataset
+import Rating
+import RateLimiter
+import HLTVCache
+import PageArchive
+import Reparse
+import ParquetExport
+import Metrics
+import LogConfig
 
 # Standard
-import os
-import time
-import random
+import argparse
+import asyncio
+import logging
 
 '''
 Mines data from HLTV and writes it to sqlite db.
@@ -16,71 +29,148 @@ Mines data from HLTV and writes it to sqlite db.
 --Write all to same database
 '''
 
-# Basic example of hltvAPI + csgoDB usage
-def loadTestData():
-	for j in range(9, 20):
-		page = GetMatchResultsPage(j)
-		for i in range(0, len(page)):
-			mID = SToI(page[i].split("/")[2])
-			existsInDB = GetMatchByID(mID)
-			if existsInDB == None:
-				match = GetMatch(page[i])
-				if match != None:
-					suc1 = InsertMatchToDB(match[0])
-					for m in match[1]:
-						InsertMapToDB(m)
-			else:
-				print("existsInDB:", existsInDB)
-			if i == 24:
-				print('''25% of page done!''')
-			elif i == 49:
-				print('''50% of page done!''')
-			elif i == 74:
-				print('''75% of page done!''')
-			elif i == 99:
-				print('''100% of page done!''')
-		print("Finished parsing page", j)
-
-def batchLoader():
-	mdebug = False
-	minerRunning = True
-	mcsgoDB = DB("mcsgo.db")
-
-	# Start from page 0
-	curpage = 3
-	while minerRunning:
-		batchtime = 5.0   # 5 sec per batch
-		starttime = time.time()
-		sess = requests.Session()
-		# Batch of 100 matches from results page
-		mpage = GetMatchResultsPage(curpage, mdebug)
-		
-		for p in mpage:
-			mID = SToI(p.split("/")[2])
-			existsInDB = mcsgoDB.GetMatchByID(mID, mdebug)
-			if existsInDB == None:
-				match = GetMatch(p, mdebug)
-				if match != None:
-					suc1 = mcsgoDB.InsertMatch(match[0], mdebug)
-					for m in match[1]:
-						suc2 = mcsgoDB.InsertMap(m, mdebug)
-			else:
-				print("existsInDB:", existsInDB)
-				batchtime -= 0.05
-
-		sleeptime = batchtime - (time.time() - starttime)
-		print(sleeptime)
-		if sleeptime > 0:  # Sleep a bit if we are progressing too fast
-			time.sleep(sleeptime)
-			print("SLEEPPINK")
-		curpage += 1
+log = logging.getLogger(__name__)
+
+EVENTPAGES = MAXCONCURRENCY  # Event archive pages requested at once
+
+# Mine matches to database with MinerPipeline
+# Parameters:
+# mode     : "incremental" mines new matches, "backfill" continues mining older pages, (str)
+# maxPages : amount of results pages to backfill, None walks until stopped, (int)
+def batchLoader(mode="incremental", maxPages=None):
+	pipeline = MinerPipeline("mcsgo.db")
+
+	try:
+		# Fetch, parse and write stages run concurrently
+		if mode == "backfill":
+			asyncio.run(pipeline.RunBackfill(maxPages))
+		else:
+			asyncio.run(pipeline.RunIncremental())
+	finally:
+		pipeline.Close()
+	# Backfilled maps are older than rated ones, replay ratings in time order
+	ratingLoader()
+
+	# Requests are throttled by shared rate limiter
+	stats = RateLimiter.limiter.Stats()
+	log.info("Requests: %s, waited: %.1fs, rate: %.2f/s", stats["requests"], stats["waitTime"], stats["rate"])
+
+# Replay ratings of whole map history in match time order
+# Parameters:
+# force : rebuild even if stored ratings are not marked stale, (bool)
+def ratingLoader(force=False):
+	db = DB("mcsgo.db")
+	if force or db.RatingsStale():
+		log.info("Rebuilding ratings from map history")
+		reader = db.OpenReader()
+		Rating.RebuildRatings(db, LoadDataset(reader))
+		reader.Close()
+	db.Close()
+
+# Mine finished events from archive pages to database
+# Pages are requested concurrently in windows, events of whole window are inserted at once
+# Parameters:
+# maxPages : amount of archive pages, None walks until empty page, (int)
+async def eventLoader(db, maxPages=None):
+	X = 0
+	total = 0
+	while maxPages == None or X < maxPages:
+		n = EVENTPAGES if maxPages == None else min(EVENTPAGES, maxPages - X)
+		pages = await asyncio.gather(*[GetFinishedEventsAsync(i) for i in range(X, X + n)])
+		events = []
+		done = False
+		for i, page in enumerate(pages):
+			if page == None or len(page) == 0:
+				log.info("Event archive page %s is %s, stopping", X + i, "empty" if page != None else "failed")
+				done = True
+				break
+			events.extend(page)
+		if len(events) > 0:
+			db.InsertEventsToDB(events)
+			total += len(events)
+		log.info("Event archive pages %s-%s, events: %s", X, X + n - 1, len(events))
+		if done:
+			break
+		X += n
+	log.info("Events mined: %s", total)
+
+# Poll upcoming matches and print predictions of new and changed matchups
+# Parameters:
+# interval : seconds between polls, (float)
+def upcomingLoader(interval):
+	ratingLoader()
+	db = DB("mcsgo.db")
+	predictor = Predictor(db.OpenReader())
+
+	def onChange(diff):
+		log.info("Upcoming matches changed, %s", diff)
+		matchups = diff.added + diff.changed
+		probs = predictor.PredictBatch([(m[UTEAM1], m[UTEAM2]) for m in matchups])
+		for m, p in zip(matchups, probs):
+			log.info("%s %s vs %s (%s, %s): %.2f", m[UTIME], m[UTEAM1], m[UTEAM2], m[UEVENT], m[UFORMAT], p)
+
+	poller = UpcomingPoller(interval, onChange)
+	try:
+		poller.Run()
+	except KeyboardInterrupt:
+		pass
+	log.info("Polls: %s, not modified: %s, same content: %s, parsed: %s", poller.polls, poller.notModified, poller.sameContent, poller.parsed)
 
 def main():
-	print("\n---HLTVminer starting---")
-	debug = False
+	parser = argparse.ArgumentParser(description="Mines data from HLTV to mcsgo.db")
+	parser.add_argument("mode", nargs="?", default="incremental", choices=["incremental", "backfill", "events", "upcoming", "reparse", "export", "ratings"],
+		help="incremental mines new matches, backfill continues mining older results pages, events mines event archive, upcoming polls upcoming matches, reparse rebuilds database from page archive, export writes database to Parquet, ratings replays ratings of whole history")
+	parser.add_argument("--pages", type=int, default=None, help="amount of results/event archive pages to mine")
+	parser.add_argument("--offline", action="store_true", help="only reparse pages from cache")
+	parser.add_argument("--archive", default=None, help="append fetched pages to page archive in this directory, reparse reads it (default {})".format(PageArchive.ARCHIVEDIR))
+	parser.add_argument("--output", default=None, help="new database reparse writes to (default mcsgo_reparsed.db) or export directory (default {})".format(ParquetExport.EXPORTDIR))
+	parser.add_argument("--full", action="store_true", help="export rewrites every month instead of new and changed months")
+	parser.add_argument("--workers", type=int, default=Reparse.WORKERS, help="parse processes of reparse")
+	parser.add_argument("--interval", type=float, default=60, help="seconds between polls of upcoming matches")
+	parser.add_argument("--metrics-port", type=int, default=None, help="serve Prometheus metrics at http://127.0.0.1:port/metrics")
+	parser.add_argument("--summary", type=float, default=30, help="seconds between metrics summary lines, 0 disables")
+	parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"], help="lowest level of logged messages")
+	parser.add_argument("--log-json", action="store_true", help="log JSON lines instead of text")
+	parser.add_argument("--log-sample", type=int, default=0, help="log only every Nth repeated info/debug message after a burst, 0 disables")
+	args = parser.parse_args()
+	LogConfig.Configure(args.log_level, args.log_json, args.log_sample)
+
+	log.info("---HLTVminer starting---")
+
+	if args.metrics_port != None:
+		server = Metrics.ServeMetrics(args.metrics_port)
+		log.info("Metrics at http://127.0.0.1:%s/metrics", server.server_address[1])
+	if args.summary > 0:
+		Metrics.StartSummary(args.summary)
+
+	if args.mode == "reparse":
+		Reparse.Reparse(args.archive or PageArchive.ARCHIVEDIR, args.output or "mcsgo_reparsed.db", args.workers)
+		log.info("---HLTVminer quitting---")
+		return
+	if args.mode == "ratings":
+		ratingLoader(True)
+		log.info("---HLTVminer quitting---")
+		return
+	if args.mode == "export":
+		db = DB("mcsgo.db", "analytics", True)
+		ParquetExport.Export(db, args.output or ParquetExport.EXPORTDIR, args.full)
+		db.Close()
+		log.info("---HLTVminer quitting---")
+		return
 
-	batchLoader()
-	#events = GetFinishedEvents(0, minerdbg)
+	# Raw pages are cached on disk, offline mode only reparses cached pages
+	HLTVCache.OpenCache(HLTVCache.CACHEFILE, offline=args.offline)
+	# Fetched pages are also kept forever in archive for rebuilding database with reparse
+	if args.archive != None:
+		PageArchive.OpenArchive(args.archive)
+	if args.mode == "upcoming":
+		upcomingLoader(args.interval)
+	elif args.mode == "events":
+		db = DB("mcsgo.db")
+		asyncio.run(eventLoader(db, args.pages))
+		db.Close()
+	else:
+		batchLoader(args.mode, args.pages)
 
 	#res = GetTesting()
 	#print(res)
@@ -105,7 +195,10 @@ def main():
 	#res3 = GetEventByName("MThirdEvent", dbdbg)
 	#print(res1, res2, res3)
 
-	print("---HLTVminer quitting---")
+	PageArchive.CloseArchive()
+	log.info("%s", Metrics.SummaryLine())
+	log.info("---HLTVminer quitting---")
 	
 
-main()
\ No newline at end of file
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,100 @@
+# Standard
+import json
+import logging
+import sys
+import threading
+import time
+
+'''
+Logging setup of miner and tools, modules log through logging.getLogger(__name__).
+-Messages are formatted lazily, log.debug("Parsing %s", url) costs one level check when debug is off
+-Hot loops guard expensive arguments with log.isEnabledFor(logging.DEBUG)
+-JSON mode writes one object per line with time, level, logger, msg and extra fields
+-Sampling lets first SAMPLEBURST records of every message template through in each
+ SAMPLEWINDOW, after that only every SAMPLEEVERY:th, warnings and errors are never sampled
+Usage:
+LogConfig.Configure("DEBUG", jsonOutput=True, sample=100)
+log.info("Results page %s queued %s/%s matches", X, queued, total, extra={"page": X})
+'''
+
+FORMAT       = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+SAMPLEBURST  = 20    # Records of one template passed before sampling starts
+SAMPLEWINDOW = 60.0  # Seconds after which burst of template starts again
+SAMPLEEVERY  = 100   # Default 1-in-N sampling after burst
+
+# Attributes every LogRecord has, anything else came from extra={...}
+RECORDATTRS = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+
+# One JSON object per line
+class JSONFormatter(logging.Formatter):
+	def format(self, record):
+		entry = {
+			"time": self.formatTime(record),
+			"level": record.levelname,
+			"logger": record.name,
+			"msg": record.getMessage(),
+		}
+		for key, value in record.__dict__.items():
+			if key not in RECORDATTRS:
+				entry[key] = value
+		if record.exc_info:
+			entry["exc"] = self.formatException(record.exc_info)
+		return json.dumps(entry, default=str)
+
+	def formatTime(self, record, datefmt=None):
+		return time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + ".{:03d}".format(int(record.msecs))
+
+# Samples repeated INFO and DEBUG records per logger and message template
+# Sampled out records are counted and the count is added to next passed record of template
+class SampleFilter(logging.Filter):
+	# Parameters:
+	# every  : pass every N:th record after burst, (int)
+	# burst  : records passed before sampling starts, (int)
+	# window : seconds after which burst starts again, (float)
+	def __init__(self, every=SAMPLEEVERY, burst=SAMPLEBURST, window=SAMPLEWINDOW):
+		super().__init__()
+		self.every = max(1, every)
+		self.burst = burst
+		self.window = window
+		self.lock = threading.Lock()
+		self.counts = {}  # (logger, msg): [window start, records seen, records dropped]
+
+	def filter(self, record):
+		if record.levelno >= logging.WARNING:
+			return True
+		key = (record.name, record.msg)
+		now = time.monotonic()
+		with self.lock:
+			c = self.counts.get(key)
+			if c == None or now - c[0] > self.window:
+				# Records dropped in previous window are reported with first record of new one
+				c = self.counts[key] = [now, 0, c[2] if c != None else 0]
+			c[1] += 1
+			if c[1] <= self.burst or (c[1] - self.burst) % self.every == 0:
+				if c[2] > 0:
+					record.sampled = c[2]
+					c[2] = 0
+				return True
+			c[2] += 1
+			return False
+
+# Configure root logger, replaces handlers set by earlier calls
+# Parameters:
+# level      : level name or number, (str/int)
+# jsonOutput : write JSON lines instead of text, (bool)
+# sample     : 1-in-N sampling of repeated INFO/DEBUG messages, 0 or None disables, (int)
+# stream     : output stream, stderr by default
+#
+# Returns: handler of root logger
+def Configure(level="INFO", jsonOutput=False, sample=None, stream=None):
+	handler = logging.StreamHandler(stream or sys.stderr)
+	handler.setFormatter(JSONFormatter() if jsonOutput else logging.Formatter(FORMAT))
+	if sample:
+		handler.addFilter(SampleFilter(sample))
+
+	root = logging.getLogger()
+	for h in list(root.handlers):
+		root.removeHandler(h)
+	root.addHandler(handler)
+	root.setLevel(level.upper() if isinstance(level, str) else level)
+	return handler
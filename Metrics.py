@@ -0,0 +1,215 @@
+# Standard
+import bisect
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+'''
+Process wide metrics of the miner: counters, gauges and latency histograms.
+-Modules record with Inc/Set/Observe or Timer, all metrics are defined in METRICS
+-ServeMetrics(port) exposes Prometheus text format at http://127.0.0.1:port/metrics
+-StartSummary(interval) prints one summary line every interval seconds
+Parsing in MinerPipeline worker processes is timed inside the worker and recorded by the pipeline,
+other records made inside worker processes stay in those processes.
+Usage:
+with Metrics.Timer("db_write_seconds", op="InsertMap"):
+	...
+Metrics.Inc("hltv_fetch_bytes_total", len(res.content), kind="mapstats")
+'''
+
+log = logging.getLogger(__name__)
+
+METRICSPORT = 9108  # Default port of metrics endpoint
+
+# Histogram buckets in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Known metrics, name: (type, help)
+METRICS = {
+	"hltv_fetch_seconds":       ("histogram", "Latency of page requests by page kind"),
+	"hltv_fetch_bytes_total":   ("counter",   "Bytes downloaded by page kind"),
+	"hltv_fetch_total":         ("counter",   "Page requests by page kind and result"),
+	"hltv_responses_total":     ("counter",   "HTTP responses by status code"),
+	"hltv_retries_total":       ("counter",   "Retried requests"),
+	"hltv_parse_seconds":       ("histogram", "Parse time by function"),
+	"ratelimiter_wait_seconds": ("histogram", "Time waited for rate limiter token"),
+	"db_write_seconds":         ("histogram", "Database insert and commit latency by operation"),
+	"pipeline_queue_depth":     ("gauge",     "Items waiting in miner pipeline queue"),
+	"pipeline_matches_total":   ("counter",   "Matches handled by miner pipeline by result"),
+	"pipeline_parse_wait_seconds": ("histogram", "Time parse calls waited for worker process and pickling"),
+}
+
+# Counts of observations per bucket, sum and count
+class Histogram:
+	def __init__(self, buckets=BUCKETS):
+		self.buckets = buckets
+		self.counts = [0] * (len(buckets) + 1)  # Last is +Inf
+		self.sum = 0.0
+		self.count = 0
+
+	def Observe(self, value):
+		self.counts[bisect.bisect_left(self.buckets, value)] += 1
+		self.sum += value
+		self.count += 1
+
+class Registry:
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.values = {}  # name: {labels: value or Histogram}
+
+	def series(self, name):
+		if name not in METRICS:
+			raise KeyError("Unknown metric " + name)
+		return self.values.setdefault(name, {})
+
+	def Inc(self, name, value=1, labels=()):
+		with self.lock:
+			s = self.series(name)
+			s[labels] = s.get(labels, 0) + value
+
+	def Set(self, name, value, labels=()):
+		with self.lock:
+			self.series(name)[labels] = value
+
+	def Observe(self, name, value, labels=()):
+		with self.lock:
+			s = self.series(name)
+			h = s.get(labels)
+			if h == None:
+				h = s[labels] = Histogram()
+			h.Observe(value)
+
+	# Copy of all values, histograms as (counts, sum, count)
+	def Snapshot(self):
+		with self.lock:
+			res = {}
+			for name, s in self.values.items():
+				res[name] = {l: (list(v.counts), v.sum, v.count) if isinstance(v, Histogram) else v for l, v in s.items()}
+			return res
+
+	def Reset(self):
+		with self.lock:
+			self.values = {}
+
+registry = Registry()
+
+# Labels as sorted tuple, so same labels in any order hit same series
+def labelKey(labels):
+	return tuple(sorted(labels.items()))
+
+def Inc(name, value=1, **labels):
+	registry.Inc(name, value, labelKey(labels))
+
+def Set(name, value, **labels):
+	registry.Set(name, value, labelKey(labels))
+
+def Observe(name, value, **labels):
+	registry.Observe(name, value, labelKey(labels))
+
+# Context manager observing elapsed seconds of block to histogram
+class Timer:
+	def __init__(self, name, **labels):
+		self.name = name
+		self.labels = labels
+
+	def __enter__(self):
+		self.start = time.perf_counter()
+		return self
+
+	def __exit__(self, excType, excValue, tb):
+		self.elapsed = time.perf_counter() - self.start
+		Observe(self.name, self.elapsed, **self.labels)
+		return False
+
+def formatLabels(labels, extra=()):
+	items = list(labels) + list(extra)
+	if len(items) == 0:
+		return ""
+	return "{" + ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in items) + "}"
+
+# Render all metrics in Prometheus text format
+# Returns: (str)
+def Render():
+	snap = registry.Snapshot()
+	lines = []
+	for name in sorted(snap):
+		kind, help = METRICS[name]
+		lines.append("# HELP {} {}".format(name, help))
+		lines.append("# TYPE {} {}".format(name, kind))
+		for labels, v in sorted(snap[name].items()):
+			if kind != "histogram":
+				lines.append("{}{} {}".format(name, formatLabels(labels), v))
+				continue
+			counts, total, count = v
+			cumulative = 0
+			for le, c in zip([str(b) for b in BUCKETS] + ["+Inf"], counts):
+				cumulative += c
+				lines.append("{}_bucket{} {}".format(name, formatLabels(labels, [("le", le)]), cumulative))
+			lines.append("{}_sum{} {}".format(name, formatLabels(labels), total))
+			lines.append("{}_count{} {}".format(name, formatLabels(labels), count))
+	return "\n".join(lines) + "\n"
+
+# Sum and count of histogram over all label sets
+def histogramTotals(snap, name):
+	total, count = 0.0, 0
+	for counts, s, c in snap.get(name, {}).values():
+		total += s
+		count += c
+	return total, count
+
+# One line summary of miner progress
+# Returns: (str)
+def SummaryLine():
+	snap = registry.Snapshot()
+	fetchTime, fetches = histogramTotals(snap, "hltv_fetch_seconds")
+	parseTime, parses = histogramTotals(snap, "hltv_parse_seconds")
+	dbTime, writes = histogramTotals(snap, "db_write_seconds")
+	waitTime, waits = histogramTotals(snap, "ratelimiter_wait_seconds")
+	mbytes = sum(snap.get("hltv_fetch_bytes_total", {}).values()) / 1e6
+	queues = " ".join("{}={}".format(dict(l).get("queue"), v) for l, v in sorted(snap.get("pipeline_queue_depth", {}).items()))
+	matches = {dict(l).get("result"): v for l, v in snap.get("pipeline_matches_total", {}).items()}
+	return "fetches {} ({:.1f}MB, avg {:.0f}ms) | parses {} (avg {:.0f}ms) | db writes {} (avg {:.0f}ms) | limiter wait {:.1f}s | queues {} | matches written {} failed {}".format(
+		fetches, mbytes, 1000 * fetchTime / max(fetches, 1),
+		parses, 1000 * parseTime / max(parses, 1),
+		writes, 1000 * dbTime / max(writes, 1),
+		waitTime, queues or "-", matches.get("written", 0), matches.get("failed", 0))
+
+class metricsHandler(BaseHTTPRequestHandler):
+	def do_GET(self):
+		if self.path.split("?")[0] != "/metrics":
+			self.send_response(404)
+			self.end_headers()
+			return
+		body = Render().encode("utf-8")
+		self.send_response(200)
+		self.send_header("Content-Type", "text/plain; version=0.0.4")
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, format, *args):
+		pass
+
+# Start metrics endpoint on localhost in background thread
+# Parameters:
+# port : port of endpoint, 0 picks free port, (int)
+#
+# Returns: server, server.server_address[1] is port
+def ServeMetrics(port=METRICSPORT):
+	server = ThreadingHTTPServer(("127.0.0.1", port), metricsHandler)
+	threading.Thread(target=server.serve_forever, daemon=True).start()
+	return server
+
+# Print summary line periodically in background thread
+# Parameters:
+# interval : seconds between lines, (float)
+#
+# Returns: threading.Event, set it to stop printing
+def StartSummary(interval=30):
+	stop = threading.Event()
+	def run():
+		while not stop.wait(interval):
+			log.info("%s", SummaryLine())
+	threading.Thread(target=run, daemon=True).start()
+	return stop
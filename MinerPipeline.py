@@ -0,0 +1,249 @@
+# Own
+from mHLTVAPI import ParseMatchResultsPage
+from mHLTVAsync import requestHLTVAsync, GetMatchAsync
+from csgoDB import DB, FLUSHSIZE
+from ParseUtil import SToI
+import Metrics
+
+# Standard
+import asyncio
+import itertools
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+'''
+Miner pipeline with separate fetch and write stages.
+-Producer walks results pages and queues match urls which are not in database
+-Fetchers get matches with mHLTVAsync.GetMatchAsync, match stats and map stats pages of
+ a match are requested concurrently and every page is parsed in a process pool, using all cores
+-Single writer stage owns the csgoDB connection, so sqlite writes stay in one thread,
+ waiting matches are written in batches of one transaction
+Stages are connected with bounded queues, so fast stages wait for slow ones.
+Modes:
+-RunIncremental: walk from newest results page, stop at first page already mined or whose
+ matches are all older than newest match of earlier runs
+-RunBackfill:    walk older pages, resumes from checkpoint stored in CrawlState
+'''
+
+log = logging.getLogger(__name__)
+
+FETCHERS   = 8                    # Matches fetched at once
+PARSERS    = os.cpu_count() or 1  # Parse worker processes
+QUEUESIZE  = 32                   # Max items waiting between stages
+RESUMEMARGIN = 2                  # Results pages walked again when backfill resumes
+SAMPLEINTERVAL = 1.0              # Seconds between queue depth samples
+
+# CrawlState keys
+NEWESTMATCH  = "NewestMatchID"
+OLDESTMATCH  = "OldestMatchID"
+BACKFILLPAGE = "BackfillPage"
+
+# Run function in worker process and measure it there, metrics recorded in workers are not collected
+# Returns: (result of func, seconds spent in func)
+def timedCall(func, *args):
+	starttime = time.perf_counter()
+	res = func(*args)
+	return res, time.perf_counter() - starttime
+
+class MinerPipeline:
+	# Parameters:
+	# dbname  : sqlite database file, (str)
+	# profile : pragma profile of csgoDB.PROFILES, long-lived database needs crash safe default, (str)
+	def __init__(self, dbname, fetchers=FETCHERS, parsers=PARSERS, queueSize=QUEUESIZE, flushSize=FLUSHSIZE, profile="default"):
+		self.fetchers = fetchers
+		self.parsers = parsers
+		self.queueSize = queueSize
+		self.flushSize = flushSize
+
+		self.parsePool = ProcessPoolExecutor(max_workers=parsers)
+		# Database is created and used only in writer thread
+		self.writerPool = ThreadPoolExecutor(max_workers=1)
+		self.db = self.writerPool.submit(DB, dbname, profile).result()
+		self.writerPool.submit(self.db.LoadKnownIDs).result()
+
+		self.queued = set()  # MatchIDs queued during this run
+
+		# Counters
+		self.pagesDone = 0
+		self.matchesWritten = 0
+		self.matchesFailed = 0
+
+	# Run function in writer thread
+	async def dbCall(self, func, *args):
+		loop = asyncio.get_running_loop()
+		return await loop.run_in_executor(self.writerPool, func, *args)
+
+	# Run function in parse process pool
+	# Parse time is measured in worker, rest of the call is waiting for free worker and pickling
+	async def parseCall(self, func, *args):
+		loop = asyncio.get_running_loop()
+		starttime = time.perf_counter()
+		res, seconds = await loop.run_in_executor(self.parsePool, timedCall, func, *args)
+		Metrics.Observe("hltv_parse_seconds", seconds, function=func.__name__)
+		Metrics.Observe("pipeline_parse_wait_seconds", time.perf_counter() - starttime - seconds, function=func.__name__)
+		return res
+
+	# Count handled matches
+	def countMatch(self, result, n=1):
+		if result == "written":
+			self.matchesWritten += n
+		else:
+			self.matchesFailed += n
+		Metrics.Inc("pipeline_matches_total", n, result=result)
+
+	# Count matches of batch flushes, written only after their transaction is committed
+	def countBatch(self, batch, counted):
+		if batch.written > counted[0]:
+			self.countMatch("written", batch.written - counted[0])
+		if batch.failed > counted[1]:
+			self.countMatch("failed", batch.failed - counted[1])
+		return (batch.written, batch.failed)
+
+	# Record queue depths
+	def recordQueues(self, queues):
+		for name, q in queues.items():
+			Metrics.Set("pipeline_queue_depth", q.qsize(), queue=name)
+
+	# Record queue depths until cancelled
+	async def sampleQueues(self, queues):
+		while True:
+			self.recordQueues(queues)
+			await asyncio.sleep(SAMPLEINTERVAL)
+
+	# Queue urls of matches not yet in database from given results pages
+	# Parameters:
+	# stopWhenKnown : stop at first page whose matches are all known or not newer than newest mined match, (bool)
+	async def produce(self, pages, urlQueue, stopWhenKnown):
+		# Newest match of previous runs, read before checkpoints of this run move it
+		newest = None
+		if stopWhenKnown:
+			newest = await self.dbCall(self.db.GetCrawlState, NEWESTMATCH)
+		for X in pages:
+			if X < 0:
+				continue
+			req = await requestHLTVAsync("/results?offset=" + str(X * 100))
+			if req == None:
+				log.warning("Failed to request results page %s, stopping", X)
+				return
+			urls = await self.parseCall(ParseMatchResultsPage, req.content)
+			if len(urls) == 0:
+				log.info("Results page %s is empty, stopping", X)
+				return
+			ids = [SToI(u.split("/")[2]) for u in urls]
+			missing = await self.dbCall(self.db.GetMissingMatchIDs, ids)
+			if missing == None:
+				continue
+			# Results pages shift while mining, skip matches already in pipeline
+			missing = set(i for i in missing if i not in self.queued)
+			if stopWhenKnown and len(missing) == 0:
+				log.info("Results page %s already mined, stopping", X)
+				return
+			queued = 0
+			for mID, u in zip(ids, urls):
+				if mID not in missing:
+					continue
+				self.queued.add(mID)
+				await urlQueue.put(u)
+				queued += 1
+			self.pagesDone += 1
+			await self.dbCall(self.saveCheckpoint, X, ids, stopWhenKnown)
+			log.info("Results page %s queued %s/%s matches", X, queued, len(urls))
+			# Matches failing every run stay missing, so do not walk past pages mined by earlier runs
+			if newest != None and max(ids) <= newest:
+				log.info("Results page %s has no match newer than %s, stopping", X, newest)
+				return
+
+	# Store crawl checkpoints after results page is queued, run in writer thread
+	# Checkpoints are hints only, existence check still decides what is mined
+	def saveCheckpoint(self, X, ids, incremental):
+		if len(ids) == 0:
+			return
+		newest = self.db.GetCrawlState(NEWESTMATCH)
+		oldest = self.db.GetCrawlState(OLDESTMATCH)
+		if newest == None or max(ids) > newest:
+			self.db.SetCrawlState(NEWESTMATCH, max(ids))
+		if oldest == None or min(ids) < oldest:
+			self.db.SetCrawlState(OLDESTMATCH, min(ids))
+		if not incremental:
+			self.db.SetCrawlState(BACKFILLPAGE, X)
+
+	# Fetch and parse queued matches
+	async def fetch(self, urlQueue, writeQueue):
+		while True:
+			matchURL = await urlQueue.get()
+			if matchURL == None:
+				return
+			try:
+				match = await GetMatchAsync(matchURL, self.parseCall)
+			except Exception as e:
+				log.warning("Failed to parse match %s: %s", matchURL, e)
+				match = None
+			if match == None:
+				self.countMatch("failed")
+				continue
+			await writeQueue.put(match)
+
+	# Write parsed matches to database
+	# Matches are batched while more are waiting, so busy writer commits many matches at once
+	async def write(self, writeQueue):
+		batch = self.db.WriteBatch(self.flushSize)
+		counted = (0, 0)
+		while True:
+			match = await writeQueue.get()
+			if match == None:
+				await self.dbCall(batch.Flush)
+				self.countBatch(batch, counted)
+				return
+			await self.dbCall(batch.Add, match)
+			if writeQueue.empty():
+				await self.dbCall(batch.Flush)
+			counted = self.countBatch(batch, counted)
+
+	# Mine matches from given results pages
+	# Parameters:
+	# pages       : iterable of results page numbers, (int)
+	# incremental : stop at first page whose matches are all known, (bool)
+	async def Run(self, pages, incremental=False):
+		urlQueue = asyncio.Queue(self.queueSize)
+		writeQueue = asyncio.Queue(self.queueSize)
+
+		fetchers = [asyncio.create_task(self.fetch(urlQueue, writeQueue)) for i in range(0, self.fetchers)]
+		writer = asyncio.create_task(self.write(writeQueue))
+		queues = {"url": urlQueue, "write": writeQueue}
+		sampler = asyncio.create_task(self.sampleQueues(queues))
+
+		# Shut stages down in order once producer is done
+		await self.produce(pages, urlQueue, incremental)
+		for f in fetchers:
+			await urlQueue.put(None)
+		await asyncio.gather(*fetchers)
+		await writeQueue.put(None)
+		await writer
+		sampler.cancel()
+		self.recordQueues(queues)
+
+		log.info("Pipeline done, pages: %s, matches written: %s, failed: %s", self.pagesDone, self.matchesWritten, self.matchesFailed)
+
+	# Mine new matches from newest results page until already mined page is reached
+	async def RunIncremental(self):
+		log.info("Incremental mining, newest known match: %s", await self.dbCall(self.db.GetCrawlState, NEWESTMATCH))
+		await self.Run(itertools.count(0), True)
+
+	# Mine older matches, continues from page where previous backfill stopped
+	# Parameters:
+	# maxPages : amount of results pages to walk, None walks until stopped, (int)
+	async def RunBackfill(self, maxPages=None):
+		saved = await self.dbCall(self.db.GetCrawlState, BACKFILLPAGE)
+		# Results pages shift when new matches are played, so step back a bit
+		start = max(0, saved - RESUMEMARGIN) if saved != None else 0
+		log.info("Backfill mining from results page %s", start)
+		pages = itertools.count(start)
+		if maxPages != None:
+			pages = range(start, start + maxPages)
+		await self.Run(pages, False)
+
+	def Close(self):
+		self.parsePool.shutdown()
+		self.writerPool.shutdown()
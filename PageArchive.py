@@ -0,0 +1,248 @@
+# Own
+from HLTVCache import PageKind
+from ParseUtil import SToI
+
+# pip, zstandard is optional, pages are compressed with zlib without it
+try:
+	import zstandard
+	CODEC = "zstd"
+except ImportError:
+	zstandard = None
+	CODEC = "zlib"
+
+# Standard
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+'''
+Append-only archive of raw hltv pages for reparsing without network.
+-Every fetched page is appended to current segment file as its own compressed frame,
+ zstd if zstandard is installed, zlib otherwise
+-Segments are never rewritten, new segment is started when current one grows over SEGMENTSIZE
+-Offset index in sqlite maps url to (segment, offset, length) and keeps page kind and
+ MatchID/MapID of page, refetched url points to its newest frame
+-Frames are independent, so any page is read with one seek and one decompress
+Usage:
+PageArchive.OpenArchive("archive")  # requestHLTV appends every fetched or cached page
+archive = PageArchive("archive", readonly=True)
+archive.Get("/matches/2335870/x"), archive.URLs("match")
+'''
+
+log = logging.getLogger(__name__)
+
+ARCHIVEDIR  = "archive"
+INDEXFILE   = "index.db"
+SEGMENTSIZE = 256 * 1024 ** 2  # Bytes per segment before new segment is started
+COMMITEVERY = 100              # Index rows committed at once
+ZSTDLEVEL   = 9
+ZLIBLEVEL   = 6
+
+# Get hltv ID in url of match, match stats and map stats pages
+# Parameters:
+# url : page url in hltv, (str)
+#
+# Returns: MatchID, match stats ID or MapID, None for other pages, (int)
+def PageID(url):
+	kind = PageKind(url)
+	parts = url.split("/")
+	if kind == "match":
+		return SToI(parts[2])
+	if kind == "matchstats":
+		return SToI(parts[3])
+	if kind == "mapstats":
+		return SToI(parts[4])
+	return None
+
+# Compress page to independent frame
+# Returns: (frame, codec)
+def compressPage(content):
+	if CODEC == "zstd":
+		return zstandard.ZstdCompressor(level=ZSTDLEVEL).compress(content), "zstd"
+	return zlib.compress(content, ZLIBLEVEL), "zlib"
+
+def decompressPage(frame, codec):
+	if codec == "zstd":
+		if zstandard == None:
+			raise RuntimeError("Page is zstd compressed, install zstandard to read it")
+		return zstandard.ZstdDecompressor().decompress(frame)
+	return zlib.decompress(frame)
+
+class PageArchive:
+	# Parameters:
+	# path        : archive directory, (str)
+	# readonly    : open for reading only, used by reparse workers, (bool)
+	# segmentSize : bytes per segment, (int)
+	def __init__(self, path=ARCHIVEDIR, readonly=False, segmentSize=SEGMENTSIZE):
+		self.path = path
+		self.readonly = readonly
+		self.segmentSize = segmentSize
+		self.lock = threading.Lock()
+		self.readers = {}   # Open segment files, {segment: file}
+		self.pending = 0    # Index rows not committed yet
+
+		if readonly:
+			uri = "file:{}?mode=ro".format(os.path.abspath(os.path.join(path, INDEXFILE)))
+			self.conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+			return
+
+		os.makedirs(path, exist_ok=True)
+		self.conn = sqlite3.connect(os.path.join(path, INDEXFILE), check_same_thread=False)
+		self.conn.execute("PRAGMA journal_mode = WAL")
+		self.conn.execute('''CREATE TABLE IF NOT EXISTS Pages (
+			URL text PRIMARY KEY,
+			Kind text,
+			ID integer,
+			Segment integer,
+			Offset integer,
+			Length integer,
+			RawLength integer,
+			Codec text,
+			Fetched real)''')
+		self.conn.execute("CREATE INDEX IF NOT EXISTS PagesKindID ON Pages (Kind, ID)")
+		self.conn.commit()
+
+		# Continue appending to newest segment
+		segments = self.segments()
+		self.segment = segments[-1] if len(segments) > 0 else 1
+		self.writer = open(self.segmentPath(self.segment), "ab")
+		self.size = self.writer.tell()
+
+	def segmentPath(self, segment):
+		return os.path.join(self.path, "segment_{:06d}.dat".format(segment))
+
+	# Returns: numbers of existing segments in order, [(int)]
+	def segments(self):
+		res = []
+		for name in os.listdir(self.path):
+			if name.startswith("segment_") and name.endswith(".dat"):
+				res.append(int(name[8:-4]))
+		return sorted(res)
+
+	# Append page to archive
+	# Parameters:
+	# url     : page url in hltv, (str)
+	# content : raw html, (bytes)
+	# replace : archive page again if url is already archived, (bool)
+	def Add(self, url, content, replace=True):
+		if not replace and self.Contains(url):
+			return
+		frame, codec = compressPage(content)
+		with self.lock:
+			if not replace and self.conn.execute('''SELECT 1 FROM Pages WHERE URL = ?''', (url,)).fetchone() != None:
+				return
+			if self.size > 0 and self.size + len(frame) > self.segmentSize:
+				self.writer.close()
+				self.segment += 1
+				self.writer = open(self.segmentPath(self.segment), "ab")
+				self.size = 0
+			offset = self.size
+			self.writer.write(frame)
+			self.size += len(frame)
+			# Frame is on disk before index row points to it
+			self.writer.flush()
+			self.conn.execute('''INSERT OR REPLACE INTO Pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+				(url, PageKind(url), PageID(url), self.segment, offset, len(frame), len(content), codec, time.time()))
+			self.pending += 1
+			if self.pending >= COMMITEVERY:
+				self.conn.commit()
+				self.pending = 0
+
+	# Returns: True if url is archived, (bool)
+	def Contains(self, url):
+		with self.lock:
+			return self.conn.execute('''SELECT 1 FROM Pages WHERE URL = ?''', (url,)).fetchone() != None
+
+	# Read page from archive
+	# Parameters:
+	# url : page url in hltv, (str)
+	#
+	# Returns: raw html, (bytes) or None if page is not archived
+	def Get(self, url):
+		with self.lock:
+			row = self.conn.execute('''SELECT Segment, Offset, Length, Codec FROM Pages WHERE URL = ?''', (url,)).fetchone()
+			if row == None:
+				return None
+			segment, offset, length, codec = row
+			if not self.readonly and segment == self.segment:
+				self.writer.flush()
+			f = self.readers.get(segment)
+			if f == None:
+				f = self.readers[segment] = open(self.segmentPath(segment), "rb")
+			f.seek(offset)
+			frame = f.read(length)
+		return decompressPage(frame, codec)
+
+	# Read newest archived page of kind by hltv ID
+	# Parameters:
+	# kind : "match", "matchstats" or "mapstats", (str)
+	# id   : MatchID, match stats ID or MapID, (int)
+	#
+	# Returns: raw html, (bytes) or None if page is not archived
+	def GetByID(self, kind, id):
+		with self.lock:
+			row = self.conn.execute('''SELECT URL FROM Pages WHERE Kind = ? AND ID = ? ORDER BY Fetched DESC''', (kind, id)).fetchone()
+		if row == None:
+			return None
+		return self.Get(row[0])
+
+	# Urls of archived pages
+	# Parameters:
+	# kind : page kind of HLTVCache.PageKind, None for all pages, (str)
+	#
+	# Returns: urls in archive order, so reading them streams through segments, [(str)]
+	def URLs(self, kind=None):
+		with self.lock:
+			if kind == None:
+				return [r[0] for r in self.conn.execute('''SELECT URL FROM Pages ORDER BY Segment, Offset''')]
+			return [r[0] for r in self.conn.execute('''SELECT URL FROM Pages WHERE Kind = ? ORDER BY Segment, Offset''', (kind,))]
+
+	# Returns: dict of pages, compressed and raw bytes and segment count
+	def Stats(self):
+		with self.lock:
+			pages, size, raw = self.conn.execute('''SELECT COUNT(*), TOTAL(Length), TOTAL(RawLength) FROM Pages''').fetchone()
+		return {"pages": pages, "bytes": int(size), "rawBytes": int(raw), "segments": len(self.segments())}
+
+	# Commit pending index rows
+	def Flush(self):
+		if self.readonly:
+			return
+		with self.lock:
+			self.writer.flush()
+			self.conn.commit()
+			self.pending = 0
+
+	def Close(self):
+		self.Flush()
+		with self.lock:
+			if not self.readonly:
+				self.writer.close()
+			for f in self.readers.values():
+				f.close()
+			self.readers = {}
+			self.conn.close()
+
+# Archive fetched pages are appended to by requestHLTV, None if archiving is disabled
+archive = None
+
+# Append every page fetched from hltv to archive
+# Parameters:
+# path : archive directory, (str)
+#
+# Returns: opened PageArchive
+def OpenArchive(path=ARCHIVEDIR):
+	global archive
+	if archive != None:
+		archive.Close()
+	archive = PageArchive(path)
+	return archive
+
+# Stop archiving pages
+def CloseArchive():
+	global archive
+	if archive != None:
+		archive.Close()
+	archive = None
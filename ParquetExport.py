@@ -0,0 +1,266 @@
+# Own
+from csgoDB import MAPCOLUMNS, QUERYCHUNK, MapIDsToList
+from DataLoader import parseTimes
+
+# pip
+import numpy as np
+# pyarrow is optional, only export needs it
+try:
+	import pyarrow as pa
+	import pyarrow.parquet as pq
+except ImportError:
+	pa = None
+
+# Standard
+import json
+import logging
+import os
+import shutil
+import time
+import zlib
+
+'''
+Exports csgoDB tables to Parquet files partitioned by month of match time.
+-MatchData, MapData, PlayerMapStats and Events are written with typed columns,
+ match times as timestamps, scores and stats as integers and floats, MapIDs as list
+-Every table has hive style partitions <outDir>/<Table>/month=YYYY-MM/part-0.parquet,
+ rows without match time go to month=unknown
+-Maps and player lines belong to month of their match, events to month of their first match
+-_manifest.json keeps fingerprint of every written month, counts and checksums of its rows,
+ later runs write only new months and months whose rows were added, removed or updated,
+ e.g. latest month, months backfilled since or whole history after reparse
+Usage:
+Export(DB("mcsgo.db", "analytics", True), "export")
+pyarrow.dataset.dataset("export/MapData", partitioning="hive").to_table()
+'''
+
+log = logging.getLogger(__name__)
+
+EXPORTDIR   = "export"
+MANIFEST    = "_manifest.json"
+PARTFILE    = "part-0.parquet"
+UNKNOWN     = "unknown"  # Partition of rows without match time
+COMPRESSION = "zstd"
+TABLES      = ["MatchData", "MapData", "PlayerMapStats", "Events"]
+
+# Column types of exported tables
+if pa != None:
+	SCHEMAS = {
+		"MatchData": pa.schema([
+			("MatchID",   pa.int64()),
+			("MatchTime", pa.timestamp("ms")),  # Null if match time is unknown
+			("EventName", pa.string()),
+			("MapIDs",    pa.list_(pa.int64())),
+		]),
+		"MapData": pa.schema([
+			("MapID",        pa.int64()),
+			("MapName",      pa.string()),
+			("Team1",        pa.string()),
+			("Team2",        pa.string()),
+			("T1firsthalf",  pa.int16()),
+			("T2firsthalf",  pa.int16()),
+			("T1secondhalf", pa.int16()),
+			("T2secondhalf", pa.int16()),
+			("T1overtime",   pa.int16()),
+			("T2overtime",   pa.int16()),
+			("T1startside",  pa.string()),   # ct or t
+			("MatchID",      pa.int64()),
+			("MatchTime",    pa.timestamp("ms")),
+		]),
+		"PlayerMapStats": pa.schema([
+			("MapID",               pa.int64()),
+			("TeamIdx",             pa.int8()),  # 0 Team1, 1 Team2
+			("Slot",                pa.int8()),
+			("PlayerName",          pa.string()),
+			("Kills",               pa.int16()),
+			("Assists",             pa.int16()),
+			("Deaths",              pa.int16()),
+			("ADR",                 pa.float32()),
+			("HeadShots",           pa.int16()),
+			("FlashAssists",        pa.int16()),
+			("FirstKillDifference", pa.int16()),
+			("Rating",              pa.float32()),
+		]),
+		"Events": pa.schema([
+			("EventName",      pa.string()),
+			("EventTeams",     pa.string()),
+			("EventPrize",     pa.string()),
+			("EventType",      pa.string()),
+			("Teams",          pa.int32()),
+			("TeamsOpen",      pa.bool_()),
+			("Prize",          pa.int64()),
+			("TypeID",         pa.int8()),   # Index in csgoDB.EVENTTYPES
+			("FirstMatchTime", pa.timestamp("ms")),
+		]),
+	}
+
+# Month partition of each time
+# Returns: list of YYYY-MM or UNKNOWN, [(str)]
+def monthKeys(times):
+	months = times.astype("datetime64[M]").astype(str)
+	return [UNKNOWN if m == "NaT" else str(m) for m in months]
+
+# Timestamp column from datetime64 array, NaT as null
+def timeColumn(times):
+	return pa.array(times.astype("datetime64[ms]"), mask=np.isnat(times), type=pa.timestamp("ms"))
+
+# Checksum of row, fingerprints sum checksums so order of rows does not matter
+def rowChecksum(row):
+	return zlib.crc32(repr(row).encode())
+
+# Fetch rows of IDs in chunks
+def fetchByIDs(db, query, ids):
+	rows = []
+	for i in range(0, len(ids), QUERYCHUNK):
+		chunk = ids[i:i + QUERYCHUNK]
+		rows.extend(db.dbconn.execute(query.format(",".join("?" * len(chunk))), chunk).fetchall())
+	return rows
+
+# Columns of rows by name
+def rowColumns(names, rows):
+	cols = list(zip(*rows)) if len(rows) > 0 else [()] * len(names)
+	return dict(zip(names, cols))
+
+# Build table of schema from columns, values are converted to types of schema
+def buildTable(name, columns):
+	schema = SCHEMAS[name]
+	arrays = []
+	for f in schema:
+		col = columns[f.name]
+		arrays.append(col if isinstance(col, pa.Array) else pa.array(col, type=f.type))
+	return pa.Table.from_arrays(arrays, schema=schema)
+
+# Write table to month partition, file is replaced only after it is fully written
+def writePartition(outDir, name, month, table):
+	path = os.path.join(outDir, name, "month=" + month)
+	os.makedirs(path, exist_ok=True)
+	tmp = os.path.join(path, PARTFILE + ".tmp")
+	pq.write_table(table, tmp, compression=COMPRESSION)
+	os.replace(tmp, os.path.join(path, PARTFILE))
+
+def removePartition(outDir, month):
+	for name in TABLES:
+		shutil.rmtree(os.path.join(outDir, name, "month=" + month), ignore_errors=True)
+
+def loadManifest(outDir):
+	path = os.path.join(outDir, MANIFEST)
+	if not os.path.exists(path):
+		return {}
+	with open(path) as f:
+		return json.load(f)["partitions"]
+
+def saveManifest(outDir, partitions):
+	path = os.path.join(outDir, MANIFEST)
+	with open(path + ".tmp", "w") as f:
+		json.dump({"partitions": partitions, "exported": time.strftime("%Y-%m-%d %H:%M:%S")}, f, indent=1, sort_keys=True)
+	os.replace(path + ".tmp", path)
+
+# Export database to Parquet, only new and changed months are written
+# Parameters:
+# db     : csgoDB.DB, preferably read only, (DB)
+# outDir : export directory, (str)
+# full   : rewrite every month, (bool)
+#
+# Returns: dict of written, unchanged and removed months, None if pyarrow is not installed
+def Export(db, outDir=EXPORTDIR, full=False):
+	if pa == None:
+		log.error("Parquet export needs pyarrow, run 'pip install pyarrow'")
+		return None
+	starttime = time.monotonic()
+
+	# Month of every match, map and event, MatchData and MapData IDs are small enough for memory
+	matches = db.dbconn.execute('''SELECT MatchID, MatchTime, EventName, MapIDs FROM MatchData ORDER BY MatchTime, MatchID''').fetchall()
+	matchTimes = parseTimes([m[1] for m in matches])
+	matchMonths = monthKeys(matchTimes)
+	monthOf = dict(zip((m[0] for m in matches), matchMonths))
+	mapRows = db.dbconn.execute('''SELECT {}, MatchID FROM MapData ORDER BY MapID'''.format(MAPCOLUMNS)).fetchall()
+
+	events = db.dbconn.execute('''SELECT * FROM Events ORDER BY EventName''').fetchall()
+	firstMatch = {}
+	for m, t in zip(matches, matchTimes):
+		if m[2] != None and m[2] not in firstMatch and not np.isnat(t):
+			firstMatch[m[2]] = t
+	eventTimes = np.array([firstMatch.get(e[0], np.datetime64("NaT")) for e in events], dtype="datetime64[m]")
+	eventMonths = monthKeys(eventTimes)
+
+	# Fingerprint of month has row counts and checksums of its rows in every table,
+	# so month changes when any of its rows is added, removed or updated
+	prints = {}
+	def fingerprint(month):
+		if month not in prints:
+			prints[month] = [0, 0, 0, 0, 0, 0, 0, 0]
+		return prints[month]
+	for m, month in zip(matches, matchMonths):
+		fp = fingerprint(month)
+		fp[0] += 1
+		fp[4] += rowChecksum(m)
+	mapMonth = {}
+	for r in mapRows:
+		month = mapMonth[r[0]] = monthOf.get(r[-1], UNKNOWN)
+		fp = fingerprint(month)
+		fp[1] += 1
+		fp[5] += rowChecksum(r)
+	for r in db.dbconn.execute('''SELECT * FROM PlayerMapStats'''):
+		fp = fingerprint(mapMonth.get(r[0], UNKNOWN))
+		fp[2] += 1
+		fp[6] += rowChecksum(r)
+	for e, month in zip(events, eventMonths):
+		fp = fingerprint(month)
+		fp[3] += 1
+		fp[7] += rowChecksum(e)
+
+	old = loadManifest(outDir)
+	changed = sorted(m for m in prints if full or old.get(m) != prints[m])
+	removed = sorted(m for m in old if m not in prints)
+	log.info("Exporting %s to %s, months: %s, changed: %s, removed: %s", db.dbname, outDir, len(prints), len(changed), len(removed))
+
+	# Rows of each month are exported together
+	mapsOf = {}
+	for mapID, month in mapMonth.items():
+		mapsOf.setdefault(month, []).append(mapID)
+	rowsOf = {}
+	for i, month in enumerate(matchMonths):
+		rowsOf.setdefault(month, []).append(i)
+	eventsOf = {}
+	for i, month in enumerate(eventMonths):
+		eventsOf.setdefault(month, []).append(i)
+
+	mapcols = ", ".join("m." + c.strip() for c in MAPCOLUMNS.split(","))
+	rows = {"MatchData": 0, "MapData": 0, "PlayerMapStats": 0, "Events": 0}
+	for month in changed:
+		tables = {}
+		idx = np.array(rowsOf.get(month, []), dtype=np.int64)
+		cols = rowColumns(SCHEMAS["MatchData"].names, [matches[i] for i in idx])
+		cols["MatchTime"] = timeColumn(matchTimes[idx])
+		cols["MapIDs"] = [MapIDsToList(v) if v else [] for v in cols["MapIDs"]]
+		tables["MatchData"] = buildTable("MatchData", cols)
+
+		ids = mapsOf.get(month, [])
+		cols = rowColumns(SCHEMAS["MapData"].names, fetchByIDs(db, '''SELECT {}, m.MatchID, mt.MatchTime FROM MapData m
+			LEFT JOIN MatchData mt ON mt.MatchID = m.MatchID WHERE m.MapID IN ({{}}) ORDER BY m.MapID'''.format(mapcols), ids))
+		cols["MatchTime"] = timeColumn(parseTimes(cols["MatchTime"]))
+		tables["MapData"] = buildTable("MapData", cols)
+
+		cols = rowColumns(SCHEMAS["PlayerMapStats"].names,
+			fetchByIDs(db, '''SELECT * FROM PlayerMapStats WHERE MapID IN ({}) ORDER BY MapID, TeamIdx, Slot''', ids))
+		tables["PlayerMapStats"] = buildTable("PlayerMapStats", cols)
+
+		eidx = np.array(eventsOf.get(month, []), dtype=np.int64)
+		cols = rowColumns(SCHEMAS["Events"].names[:-1], [events[i] for i in eidx])
+		cols["TeamsOpen"] = [None if v == None else bool(v) for v in cols["TeamsOpen"]]
+		cols["FirstMatchTime"] = timeColumn(eventTimes[eidx])
+		tables["Events"] = buildTable("Events", cols)
+
+		for name in TABLES:
+			writePartition(outDir, name, month, tables[name])
+			rows[name] += tables[name].num_rows
+		log.debug("Exported month %s: %s", month, {n: t.num_rows for n, t in tables.items()})
+
+	for month in removed:
+		removePartition(outDir, month)
+	if len(changed) > 0 or len(removed) > 0 or full:
+		os.makedirs(outDir, exist_ok=True)
+		saveManifest(outDir, prints)
+
+	log.info("Export done in %.1fs, written months: %s, rows: %s", time.monotonic() - starttime, len(changed), rows)
+	return {"written": changed, "unchanged": len(prints) - len(changed), "removed": removed, "rows": rows}
@@ -0,0 +1,224 @@
+# Own
+import mHLTVAPI
+from mHLTVAPI import *
+from HLTVCache import PageKind
+from FixtureServer import FIXTUREDIR
+import LogConfig
+
+# Standard
+import os
+import sys
+import time
+
+'''
+Measures parse throughput (pages/sec) of mHLTVAPI parsers over saved fixture pages.
+Fixtures are recorded with FixtureServer.py record, committed fixtures are synthetic.
+Every parser backend configuration is run over same pages:
+-before: html.parser, whole page tree
+-after:  lxml, only needed subtrees
+Map stats extraction is also measured separately over prebuilt soups,
+table driven ExtractMapStats against per-row tree searches it replaced,
+and CheckExtractors verifies both extract same stats from every page.
+
+Usage:
+python ParseBenchmark.py [fixture dir] [repeats]
+'''
+
+# Parser backend configurations, (name, parser, subtrees)
+CONFIGS = [
+	("before", "html.parser", False),
+	("html.parser+subtrees", "html.parser", True),
+	("lxml", "lxml", False),
+	("after", "lxml", True),
+]
+
+# Parse function of each page kind, called with (content, url)
+PARSERS = {
+	"results":    lambda content, url: mHLTVAPI.ParseMatchResultsPage(content),
+	"match":      lambda content, url: mHLTVAPI.ParseMatchPage(content, url),
+	"matchstats": lambda content, url: mHLTVAPI.ParseMatchStatsPage(content),
+	"mapstats":   lambda content, url: mHLTVAPI.ParseMapStats(content, url),
+	"events":     lambda content, url: mHLTVAPI.ParseFinishedEvents(content),
+	"upcoming":   lambda content, url: mHLTVAPI.ParseUpcomingMatches(content),
+}
+
+# Load all fixture pages
+# Parameters:
+# fixtureDir : fixture directory, (str)
+#
+# Returns: dict of page kind to list of (url, content)
+def LoadFixtures(fixtureDir=FIXTUREDIR):
+	pages = {}
+	for root, dirs, files in os.walk(fixtureDir):
+		for f in sorted(files):
+			if not f.endswith(".html"):
+				continue
+			path = os.path.join(root, f)
+			url = "/" + os.path.relpath(path, fixtureDir)[:-len(".html")].replace(os.sep, "/")
+			kind = PageKind(url)
+			if kind not in PARSERS:
+				continue
+			with open(path, "rb") as fp:
+				pages.setdefault(kind, []).append((url, fp.read()))
+	return pages
+
+# Parse all pages of kind repeatedly
+# Returns: pages per second, (float)
+def benchKind(kind, pages, repeats):
+	parse = PARSERS[kind]
+	starttime = time.perf_counter()
+	for r in range(0, repeats):
+		for url, content in pages:
+			parse(content, url)
+	elapsed = time.perf_counter() - starttime
+	return len(pages) * repeats / elapsed
+
+# Run all parser configurations over fixtures
+# Parameters:
+# fixtureDir : fixture directory, (str)
+# repeats    : how many times every page is parsed, (int)
+#
+# Returns: dict of config name to dict of page kind to pages per second
+def RunParseBenchmark(fixtureDir=FIXTUREDIR, repeats=5):
+	pages = LoadFixtures(fixtureDir)
+	oldParser, oldSubtrees = mHLTVAPI.HTMLPARSER, mHLTVAPI.SUBTREEPARSING
+	results = {}
+	try:
+		for name, parser, subtrees in CONFIGS:
+			mHLTVAPI.SetParser(parser, subtrees)
+			results[name] = {}
+			for kind in sorted(pages):
+				results[name][kind] = benchKind(kind, pages[kind], repeats)
+	finally:
+		mHLTVAPI.SetParser(oldParser, oldSubtrees)
+	return results
+
+# Map stats extraction with per-row tree searches, baseline for extraction benchmark
+# Extraction part of original GetMapStats, copied as is without debug prints
+# Parameters:
+# bs     : soup of map stats page, (BeautifulSoup)
+# mapURL : specific map url in hltv, (str)
+#
+# Returns: all map stats, [mapdata]
+def legacyExtractMapStats(bs, mapURL):
+	mapData = [None] * MAPDATALENGTH
+
+	# First parse mapID
+	mapData[MAPID] = SToI(mapURL.split("/")[-2])
+
+	# Parse teamnames, datetime and mapname
+	minfobox = bs.find("div", "match-info-box-con")
+	mapData[TEAM1NAME] = minfobox.find("div", "team-left").contents[0]["title"].strip("\n")
+	mapData[TEAM2NAME] = minfobox.find("div", "team-right").contents[0]["title"].strip("\n")
+	mapData[MAPNAME]   = minfobox.find("div", "small-text").next_sibling.strip()
+
+	# Parse round scores and startside
+	scorebox = minfobox.find_all("div", "match-info-row")[0].find("div", "right").contents
+	t1totalscore          = SToI(scorebox[0].text)
+	t2totalscore          = SToI(scorebox[2].text)
+	mapData[FIRSTHALFT1]  = SToI(scorebox[4].text)
+	mapData[FIRSTHALFT2]  = SToI(scorebox[6].text)
+	mapData[SECONDHALFT1] = SToI(scorebox[8].text)
+	mapData[SECONDHALFT2] = SToI(scorebox[10].text)
+	mapData[OTROUNDST1]   = 0
+	mapData[OTROUNDST2]   = 0
+	if t1totalscore > 16 or t2totalscore > 16:  # If there was more than 16 rounds, read also overtime rounds
+		temp = SToIT(scorebox[11], ':')
+		mapData[OTROUNDST1] = temp[0]
+		mapData[OTROUNDST2] = temp[1]
+	mapData[STARTSIDET1]  = parseStartSide(scorebox[4]["class"][0])
+
+	# Parse all player stats
+	statstable = bs.find_all("table", "stats-table")
+	playercount = 0
+	for i in range(0, 2):
+		tbl = statstable[i].find("tbody").find_all("tr")
+		
+		for j in range(0, 5):
+			player = tbl[j]
+			mIdx = MAPSTATOFFSET + playercount * PLAYERSTATCOUNT
+
+			pkills   = SToIT(player.find("td", "st-kills").text, ' ')  # String 'Kills (Headshots)'
+			passists = SToIT(player.find("td", "st-assists").text, ' ') # String 'Assists (FlashAssists)'
+
+			mapData[mIdx + PNAME]    = player.find("a", href=True).text
+			mapData[mIdx + PKILLS]   = pkills[0]
+			mapData[mIdx + PHS]      = pkills[1]
+			mapData[mIdx + PASSISTS] = passists[0]
+			mapData[mIdx + PFA]      = passists[1]
+			mapData[mIdx + PDEATHS]  = SToI(player.find("td", "st-deaths").text)
+			mapData[mIdx + PADR]     = SToF(player.find("td", "st-adr").text)
+			mapData[mIdx + PFKDIFF]  = SToI(player.contents[-4].text)
+			mapData[mIdx + PRATING]  = SToF(player.find("td", "st-rating").text)
+
+			playercount += 1
+	return mapData
+
+# Extraction functions compared over same soups
+EXTRACTORS = [
+	("per-row search", legacyExtractMapStats),
+	("table plan", mHLTVAPI.ExtractMapStats),
+]
+
+# Compare table driven ExtractMapStats to per-row searches on every map stats fixture
+# Parameters:
+# fixtureDir : fixture directory, (str)
+#
+# Returns: urls of pages where extracted stats differ, [(str)]
+def CheckExtractors(fixtureDir=FIXTUREDIR):
+	mismatches = []
+	for url, content in LoadFixtures(fixtureDir).get("mapstats", []):
+		bs = mHLTVAPI.makeSoup(content, mHLTVAPI.MAPSTATSSUBTREE)
+		if list(mHLTVAPI.ExtractMapStats(bs, url)) != legacyExtractMapStats(bs, url):
+			mismatches.append(url)
+	return mismatches
+
+# Measure map stats extraction only, soups are built once before timing
+# Parameters:
+# fixtureDir : fixture directory, (str)
+# repeats    : how many times every page is extracted, (int)
+#
+# Returns: dict of extractor name to pages per second
+def RunExtractBenchmark(fixtureDir=FIXTUREDIR, repeats=20):
+	pages = LoadFixtures(fixtureDir).get("mapstats", [])
+	soups = [(url, mHLTVAPI.makeSoup(content, mHLTVAPI.MAPSTATSSUBTREE)) for url, content in pages]
+	results = {}
+	if len(soups) == 0:
+		return results
+	for name, extract in EXTRACTORS:
+		starttime = time.perf_counter()
+		for r in range(0, repeats):
+			for url, bs in soups:
+				extract(bs, url)
+		results[name] = len(soups) * repeats / (time.perf_counter() - starttime)
+	return results
+
+def main():
+	LogConfig.Configure("WARNING")
+	fixtureDir = sys.argv[1] if len(sys.argv) > 1 else FIXTUREDIR
+	repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+	results = RunParseBenchmark(fixtureDir, repeats)
+	kinds = sorted({k for r in results.values() for k in r})
+	if len(kinds) == 0:
+		print("No fixture pages found in", fixtureDir)
+		return
+
+	print("{:<22}".format("pages/sec") + "".join("{:>12}".format(k) for k in kinds))
+	for name, _, _ in CONFIGS:
+		print("{:<22}".format(name) + "".join("{:>12.1f}".format(results[name].get(k, 0.0)) for k in kinds))
+	before, after = results["before"], results["after"]
+	print("{:<22}".format("speedup") + "".join("{:>11.2f}x".format(after[k] / before[k]) for k in kinds))
+
+	extract = RunExtractBenchmark(fixtureDir, repeats * 4)
+	if len(extract) > 0:
+		print("\nMap stats extraction, pages/sec")
+		for name, _ in EXTRACTORS:
+			print("{:<22}{:>12.1f}".format(name, extract[name]))
+		print("{:<22}{:>11.2f}x".format("speedup", extract["table plan"] / extract["per-row search"]))
+		mismatches = CheckExtractors(fixtureDir)
+		if len(mismatches) > 0:
+			print("Extractors differ on {} pages: {}".format(len(mismatches), ", ".join(mismatches)))
+
+if __name__ == "__main__":
+	main()
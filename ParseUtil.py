@@ -1,7 +1,12 @@
+# Standard
+import logging
+
 '''
 Helper functions to parse Strings
 '''
 
+log = logging.getLogger(__name__)
+
 # StringToInt
 # Converts string to int
 def SToI(mstr):
@@ -9,7 +14,7 @@ def SToI(mstr):
 	try:
 		res = int(mstr.strip("\n"))
 	except ValueError:
-		print("Failed to convert string '{}' to int!".format(mstr))
+		log.warning("Failed to convert string '%s' to int!", mstr)
 		return 0
 	return res
 
@@ -20,7 +25,7 @@ def SToF(mstr):
 	try:
 		res = float(mstr.strip("\n"))
 	except ValueError:
-		print("Failed to convert string '{}' to float!".format(mstr))
+		log.warning("Failed to convert string '%s' to float!", mstr)
 		return 0.0
 	return res
 
@@ -37,7 +42,7 @@ def SToIT(mstr, sep):
 		res = (int(p1), int(p2))
 
 	except ValueError:
-		print("Failed to convert string '{}' to int tuple!".format(mstr))
+		log.warning("Failed to convert string '%s' to int tuple!", mstr)
 		return (0, 0)
 	return res
 
@@ -53,10 +58,38 @@ def SToFT(mstr, sep):
 			p2 = parts[1].strip(" ()\n")
 		res = (float(p1), float(p2))
 	except ValueError:
-		print("Failed to convert string '{}' to float tuple!".format(mstr))
+		log.warning("Failed to convert string '%s' to float tuple!", mstr)
 		return (0.0, 0.0)
 	return res
 
+# Table cell converters, text of cell is converted without extra strip/split passes
+# int() and float() ignore surrounding whitespace, slow SToI/SToF path is taken only on bad cells
+
+# Cell to int
+def CellInt(cell):
+	text = cell.text
+	try:
+		return int(text)
+	except ValueError:
+		return SToI(text)
+
+# Cell to float
+def CellFloat(cell):
+	text = cell.text
+	try:
+		return float(text)
+	except ValueError:
+		return SToF(text)
+
+# Cell 'a (b)' to int tuple
+def CellIntPair(cell):
+	text = cell.text
+	a, sep, b = text.partition("(")
+	try:
+		return (int(a), int(b.rstrip(") \n")) if sep else 0)
+	except ValueError:
+		return SToIT(text, ' ')
+
 # Helper function to parse start side
 def parseStartSide(mstr):
 	if mstr == "ct-color":
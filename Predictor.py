@@ -0,0 +1,188 @@
+# Own
+from DataLoader import LoadDataset
+from FeatureEngine import FEATURES, WINDOW, ComputeMapFeatures, CurrentTeamFeatures, TeamMapRows, LatestSums, ratio, DEFAULTS
+import Rating
+
+# pip
+import numpy as np
+
+# Standard
+import logging
+
+'''
+Predicts map win probabilities with logistic regression trained on map history.
+-Model input is difference of team features (FeatureEngine) and Elo difference (Rating)
+-Elo before every map and current Elo are read from ratings csgoDB stores,
+ history is replayed only when stored ratings are stale or other K factor is asked
+-Training rows are used both ways around, so model has no bias towards Team1
+-Current feature vector of every team is computed once and cached,
+ so whole list of matchups is scored with one matrix multiply
+Usage:
+p = Predictor(db)
+p.Predict("NaVi", "G2", "Inferno")
+p.PredictBatch([("NaVi", "G2", None), ("FaZe", "Vitality", "Mirage")])
+'''
+
+log = logging.getLogger(__name__)
+
+L2         = 1.0  # L2 regularization of weights
+ITERATIONS = 25   # Max Newton iterations in training
+TOLERANCE  = 1e-8 # Stop when weights change less than this
+
+# Model input columns
+INPUTS = FEATURES + ["Elo"]
+
+# Train logistic regression with Newton's method
+# Parameters:
+# X  : inputs (rows, features), (float array)
+# y  : targets 0..1, (float array)
+# l2 : L2 regularization, (float)
+#
+# Returns: weights (features,)
+def TrainLogistic(X, y, l2=L2, iterations=ITERATIONS):
+	w = np.zeros(X.shape[1])
+	reg = l2 * np.eye(X.shape[1])
+	for i in range(0, iterations):
+		p = 1.0 / (1.0 + np.exp(-(X @ w)))
+		grad = X.T @ (p - y) + l2 * w
+		hess = (X * (p * (1.0 - p))[:, None]).T @ X + reg
+		step = np.linalg.solve(hess, grad)
+		w -= step
+		if np.max(np.abs(step)) < TOLERANCE:
+			break
+	return w
+
+class Predictor:
+	# Parameters:
+	# db     : csgoDB.DB to load history from, (DB)
+	# window : rolling feature window in maps, (int)
+	# k      : Elo K factor, None uses ratings stored in db, (float)
+	def __init__(self, db, window=WINDOW, k=None):
+		self.window = window
+		self.k = k
+		data = LoadDataset(db)
+		self.Train(data, self.storedRatings(db, data) if k == None else None)
+
+	# Elo inputs from ratings stored in database
+	# Parameters:
+	# db   : csgoDB.DB, (DB)
+	# data : DataLoader.Dataset loaded from db
+	#
+	# Returns: (team ratings before every map (maps, 2), current team ratings (teams,)) or None if not usable
+	def storedRatings(self, db, data):
+		if db.RatingsStale():
+			log.info("Stored ratings are stale, replaying rating history")
+			return None
+		current = db.GetTeamRatings()
+		history = db.GetTeamRatingHistory()
+		if current == None or history == None:
+			return None
+
+		before = {(mapID, name): r for mapID, name, r in history}
+		names = data.teams.names
+		maps = data.maps
+		pre = np.empty((len(maps), 2))
+		for i, (mapID, t1, t2) in enumerate(zip(maps["MapID"].tolist(), maps["Team1"].tolist(), maps["Team2"].tolist())):
+			r1 = before.get((mapID, names[t1]))
+			r2 = before.get((mapID, names[t2]))
+			if r1 == None or r2 == None:
+				log.info("Map %s has no stored rating, replaying rating history", mapID)
+				return None
+			pre[i] = (r1, r2)
+		return pre, np.array([current.get(n, Rating.INITIAL) for n in names], dtype=np.float64)
+
+	# Train model on dataset and cache current feature vectors of all teams
+	# Parameters:
+	# data    : DataLoader.Dataset
+	# ratings : result of storedRatings, None replays ratings of data
+	def Train(self, data, ratings=None):
+		self.data = data
+		if ratings == None:
+			replay = Rating.ReplayRatings(data, [self.k if self.k != None else Rating.K], True)
+			pre = replay["teamHistory"][:, :, 0]
+			current = replay["teams"][0]
+		else:
+			pre, current = ratings
+
+		# Pre-match inputs of every map
+		X1, X2, y = ComputeMapFeatures(data, self.window)
+		elo = (pre[:, 0] - pre[:, 1]) / Rating.SCALE
+		X = np.column_stack([X1 - X2, elo])
+
+		# Scale inputs to comparable ranges, no centering so swapped teams give 1 - p
+		# Without maps model has zero weights and predicts 0.5 for every matchup
+		if len(y) > 0:
+			self.scale = np.std(np.r_[X, -X], axis=0)
+			self.scale[~np.isfinite(self.scale) | (self.scale == 0)] = 1.0
+			Xs = np.r_[X, -X] / self.scale
+			self.weights = TrainLogistic(Xs, np.r_[y, 1.0 - y])
+		else:
+			log.warning("No maps to train on, predicting 0.5 for every matchup")
+			self.scale = np.ones(len(INPUTS))
+			Xs = np.empty((0, len(INPUTS)))
+			self.weights = np.zeros(len(INPUTS))
+
+		# Cached current team vectors, last row is unknown team
+		nteams = len(data.teams)
+		self.teamVectors = np.empty((nteams + 1, len(INPUTS)))
+		self.teamVectors[:nteams, :len(FEATURES)] = CurrentTeamFeatures(data, self.window)
+		self.teamVectors[:nteams, -1] = current / Rating.SCALE
+		self.teamVectors[nteams] = self.defaultVector()
+		self.mapWinRates = self.currentMapWinRates(data)
+
+		if log.isEnabledFor(logging.DEBUG):
+			p = 1.0 / (1.0 + np.exp(-(Xs[:len(y)] @ self.weights)))
+			log.debug("Trained on %s maps, accuracy %.3f", len(y), np.mean((p > 0.5) == (y > 0.5)) if len(y) > 0 else 0.0)
+			log.debug("Weights: %s", {n: round(float(w), 3) for n, w in zip(INPUTS, self.weights)})
+
+	# Input vector of team without history
+	def defaultVector(self):
+		v = np.zeros(len(INPUTS))
+		for i, name in enumerate(FEATURES):
+			v[i] = DEFAULTS.get(name, 0.0)
+		v[-1] = Rating.INITIAL / Rating.SCALE
+		return v
+
+	# Current win rate of every team on every map, (teams + 1, maps + 1)
+	# Map without history gets default like in training, unknown map gets overall win rate
+	def currentMapWinRates(self, data):
+		nteams = len(data.teams)
+		nmaps = max(len(data.mapnames), 1)
+		rates = np.full((nteams + 1, nmaps + 1), DEFAULTS["MapWinRate"])
+		rates[:, nmaps] = self.teamVectors[:, FEATURES.index("WinRate")]
+		rows = TeamMapRows(data)
+		group = rows["Team"].astype(np.int64) * nmaps + rows["Map"]
+		order = np.lexsort((rows["MapRow"], group))
+		groups, sums, counts = LatestSums(group[order], rows["Won"][order], self.window)
+		rates[groups // nmaps, groups % nmaps] = ratio(sums, counts, DEFAULTS["MapWinRate"])
+		return rates
+
+	# Rows of teamVectors and columns of mapWinRates for names, unknown names get last one
+	def lookup(self, names, codes, unknown):
+		return np.array([codes.codes.get(n, unknown) for n in names], dtype=np.int64)
+
+	# Predict Team1 win probabilities of many matchups at once
+	# Parameters:
+	# matchups : [(team1, team2)] or [(team1, team2, mapname)], mapname may be None
+	#
+	# Returns: Team1 win probabilities, (float array)
+	def PredictBatch(self, matchups):
+		if len(matchups) == 0:
+			return np.empty(0)
+		t1 = self.lookup([m[0] for m in matchups], self.data.teams, len(self.teamVectors) - 1)
+		t2 = self.lookup([m[1] for m in matchups], self.data.teams, len(self.teamVectors) - 1)
+		maps = self.lookup([m[2] if len(m) > 2 else None for m in matchups], self.data.mapnames, self.mapWinRates.shape[1] - 1)
+
+		X = self.teamVectors[t1] - self.teamVectors[t2]
+		col = FEATURES.index("MapWinRate")
+		X[:, col] = self.mapWinRates[t1, maps] - self.mapWinRates[t2, maps]
+		return 1.0 / (1.0 + np.exp(-((X / self.scale) @ self.weights)))
+
+	# Predict probability of team1 winning against team2
+	# Parameters:
+	# team1, team2 : team names, (str)
+	# mapname      : map name, None if map is not known yet, (str)
+	#
+	# Returns: Team1 win probability, (float)
+	def Predict(self, team1, team2, mapname=None):
+		return float(self.PredictBatch([(team1, team2, mapname)])[0])
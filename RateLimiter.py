@@ -0,0 +1,106 @@
+# Standard
+import threading
+import time
+
+'''
+Token bucket rate limiter shared by all requests to hltv.
+-Bucket is refilled with `rate` tokens per second up to `burst` tokens
+-Every request takes one token, waiting if bucket is empty
+-Rate is halved when server answers 429 and lowered when responses get slow,
+ then slowly recovers back to target rate
+'''
+
+TARGETRATE   = 2.0  # Requests per second when server is happy
+BURST        = 4    # Max requests allowed back to back
+MINRATE      = 0.1  # Rate never drops below this
+SLOWRESPONSE = 3.0  # Responses slower than this (seconds) lower the rate
+RECOVERY     = 0.05 # Requests per second added back after each good response
+
+class TokenBucket:
+	def __init__(self, rate=TARGETRATE, burst=BURST, minRate=MINRATE, adaptive=True):
+		self.targetRate = rate
+		self.rate = rate
+		self.burst = burst
+		self.minRate = minRate
+		self.adaptive = adaptive
+		self.tokens = float(burst)
+		self.last = time.monotonic()
+		self.lock = threading.Lock()
+
+		# Counters
+		self.requests = 0      # Tokens handed out
+		self.waitTime = 0.0    # Total seconds spent waiting for tokens
+		self.throttled = 0     # Responses with status 429
+		self.slowResponses = 0 # Responses slower than SLOWRESPONSE
+
+	# Add tokens for elapsed time, lock must be held
+	def refill(self):
+		now = time.monotonic()
+		self.tokens = min(float(self.burst), self.tokens + (now - self.last) * self.rate)
+		self.last = now
+
+	# Take one token, blocks until token is available
+	# Returns: seconds waited, (float)
+	def Acquire(self):
+		waited = 0.0
+		while True:
+			with self.lock:
+				self.refill()
+				if self.tokens >= 1.0:
+					self.tokens -= 1.0
+					self.requests += 1
+					self.waitTime += waited
+					return waited
+				sleeptime = (1.0 - self.tokens) / self.rate
+			time.sleep(sleeptime)
+			waited += sleeptime
+
+	# Adjust rate based on server response
+	# Parameters:
+	# status  : http status of response, None if request failed, (int)
+	# latency : seconds the request took, (float)
+	def Feedback(self, status, latency):
+		with self.lock:
+			if status == 429:
+				self.throttled += 1
+			elif latency > SLOWRESPONSE:
+				self.slowResponses += 1
+
+			if not self.adaptive:
+				return
+			self.refill()
+			if status == 429:
+				self.rate = max(self.minRate, self.rate * 0.5)
+				self.tokens = 0.0  # Stop burst already waiting
+			elif status == None or status >= 500 or latency > SLOWRESPONSE:
+				self.rate = max(self.minRate, self.rate * 0.8)
+			else:
+				self.rate = min(self.targetRate, self.rate + RECOVERY)
+
+	# Change target rate and burst
+	def Configure(self, rate=None, burst=None, adaptive=None):
+		with self.lock:
+			self.refill()
+			if rate != None:
+				self.targetRate = rate
+				self.rate = rate
+			if burst != None:
+				self.burst = burst
+				self.tokens = min(self.tokens, float(burst))
+			if adaptive != None:
+				self.adaptive = adaptive
+
+	# Returns: dict of counters and current rate
+	def Stats(self):
+		with self.lock:
+			return {
+				"requests": self.requests,
+				"waitTime": self.waitTime,
+				"throttled": self.throttled,
+				"slowResponses": self.slowResponses,
+				"rate": self.rate,
+				"targetRate": self.targetRate,
+			}
+
+# Limiter shared by all requests in process
+limiter = TokenBucket()
@@ -0,0 +1,180 @@
+# pip
+import numpy as np
+
+'''
+Elo ratings of teams and players from map results.
+-Team rating is updated from map winner, expected score from rating difference
+-Player rating is updated from same result against average rating of opposing players
+-csgoDB updates stored ratings incrementally when maps are inserted, batches in match time order,
+ maps older than already rated ones mark ratings stale until RebuildRatings replays history
+-ReplayRatings replays whole history for many K factors at once to tune parameters
+Usage:
+data = LoadDataset(db)
+k, losses = TuneK(data, [16, 24, 32, 48])
+RebuildRatings(db, data, k)
+'''
+
+INITIAL = 1500.0  # Rating of new team/player
+K       = 32.0    # Rating change factor
+SCALE   = 400.0   # Rating difference where stronger side is 10 times as likely to win
+
+# RatingHistory kinds
+TEAMRATING   = 0
+PLAYERRATING = 1
+
+# Expected score of side a against side b
+def Expected(ra, rb):
+	return 1.0 / (1.0 + 10.0 ** ((rb - ra) / SCALE))
+
+# Result of map for Team1, 1 win, 0.5 draw, 0 loss
+def MapResult(t1rounds, t2rounds):
+	return np.where(t1rounds > t2rounds, 1.0, np.where(t1rounds == t2rounds, 0.5, 0.0))
+
+# New ratings of two sides after map
+# Parameters:
+# r1, r2 : ratings before map, floats or arrays
+# result : result for side 1, (float)
+# k      : K factor, float or array
+#
+# Returns: ratings after map
+def UpdatePair(r1, r2, result, k=K):
+	d = k * (result - Expected(r1, r2))
+	return r1 + d, r2 - d
+
+# New ratings of players after map, every player is rated against opposing players' average
+# Parameters:
+# p1, p2 : ratings of Team1 and Team2 players before map, arrays (..., players), NaN for missing player
+# result : result for Team1, (float)
+# k      : K factor, float or array broadcastable to (..., 1)
+#
+# Returns: player ratings after map
+def UpdatePlayers(p1, p2, result, k=K):
+	a1 = np.nanmean(p1, axis=-1, keepdims=True)
+	a2 = np.nanmean(p2, axis=-1, keepdims=True)
+	return p1 + k * (result - Expected(p1, a2)), p2 + k * ((1.0 - result) - Expected(p2, a1))
+
+# Replay rating history of all maps in time order, vectorized over K factors
+# Parameters:
+# data    : DataLoader.Dataset
+# kValues : K factors to replay, [(float)]
+# history : record ratings before and after every map for first K factor, (bool)
+#
+# Returns: dict with
+#  "teams"       : final team ratings (len(kValues), len(data.teams))
+#  "players"     : final player ratings (len(kValues), len(data.playerNames))
+#  "expected"    : expected Team1 score before every map (len(kValues), len(data.maps))
+#  "logloss"     : log loss of expected scores per K factor (len(kValues),)
+#  "teamHistory" / "playerHistory" : ratings before and after maps when history is set
+def ReplayRatings(data, kValues=(K,), history=False):
+	maps = data.maps
+	nk = len(kValues)
+	nmaps = len(maps)
+	kcol = np.asarray(kValues, dtype=np.float64)
+	teams = np.full((nk, max(len(data.teams), 1)), INITIAL)
+	players = np.full((nk, max(len(data.playerNames), 1) + 1), INITIAL)
+	missing = players.shape[1] - 1  # Last column is missing player, always NaN
+	players[:, missing] = np.nan
+	expected = np.empty((nk, nmaps))
+
+	t1 = maps["T1firsthalf"].astype(np.int32) + maps["T1secondhalf"] + maps["T1overtime"]
+	t2 = maps["T2firsthalf"].astype(np.int32) + maps["T2secondhalf"] + maps["T2overtime"]
+	results = MapResult(t1, t2)
+
+	# Player codes of every map, (maps, 2, 5), missing players point to last column
+	lineup = np.full((nmaps, 2, 5), missing, dtype=np.int64)
+	pmap = data.PlayerMapRows()
+	ok = (pmap >= 0) & (data.players["Slot"] < 5)
+	lineup[pmap[ok], data.players["TeamIdx"][ok], data.players["Slot"][ok]] = data.players["Player"][ok]
+	rated = (lineup != missing).any(axis=2).all(axis=1)  # Both teams have players
+
+	if history:
+		teamHistory = np.empty((nmaps, 2, 2))
+		playerHistory = np.empty((nmaps, 2, 5, 2))
+
+	team1 = maps["Team1"]
+	team2 = maps["Team2"]
+	for i in range(0, nmaps):
+		a, b, res = team1[i], team2[i], results[i]
+		r1, r2 = teams[:, a], teams[:, b]
+		expected[:, i] = Expected(r1, r2)
+		n1, n2 = UpdatePair(r1, r2, res, kcol)
+
+		l1, l2 = lineup[i, 0], lineup[i, 1]
+		p1, p2 = players[:, l1], players[:, l2]
+		np1, np2 = p1, p2
+		if rated[i]:
+			np1, np2 = UpdatePlayers(p1, p2, res, kcol[:, None])
+
+		if history:
+			teamHistory[i, 0] = (r1[0], n1[0])
+			teamHistory[i, 1] = (r2[0], n2[0])
+			playerHistory[i, 0, :, 0], playerHistory[i, 0, :, 1] = p1[0], np1[0]
+			playerHistory[i, 1, :, 0], playerHistory[i, 1, :, 1] = p2[0], np2[0]
+
+		teams[:, a], teams[:, b] = n1, n2
+		players[:, l1], players[:, l2] = np1, np2
+		players[:, missing] = np.nan
+
+	eps = 1e-12
+	logloss = -np.mean(results * np.log(expected + eps) + (1.0 - results) * np.log(1.0 - expected + eps), axis=1) if nmaps > 0 else np.zeros(nk)
+
+	res = {
+		"teams": teams[:, :len(data.teams)],
+		"players": players[:, :len(data.playerNames)],
+		"expected": expected,
+		"logloss": logloss,
+	}
+	if history:
+		res["teamHistory"] = teamHistory
+		res["playerHistory"] = playerHistory
+		res["lineup"] = lineup
+		res["missing"] = missing
+		res["rated"] = rated
+	return res
+
+# Find K factor with best log loss over history
+# Parameters:
+# data    : DataLoader.Dataset
+# kValues : K factors to try, [(float)]
+#
+# Returns: best K factor and log loss of every K factor
+def TuneK(data, kValues):
+	res = ReplayRatings(data, kValues)
+	return kValues[int(np.argmin(res["logloss"]))], res["logloss"]
+
+# Replace stored ratings with full replay of history in time order
+# Incremental updates apply maps in insert order, so rebuild after backfilling older maps
+# Parameters:
+# db   : csgoDB.DB
+# data : DataLoader.Dataset loaded from same database
+# k    : K factor, (float)
+#
+# Returns: True if success, False in case of Error
+def RebuildRatings(db, data, k=K):
+	res = ReplayRatings(data, [k], True)
+	maps = data.maps
+	missing, rated = res["missing"], res["rated"]
+	teamMaps = np.bincount(np.r_[maps["Team1"], maps["Team2"]], minlength=len(data.teams))
+	playerMaps = np.bincount(data.players["Player"], minlength=len(data.playerNames))
+
+	historyRows = []
+	lastTeam = {}
+	lastPlayer = {}
+	th, ph, lineup = res["teamHistory"], res["playerHistory"], res["lineup"]
+	for i in range(0, len(maps)):
+		mapID = int(maps["MapID"][i])
+		for side, team in ((0, maps["Team1"][i]), (1, maps["Team2"][i])):
+			historyRows.append((mapID, TEAMRATING, data.teams.names[team], float(th[i, side, 0]), float(th[i, side, 1])))
+			lastTeam[int(team)] = mapID
+			for s in range(0, 5):
+				code = lineup[i, side, s]
+				if code != missing and rated[i]:
+					historyRows.append((mapID, PLAYERRATING, data.playerNames.names[code], float(ph[i, side, s, 0]), float(ph[i, side, s, 1])))
+					lastPlayer[int(code)] = mapID
+
+	teamRows = [(data.teams.names[i], float(res["teams"][0, i]), int(teamMaps[i]), lastTeam.get(i))
+		for i in range(0, len(data.teams))]
+	playerRows = [(data.playerNames.names[i], float(res["players"][0, i]), int(playerMaps[i]), lastPlayer.get(i))
+		for i in range(0, len(data.playerNames))]
+
+	return db.StoreRatings(teamRows, playerRows, historyRows)
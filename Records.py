@@ -0,0 +1,193 @@
+# Standard
+from operator import itemgetter
+
+'''
+Typed records of parsed hltv pages, passed from parsers to database inserts.
+-MatchRecord: row of MatchData with MapRecords of played maps in .maps
+-MapRecord:   mapdata row, 11 map values followed by 9 stats of each of 10 players
+-PlayerLine:  named view to stats of one player inside MapRecord
+Records are lists with __slots__, so a map is still one flat list without
+per-instance dict, fields are read by name instead of index arithmetic and
+csgoDB inserts rows straight from records without rebuilding them.
+Usage:
+match = GetMatch(matchURL)
+match.maps[0].team1, match.maps[0].Player(0).kills
+db.InsertMatchesWithMaps([match])
+'''
+
+# MatchData row contains [MatchID (int), Time (DateTime (str, YYYY-MM-DD HH:MM), Event (str), MapIDs (str)]
+MATCHDATALENGTH = 4
+MATCHID    = 0 # MatchID, same as in hltv
+MATCHTIME  = 1 # Match time, form YYYY-MM-DD HH:MM
+MATCHEVENT = 2 # Event name
+MAPIDS     = 3 # 1-5 MapIDs as string separated by '_'
+
+# First 11 elements in mapdata list are some general data
+# Rest elements are player stats
+MAPDATALENGTH = 101  # Total length of mapdata
+MAPSTATOFFSET = 11   # Amount of map stat items in list
+PLAYERSTATCOUNT = 9  # Amount of stats per player
+PLAYERS = 10         # Players per map, 5 per team, Team1 first
+
+# Indices in mapdata
+MAPID        = 0  # MapID, same as in hltv
+MAPNAME      = 1  # Map name
+TEAM1NAME    = 2  # Team1 name
+TEAM2NAME    = 3  # Team2 name
+FIRSTHALFT1  = 4  # First half Team1 rounds
+FIRSTHALFT2  = 5  # First half Team2 rounds
+SECONDHALFT1 = 6  # Second half Team1 rounds
+SECONDHALFT2 = 7  # Second half Team2 rounds
+OTROUNDST1   = 8  # Overtime Team1 rounds
+OTROUNDST2   = 9  # Overtime Team2 rounds
+STARTSIDET1  = 10 # Start side of Team1
+
+# Player stat indice offsets in mapdata, also indices of PlayerLine
+# Idx = MAPSTATOFFSET + PX * PLAYERSTATCOUNT + Offset
+# PX 1-10
+PNAME    = 0 # Team1 player1 name
+PKILLS   = 1 # Team1 player1 kills
+PASSISTS = 2 # Team1 player1 assists
+PDEATHS  = 3 # Team1 player1 deaths
+PADR     = 4 # Team1 player1 AverageDamageperRound
+PHS      = 5 # Team1 player1 HeadShot %
+PFA      = 6 # Team1 player1 FlashAssists
+PFKDIFF  = 7 # Team1 player1 FirstKill difference
+PRATING  = 8 # Team1 player1 Rating
+
+# Named read/write field of list record
+def field(idx):
+	def setter(self, value):
+		self[idx] = value
+	return property(itemgetter(idx), setter)
+
+# Named field of PlayerLine, offset from start of player stats
+def playerField(offset):
+	def getter(self):
+		return self.record[self.base + offset]
+	def setter(self, value):
+		self.record[self.base + offset] = value
+	return property(getter, setter)
+
+class PlayerLine:
+	__slots__ = ("record", "base")
+
+	# Parameters:
+	# record : map the player belongs to, (MapRecord)
+	# index  : player 0-9, Team1 players are 0-4, (int)
+	def __init__(self, record, index):
+		self.record = record
+		self.base = MAPSTATOFFSET + index * PLAYERSTATCOUNT
+
+	name          = playerField(PNAME)
+	kills         = playerField(PKILLS)
+	assists       = playerField(PASSISTS)
+	deaths        = playerField(PDEATHS)
+	adr           = playerField(PADR)
+	headshots     = playerField(PHS)
+	flashAssists  = playerField(PFA)
+	firstKillDiff = playerField(PFKDIFF)
+	rating        = playerField(PRATING)
+
+	# Stats by offset PNAME..PRATING
+	def __getitem__(self, offset):
+		return self.record[self.base + offset]
+
+	def __setitem__(self, offset, value):
+		self.record[self.base + offset] = value
+
+	# Returns: stats in PlayerMapStats column order, (name, kills, assists, deaths, adr, headshots, flashAssists, firstKillDiff, rating)
+	def Row(self):
+		return tuple(self.record[self.base:self.base + PLAYERSTATCOUNT])
+
+	def __repr__(self):
+		return "PlayerLine" + repr(self.Row())
+
+class MapRecord(list):
+	__slots__ = ()
+
+	# Parameters:
+	# mapID  : mapID, same as in hltv, (int)
+	# values : full mapdata to wrap, MAPDATALENGTH values, ([])
+	def __init__(self, mapID=None, values=None):
+		if values == None:
+			values = [None] * MAPDATALENGTH
+			values[MAPID] = mapID
+		super().__init__(values)
+
+	mapID        = field(MAPID)
+	mapName      = field(MAPNAME)
+	team1        = field(TEAM1NAME)
+	team2        = field(TEAM2NAME)
+	t1FirstHalf  = field(FIRSTHALFT1)
+	t2FirstHalf  = field(FIRSTHALFT2)
+	t1SecondHalf = field(SECONDHALFT1)
+	t2SecondHalf = field(SECONDHALFT2)
+	t1Overtime   = field(OTROUNDST1)
+	t2Overtime   = field(OTROUNDST2)
+	t1StartSide  = field(STARTSIDET1)
+
+	# Stats of one player
+	# Parameters:
+	# index : player 0-9, Team1 players are 0-4, (int)
+	#
+	# Returns: PlayerLine
+	def Player(self, index):
+		return PlayerLine(self, index)
+
+	@property
+	def players(self):
+		return [PlayerLine(self, i) for i in range(0, PLAYERS)]
+
+	# Row of MapData insert
+	# Parameters:
+	# matchID : matchID of match the map belongs to, (int)
+	def MapRow(self, matchID):
+		row = self[:MAPSTATOFFSET]
+		row.append(matchID)
+		return row
+
+	# Row of wide PlayerStats insert, mapID and 9 values of each player
+	def StatsRow(self):
+		row = self[MAPSTATOFFSET - 1:]
+		row[0] = self[MAPID]
+		return row
+
+	# Rows of PlayerMapStats insert, (MapID, TeamIdx, Slot) and player stats
+	def PlayerRows(self):
+		rows = []
+		for i in range(0, PLAYERS):
+			base = MAPSTATOFFSET + i * PLAYERSTATCOUNT
+			rows.append((self[MAPID], i // 5, i % 5) + tuple(self[base:base + PLAYERSTATCOUNT]))
+		return rows
+
+	# Total rounds of both teams, missing scores count as 0
+	# Returns: (int, int)
+	def Rounds(self):
+		t1 = sum(v for v in self[FIRSTHALFT1:STARTSIDET1:2] if v != None)
+		t2 = sum(v for v in self[FIRSTHALFT2:STARTSIDET1:2] if v != None)
+		return t1, t2
+
+	# Player names of team
+	# Parameters:
+	# team : 0 for Team1, 1 for Team2, (int)
+	def TeamPlayers(self, team):
+		start = MAPSTATOFFSET + team * 5 * PLAYERSTATCOUNT
+		return self[start + PNAME:start + 5 * PLAYERSTATCOUNT:PLAYERSTATCOUNT]
+
+class MatchRecord(list):
+	__slots__ = ("maps",)
+
+	# Parameters:
+	# matchID : matchID, same as in hltv, (int)
+	# time    : match time, form YYYY-MM-DD HH:MM, (str)
+	# event   : event name, (str)
+	# maps    : played maps, MapIDs of row are taken from them, [MapRecord]
+	def __init__(self, matchID=None, time=None, event=None, maps=None):
+		self.maps = maps if maps != None else []
+		super().__init__((matchID, time, event, "_".join(str(m[MAPID]) for m in self.maps)))
+
+	matchID = field(MATCHID)
+	time    = field(MATCHTIME)
+	event   = field(MATCHEVENT)
+	mapIDs  = field(MAPIDS)
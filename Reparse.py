@@ -0,0 +1,128 @@
+# Own
+from mHLTVAPI import ParseMatchPage, ParseMatchPages, ParseFinishedEvents
+from PageArchive import PageArchive, PageID, ARCHIVEDIR
+from MinerPipeline import NEWESTMATCH, OLDESTMATCH
+from csgoDB import DB, FLUSHSIZE
+from DataLoader import LoadDataset
+import Rating
+
+# Standard
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+'''
+Rebuilds csgoDB from pages in PageArchive without network.
+-Match pages are read in archive order and parsed in a process pool, every worker
+ opens archive read only and reads match stats and map stats pages of its match itself
+-Parsed matches are written in batches by main process into new database
+-Ratings are not updated per map while inserting, full history is replayed once at the end
+-Events are reparsed from archived event archive pages
+Usage:
+Reparse("archive", "mcsgo_new.db")
+python HLTVminer.py reparse --archive archive --output mcsgo_new.db
+'''
+
+log = logging.getLogger(__name__)
+
+WORKERS   = os.cpu_count() or 1  # Parse worker processes
+CHUNKSIZE = 16                   # Match urls sent to worker at once
+
+# Archive of worker process, opened by initWorker
+_archive = None
+
+def initWorker(path):
+	global _archive
+	_archive = PageArchive(path, readonly=True)
+
+# Parse one match from archived pages, run in worker process
+# Parameters:
+# matchURL : specific match url in hltv, (str)
+#
+# Returns: (matchURL, MatchRecord or None)
+def reparseMatch(matchURL):
+	try:
+		links = ParseMatchPage(_archive.Get(matchURL), matchURL)
+		if links == None:
+			return matchURL, None
+		matchLink, mapLinks = links
+
+		statsContent = _archive.Get(matchLink)
+		if statsContent == None:
+			log.warning("Match stats page not archived: %s", matchLink)
+			return matchURL, None
+		mapPages = []
+		for ml in mapLinks:
+			content = _archive.Get(ml)
+			if content == None:
+				log.warning("Map stats page not archived: %s", ml)
+				return matchURL, None
+			mapPages.append((ml, content))
+
+		return matchURL, ParseMatchPages(matchURL, statsContent, mapPages)
+	except Exception as e:
+		log.warning("Failed to reparse match %s: %s", matchURL, e)
+		return matchURL, None
+
+# Rebuild database from archived pages
+# Parameters:
+# archiveDir : PageArchive directory, (str)
+# dbname     : new sqlite database, must not exist, (str)
+# workers    : parse worker processes, (int)
+# flushSize  : matches inserted in one transaction, (int)
+#
+# Returns: dict of written and failed matches and inserted events, None if database exists
+def Reparse(archiveDir=ARCHIVEDIR, dbname="mcsgo.db", workers=WORKERS, flushSize=FLUSHSIZE):
+	if os.path.exists(dbname):
+		log.error("Database %s already exists, reparse only builds new database", dbname)
+		return None
+
+	starttime = time.monotonic()
+	archive = PageArchive(archiveDir, readonly=True)
+	log.info("Reparsing archive %s: %s", archiveDir, archive.Stats())
+
+	# Newest archived page of every match, in archive order
+	matchURLs = {}
+	for url in archive.URLs("match"):
+		matchURLs[PageID(url)] = url
+	urls = list(matchURLs.values())
+
+	db = DB(dbname, "bulk")
+	db.rateOnInsert = False
+	failed = 0
+	ids = []
+	with ProcessPoolExecutor(max_workers=max(1, workers), initializer=initWorker, initargs=(archiveDir,)) as pool:
+		with db.WriteBatch(flushSize) as batch:
+			for i, (matchURL, match) in enumerate(pool.map(reparseMatch, urls, chunksize=CHUNKSIZE)):
+				if match == None:
+					failed += 1
+					continue
+				batch.Add(match)
+				ids.append(match.matchID)
+				if (i + 1) % 1000 == 0:
+					log.info("Reparsed %s/%s matches", i + 1, len(urls))
+	# Matches of rolled back batches are failed too
+	written = batch.written
+	failed += batch.failed
+
+	# Miner continues from reparsed matches
+	if len(ids) > 0:
+		db.SetCrawlState(NEWESTMATCH, max(ids))
+		db.SetCrawlState(OLDESTMATCH, min(ids))
+
+	events = []
+	for url in archive.URLs("events"):
+		if url.startswith("/events/archive"):
+			events.extend(ParseFinishedEvents(archive.Get(url)))
+	if len(events) > 0:
+		db.InsertEventsToDB(events)
+	archive.Close()
+
+	log.info("Replaying ratings of reparsed maps")
+	Rating.RebuildRatings(db, LoadDataset(db))
+	db.Close()
+
+	log.info("Reparse done in %.1fs, matches written: %s, failed: %s, events: %s",
+		time.monotonic() - starttime, written, failed, len(events))
+	return {"written": written, "failed": failed, "events": len(events)}
@@ -0,0 +1,122 @@
+# Own
+import mHLTVAPI
+from mHLTVAPI import ParseUpcomingMatches, UMATCHID
+import HLTVClient
+
+# Standard
+import hashlib
+import logging
+import threading
+import time
+
+'''
+Polls upcoming matches page of hltv on an interval and reports what changed.
+-Page is requested with If-None-Match/If-Modified-Since of previous response,
+ unchanged page costs a 304 without body
+-Body is hashed, page is parsed only when its content changed
+-Parsed matches are diffed against previous snapshot by MatchID
+Usage:
+poller = UpcomingPoller(60, onChange)
+poller.Run()  # onChange(diff) is called with added, removed and changed matches
+'''
+
+log = logging.getLogger(__name__)
+
+INTERVAL = 60  # Seconds between polls
+URL = "/matches"
+
+# Difference of two upcoming match snapshots
+class UpcomingDiff:
+	def __init__(self, added, removed, changed):
+		self.added = added      # Matches not in previous snapshot, [upcoming]
+		self.removed = removed  # Matches gone from page, started or cancelled, [upcoming]
+		self.changed = changed  # New versions of matches whose time/teams/format changed, [upcoming]
+
+	def __bool__(self):
+		return len(self.added) > 0 or len(self.removed) > 0 or len(self.changed) > 0
+
+	def __str__(self):
+		return "added: {}, removed: {}, changed: {}".format(len(self.added), len(self.removed), len(self.changed))
+
+# Compare two snapshots of upcoming matches
+# Parameters:
+# old, new : {MatchID: upcoming}
+#
+# Returns: UpcomingDiff
+def DiffUpcoming(old, new):
+	added = [m for i, m in new.items() if i not in old]
+	removed = [m for i, m in old.items() if i not in new]
+	changed = [m for i, m in new.items() if i in old and old[i] != m]
+	return UpcomingDiff(added, removed, changed)
+
+class UpcomingPoller:
+	# Parameters:
+	# interval : seconds between polls, (float)
+	# onChange : called with UpcomingDiff when upcoming matches changed, (function)
+	def __init__(self, interval=INTERVAL, onChange=None):
+		self.interval = interval
+		self.onChange = onChange
+		self.matches = {}      # Current snapshot, {MatchID: upcoming}
+		self.etag = None
+		self.lastModified = None
+		self.digest = None     # Hash of last parsed page
+		self.stopEvent = threading.Event()
+
+		# Counters
+		self.polls = 0
+		self.notModified = 0
+		self.sameContent = 0
+		self.parsed = 0
+
+	# Request page once and update snapshot
+	# Returns: UpcomingDiff, empty if page did not change, None if request failed
+	def Poll(self):
+		self.polls += 1
+		headers = dict(mHLTVAPI.HEADERS)
+		if self.etag != None:
+			headers["If-None-Match"] = self.etag
+		if self.lastModified != None:
+			headers["If-Modified-Since"] = self.lastModified
+
+		res = HLTVClient.Get(mHLTVAPI.HLTV_URL + URL, headers=headers)
+		if res == None:
+			log.warning("Failed to poll upcoming matches")
+			return None
+		if res.status_code == 304:
+			self.notModified += 1
+			return UpcomingDiff([], [], [])
+		self.etag = res.headers.get("ETag")
+		self.lastModified = res.headers.get("Last-Modified")
+
+		digest = hashlib.sha1(res.content).digest()
+		if digest == self.digest:
+			self.sameContent += 1
+			return UpcomingDiff([], [], [])
+		self.digest = digest
+
+		self.parsed += 1
+		matches = {m[UMATCHID]: m for m in ParseUpcomingMatches(res.content)}
+		diff = DiffUpcoming(self.matches, matches)
+		self.matches = matches
+		log.debug("Upcoming matches: %s", diff)
+		return diff
+
+	# Poll until stopped
+	# Parameters:
+	# maxPolls : amount of polls, None polls until Stop is called, (int)
+	def Run(self, maxPolls=None):
+		self.stopEvent.clear()
+		n = 0
+		while not self.stopEvent.is_set() and (maxPolls == None or n < maxPolls):
+			start = time.monotonic()
+			diff = self.Poll()
+			if diff and self.onChange != None:
+				self.onChange(diff)
+			n += 1
+			if maxPolls != None and n >= maxPolls:
+				break
+			self.stopEvent.wait(max(0.0, self.interval - (time.monotonic() - start)))
+
+	# Stop Run from other thread
+	def Stop(self):
+		self.stopEvent.set()
@@ -1,33 +1,132 @@
+# Own
+from ParseUtil import SToI
+import Rating
+import Metrics
+
+# pip
+import numpy as np
+
 # Standard
+import logging
 import sqlite3
+import urllib.request
 
 # Local sqlite database for csgo data
 # Database has 4 tables:
 # MatchTable, MapTable, PlayerStatsTable and EventTable
 #tableLabels       = ["MatchData", "MapData", "PlayerStats", "EventData"]
 #matchTableLabels  = ["MatchID", "Time", "EventName", "MapIDs"]
-#mapTableLabels    = ["MapID", "MapName", "Team1", "Team2","T1firsthalf", "T2firsthalf", "T1secondhalf", "T2secondhalf", "T1overtime", "T2overtime", "T1startside"]
+#mapTableLabels    = ["MapID", "MapName", "Team1", "Team2","T1firsthalf", "T2firsthalf", "T1secondhalf", "T2secondhalf", "T1overtime", "T2overtime", "T1startside", "MatchID"]
 #playerTableLabels = ["MapID", "Name", "Kills", "Assists", "Deaths", "ADR", "Headshots", "FlashAssists", "FirstKillDiff", "Rating"]
-#eventTableLabels  = ["EventName", "EventTeams", "EventPrize", "EventType"]
+#eventTableLabels  = ["EventName", "EventTeams", "EventPrize", "EventType", "Teams", "TeamsOpen", "Prize", "TypeID"]
+# PlayerMapStats has same player stats as PlayerStats, but one row per player and map
+#playerMapLabels   = ["MapID", "TeamIdx", "Slot", "PlayerName", "Kills", "Assists", "Deaths", "ADR", "HeadShots", "FlashAssists", "FirstKillDifference", "Rating"]
+# TeamRatings and PlayerRatings have current Elo rating, RatingHistory has ratings before and after every rated map
+#ratingLabels      = ["Name", "Rating", "Maps", "LastMapID"]
+#historyLabels     = ["MapID", "Kind", "Name", "RatingBefore", "RatingAfter"]
+
+log = logging.getLogger(__name__)
+
+FLUSHSIZE  = 100  # Default amount of matches per write batch
+QUERYCHUNK = 500  # Max IDs in one IN (...) query
+
+# CrawlState key set when stored ratings no longer match time ordered replay of history
+RATINGSSTALE = "RatingsStale"
+
+# MapData columns in mapdata order, MatchID is stored separately
+MAPCOLUMNS = "MapID, MapName, Team1, Team2, T1firsthalf, T2firsthalf, T1secondhalf, T2secondhalf, T1overtime, T2overtime, T1startside"
+MAPINSERT  = "INSERT OR IGNORE INTO MapData (" + MAPCOLUMNS + ", MatchID) VALUES (?,?,?,?,?,?,?,?,?,?,?,?)"
+
+# Event types from lowest to highest, TypeID of Events is index in this list
+EVENTTYPES  = ["Online", "Local LAN", "Reg. LAN", "Intl. LAN"]
+EVENTINSERT = "INSERT OR IGNORE INTO Events VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+
+# Pragma profiles of database connections
+# default:   WAL journal, readers are not blocked by miner writing
+# bulk:      building new database with reparse or rebuilds, no syncing and big cache,
+#            rerun build after os crash, never for long-lived mcsgo.db
+# analytics: read only connection with big cache and memory map for analysis queries
+PROFILES = {
+	"default": {
+		"journal_mode": "WAL",
+		"synchronous":  "NORMAL",
+		"temp_store":   "MEMORY",
+		"cache_size":   -64000,       # Negative is KiB, 64MB
+		"mmap_size":    268435456,    # 256MB
+		"busy_timeout": 5000,         # ms
+	},
+	"bulk": {
+		"journal_mode": "WAL",
+		"synchronous":  "OFF",
+		"temp_store":   "MEMORY",
+		"cache_size":   -256000,      # 256MB
+		"mmap_size":    1073741824,   # 1GB
+		"busy_timeout": 10000,
+		"wal_autocheckpoint": 10000,  # Pages
+	},
+	"analytics": {
+		"synchronous":  "NORMAL",
+		"temp_store":   "MEMORY",
+		"cache_size":   -512000,      # 512MB
+		"mmap_size":    4294967296,   # 4GB
+		"busy_timeout": 5000,
+		"query_only":   1,
+	},
+}
 
 class DB:
-	def __init__(self, dbname, debug=False):
-		if debug:
-			print("Beginning CSGO database initialization!")
+	# Parameters:
+	# dbname   : sqlite database file, (str)
+	# profile  : key of PROFILES, (str)
+	# readonly : open read only connection, tables are not created, (bool)
+	def __init__(self, dbname, profile="default", readonly=False):
+		log.debug("Beginning CSGO database initialization!")
+		self.dbname = dbname
 		self.ps_query = ""
+		self.knownMatches = None  # IDSets of stored IDs, loaded with LoadKnownIDs
+		self.knownMaps = None
+		self.rateOnInsert = True  # Update ratings map by map on insert, bulk rebuilds replay them once afterwards
 		try:
-			self.dbconn = sqlite3.connect(dbname)
+			if readonly:
+				uri = "file:{}?mode=ro".format(urllib.request.pathname2url(dbname))
+				self.dbconn = sqlite3.connect(uri, uri=True)
+			else:
+				self.dbconn = sqlite3.connect(dbname)
 			self.dbconn.execute("PRAGMA foreign_keys = 1") # Allow foreign keys
+			self.ApplyProfile(profile)
 		except sqlite3.Error as e:
-			print("Error in", dbname, "initialization! error:", e)
+			log.error("Error in %s initialization! error: %s", dbname, e)
+
+		if not readonly:
+			self.initializeCSGODB()
+		else:
+			self.buildQueries()
+		log.debug("Finished CSGO database initialization!")
+
+	# Set pragmas of connection from profile
+	# Parameters:
+	# profile: key of PROFILES, (str)
+	def ApplyProfile(self, profile):
+		for pragma, value in PROFILES[profile].items():
+			res = self.dbconn.execute("PRAGMA {} = {}".format(pragma, value)).fetchone()
+			log.debug("PRAGMA %s = %s -> %s", pragma, value, res)
+		self.profile = profile
+
+	# Open separate read only connection to same database
+	# Analysis queries on reader do not block miner writing with this DB
+	# Parameters:
+	# profile: key of PROFILES, (str)
+	#
+	# Returns: new read only DB
+	def OpenReader(self, profile="analytics"):
+		return DB(self.dbname, profile, True)
 
-		self.initializeCSGODB()
-		if debug:
-				print("Finished CSGO database initialization!")
+	def Close(self):
+		self.dbconn.close()
 
 	# Initialize csgoDB tables
 	# Returns: True if success, False in case of Error
-	def initializeCSGODB(self, debug=False):
+	def initializeCSGODB(self):
 		try:
 			#conn = sqlite3.connect(csgoDBname)
 			c = self.dbconn.cursor()
@@ -40,8 +139,7 @@ class DB:
 				MapIDs varchar)''')
 				#FOREIGN KEY (EventName) REFERENCES Events (EventName) ON DELETE NO ACTION)''')
 
-			if debug:
-				print("Created MatchData table")
+			log.debug("Created MatchData table")
 
 			# MapData table
 			c.execute('''CREATE TABLE IF NOT EXISTS MapData (
@@ -55,10 +153,10 @@ class DB:
 				T2secondhalf integer,
 				T1overtime integer,
 				T2overtime integer,
-				T1startside varchar)''')
+				T1startside varchar,
+				MatchID integer REFERENCES MatchData (MatchID))''')
 
-			if debug:
-				print("Created MapData table")
+			log.debug("Created MapData table")
 
 			# Create player table query
 			# And then execute it
@@ -77,159 +175,364 @@ class DB:
 				query = query + pname + pkills + passists + pdeaths + padr + phs + pfa + pfkd + prating
 			c.execute(query)
 
-			if debug:
-				print("PlayerStats table query:", query)
-				print("Created PlayerStats table!")
+			log.debug("PlayerStats table query: %s", query)
+			log.debug("Created PlayerStats table!")
 
 			# Event table
+			# Raw strings from archive page and their typed values
 			c.execute('''CREATE TABLE IF NOT EXISTS Events (
 				EventName varchar primary key unique,
 				EventTeams varchar,
 				EventPrize varchar,
-				EventType varchar)''')
-
-			if debug:
-				print("Created Event table")
+				EventType varchar,
+				Teams integer,
+				TeamsOpen integer,
+				Prize integer,
+				TypeID integer)''')
+
+			log.debug("Created Event table")
+
+			# Normalized player stats table, one row per player and map
+			c.execute('''CREATE TABLE IF NOT EXISTS PlayerMapStats (
+				MapID integer,
+				TeamIdx integer,
+				Slot integer,
+				PlayerName varchar,
+				Kills integer,
+				Assists integer,
+				Deaths integer,
+				ADR real,
+				HeadShots integer,
+				FlashAssists integer,
+				FirstKillDifference integer,
+				Rating real,
+				PRIMARY KEY (MapID, TeamIdx, Slot)) WITHOUT ROWID''')
+			c.execute('''CREATE INDEX IF NOT EXISTS PlayerMapStatsName ON PlayerMapStats (PlayerName)''')
+
+			log.debug("Created PlayerMapStats table")
+
+			# Miner checkpoints, e.g. newest mined MatchID and page where backfill continues
+			c.execute('''CREATE TABLE IF NOT EXISTS CrawlState (
+				Key varchar primary key,
+				Value integer)''')
+
+			# Current ratings, updated when new maps are inserted
+			for table in ("TeamRatings", "PlayerRatings"):
+				c.execute('''CREATE TABLE IF NOT EXISTS {} (
+					Name varchar primary key,
+					Rating real,
+					Maps integer,
+					LastMapID integer)'''.format(table))
+			c.execute('''CREATE TABLE IF NOT EXISTS RatingHistory (
+				MapID integer,
+				Kind integer,
+				Name varchar,
+				RatingBefore real,
+				RatingAfter real,
+				PRIMARY KEY (MapID, Kind, Name)) WITHOUT ROWID''')
+
+			log.debug("Created rating tables")
 
 			self.dbconn.commit()
 
-			# Build PlayerStats insert query
-			q = '''INSERT OR IGNORE INTO PlayerStats VALUES (?,'''
-			for i in range(0, (10 * 9)-1):
-				q = q + "?,"
-			q = q + "?)"
-			self.ps_query = q
-			if debug:
-				print("PlayerStats query:", query)
+			self.buildQueries()
+			self.migrate()
 			return True
 
 		except sqlite3.Error as e:
-			print("Error in csgoDB initialization:", e)
+			log.error("Error in csgoDB initialization: %s", e)
 			return False
 
+	# Build PlayerStats insert query
+	def buildQueries(self):
+		q = '''INSERT OR IGNORE INTO PlayerStats VALUES (?,'''
+		for i in range(0, (10 * 9)-1):
+			q = q + "?,"
+		q = q + "?)"
+		self.ps_query = q
+		self.pms_query = '''INSERT OR IGNORE INTO PlayerMapStats VALUES (?,?,?,?,?,?,?,?,?,?,?,?)'''
+		log.debug("PlayerStats query: %s", q)
+
+	# Bring tables of older database up to date
+	# Applied migrations are tracked with PRAGMA user_version
+	def migrate(self):
+		version = self.dbconn.execute("PRAGMA user_version").fetchone()[0]
+		migrations = [self.migratePlayerMapStats, self.migrateMapMatchIDs, self.migrateEventColumns, self.migrateRatings]
+		for i in range(version, len(migrations)):
+			log.debug("Migrating csgoDB to version %s", i + 1)
+			with self.dbconn:
+				migrations[i]()
+				self.dbconn.execute("PRAGMA user_version = {}".format(i + 1))
+
+	# Migration 1: fill PlayerMapStats from wide PlayerStats rows
+	def migratePlayerMapStats(self):
+		# Columns are picked by position, last rating column of PlayerStats is named just 'Rating'
+		cols = [r[1] for r in self.dbconn.execute("PRAGMA table_info(PlayerStats)")]
+		selects = []
+		for i in range(0, 10):
+			pcols = ", ".join(cols[1 + i * 9:1 + (i + 1) * 9])
+			selects.append("SELECT MapID, {}, {}, {} FROM PlayerStats".format(i // 5, i % 5, pcols))
+		self.dbconn.execute("INSERT OR IGNORE INTO PlayerMapStats " + " UNION ALL ".join(selects))
+
+	# Migration 2: add MatchID of MapData and fill it from MapIDs strings of MatchData
+	def migrateMapMatchIDs(self):
+		cols = [r[1] for r in self.dbconn.execute("PRAGMA table_info(MapData)")]
+		if "MatchID" not in cols:
+			self.dbconn.execute("ALTER TABLE MapData ADD COLUMN MatchID integer REFERENCES MatchData (MatchID)")
+		rows = []
+		for matchID, mapIDs in self.dbconn.execute("SELECT MatchID, MapIDs FROM MatchData WHERE MapIDs != ''"):
+			for mapID in MapIDsToList(mapIDs):
+				rows.append((matchID, mapID))
+		self.dbconn.executemany("UPDATE MapData SET MatchID = ? WHERE MapID = ?", rows)
+		self.dbconn.execute("CREATE INDEX IF NOT EXISTS MapDataMatchID ON MapData (MatchID)")
+
+	# Migration 3: add typed event columns, fill them from raw strings and index events of matches
+	def migrateEventColumns(self):
+		cols = [r[1] for r in self.dbconn.execute("PRAGMA table_info(Events)")]
+		for col in ("Teams", "TeamsOpen", "Prize", "TypeID"):
+			if col not in cols:
+				self.dbconn.execute("ALTER TABLE Events ADD COLUMN {} integer".format(col))
+		rows = [EventRow(e)[4:] + (e[0],) for e in self.dbconn.execute("SELECT EventName, EventTeams, EventPrize, EventType FROM Events")]
+		self.dbconn.executemany("UPDATE Events SET Teams = ?, TeamsOpen = ?, Prize = ?, TypeID = ? WHERE EventName = ?", rows)
+		self.dbconn.execute("CREATE INDEX IF NOT EXISTS MatchDataEventName ON MatchData (EventName)")
+
+	# Migration 4: maps stored before ratings existed are not rated and earlier versions rated
+	# maps in insert order, so existing maps are rated again in time order by rebuild
+	def migrateRatings(self):
+		if self.dbconn.execute('''SELECT 1 FROM MapData LIMIT 1''').fetchone() != None:
+			self.markRatingsStale(self.dbconn)
+
 	#####################################################
 	#           Match related stuff in csgoDB           #
 	#####################################################
 
 	# Insert player stats from 1 map to csgoDB
 	# Parameters:
-	# mapID: mapID, (int)
-	# stats: list containing all player stats from 1 map
+	# record: map with player stats, (MapRecord)
+	#
+	# commit: commit transaction after insert, (bool)
 	#
 	# Returns: True if success, False in case of Error
-	def InsertPlayerStatsToDB(self, mapID, stats, debug=False):
+	def InsertPlayerStatsToDB(self, record, commit=True):
 		try:
-			if debug:
-				print("Inserting player stats to csgoDB, mapID:", mapID)
+			log.debug("Inserting player stats to csgoDB, mapID: %s", record.mapID)
 
 			c = self.dbconn.cursor()
-			combined = [mapID] + stats
 			
-			c.execute(self.ps_query, combined)
-			self.dbconn.commit()
+			c.execute(self.ps_query, record.StatsRow())
+			c.executemany(self.pms_query, record.PlayerRows())
+			if commit:
+				self.dbconn.commit()
 
-			if debug:
-				print("Finished inserting player stats")
+			log.debug("Finished inserting player stats")
 			return True
 
 		except sqlite3.Error as e:
-			print("Error in inserting player stats to csgoDB:", e)
+			log.error("Error in inserting player stats to csgoDB: %s", e)
 			return False
 
 	# Insert data from single map to csgoDB
 	# Parameters:
-	# mapData: list containing all map data
+	# record : map with player stats, (MapRecord)
+	# matchID: matchID of match the map belongs to, match must be inserted first, (int)
 	#
 	# Returns: True if success, False in case of Error
-	def InsertMap(self, mapData, debug=False):
+	def InsertMap(self, record, matchID=None):
 		try:
-			if debug:
-				print("Inserting map to csgoDB, mapID:", mapData[0])
+			log.debug("Inserting map to csgoDB, mapID: %s", record.mapID)
 
 			c = self.dbconn.cursor()
 
-			mMapData = mapData[:11]        # MAPSTATOFFSET
-			mPlayerStatData = mapData[11:] # MAPSTATOFFSET
+			log.debug("MapData: %s", record)
+
+			# Insert map data and player stats in same transaction
+			with Metrics.Timer("db_write_seconds", op="InsertMap"):
+				c.execute(MAPINSERT, record.MapRow(matchID))
+				if not self.InsertPlayerStatsToDB(record, False):
+					self.dbconn.rollback()
+					return False
+				row = c.execute('''SELECT MatchTime FROM MatchData WHERE MatchID = ?''', (matchID,)).fetchone()
+				self.rateMaps(c, [(row[0] if row != None else None, record)])
+				self.dbconn.commit()
+			if self.knownMaps != None:
+				self.knownMaps.Add(record.mapID)
+
+			log.debug("Finished inserting map stats")
+			return True
+
+		except sqlite3.Error as e:
+			log.error("Error in inserting map to csgoDB: %s", e)
+			return False
 
-			if debug:
-				print("MapData: ", mMapData)
-				print("PlayerStats:", mPlayerStatData)
+	# Insert match data to csgoDB, maps are inserted separately with InsertMap
+	# Parameters:
+	# match: match to insert, (MatchRecord)
+	#
+	# Returns: True if success, False in case of Error
+	def InsertMatch(self, match):
+		try:
+			log.debug("Inserting match to csgoDB: %s", match.matchID)
 
-			query = "INSERT OR IGNORE INTO MapData VALUES(?,?,?,?,?,?,?,?,?,?,?)"
+			c = self.dbconn.cursor()
 
-			# Insert map data
-			c.execute(query, mMapData)
+			c.execute('''INSERT OR IGNORE INTO MatchData VALUES (?, ?, ? ,?)''', match)
 			self.dbconn.commit()
+			if self.knownMatches != None:
+				self.knownMatches.Add(match.matchID)
 
-			# Insert player stats
-			self.InsertPlayerStatsToDB(mMapData[0], mPlayerStatData, debug)
-
-			if debug:
-				print("Finished inserting map stats")
+			log.debug("Finished inserting match to csgoDB!")
 			return True
 
 		except sqlite3.Error as e:
-			print("Error in inserting map to csgoDB:", e)
+			log.error("Error in inserting match to csgoDB: %s", e)
 			return False
 
-	# Insert match data to csgoDB
+	# Insert multiple matches at once to DB, without their maps
 	# Parameters:
-	# matchData: list of matchdata, [matchData]
-	#
-	# Returns: True if success, False in case of Error
-	def InsertMatch(self, matchData, debug=False):
+	# matches: list of matches, [MatchRecord]
+	def InsertMatches(self, matches):
 		try:
-			if debug:
-				print("Inserting match to csgoDB:", matchData[0])
-
 			c = self.dbconn.cursor()
 
-			if len(matchData) != 4:
-				print("Length of matchdata does not match!")
-				return False
+			c.executemany('''INSERT OR IGNORE INTO MatchData VALUES (?, ?, ?, ?)''', matches)
 
-			c.execute('''INSERT OR IGNORE INTO MatchData VALUES (?, ?, ? ,?)''', matchData)
 			self.dbconn.commit()
+			if self.knownMatches != None:
+				self.knownMatches.AddMany(m.matchID for m in matches)
+		except sqlite3.Error as e:
+			log.error("Error in inserting multiple matches to csgoDB: %s", e)
+			return False
 
-			if debug:
-				print("Finished inserting match to csgoDB!")
+	# Insert matches with all their maps and player stats in one transaction
+	# Parameters:
+	# matches: list of GetMatch results, [MatchRecord]
+	#
+	# Returns: True if success, False in case of Error
+	def InsertMatchesWithMaps(self, matches):
+		try:
+			log.debug("Inserting %s matches with maps to csgoDB", len(matches))
+
+			matchRows = []
+			mapRows = []
+			statRows = []
+			playerRows = []
+			for match in matches:
+				matchRows.append(match)
+				for record in match.maps:
+					mapRows.append(record.MapRow(match.matchID))
+					statRows.append(record.StatsRow())
+					playerRows.extend(record.PlayerRows())
+
+			with Metrics.Timer("db_write_seconds", op="InsertMatchesWithMaps"), self.dbconn:  # Commits once, rolls back on error
+				c = self.dbconn.cursor()
+				c.executemany('''INSERT OR IGNORE INTO MatchData VALUES (?, ?, ?, ?)''', matchRows)
+				c.executemany(MAPINSERT, mapRows)
+				c.executemany(self.ps_query, statRows)
+				c.executemany(self.pms_query, playerRows)
+				self.rateMaps(c, [(match.time, record) for match in matches for record in match.maps])
+			if self.knownMatches != None:
+				self.knownMatches.AddMany(m[0] for m in matchRows)
+				self.knownMaps.AddMany(m[0] for m in mapRows)
+
+			log.debug("Finished inserting %s matches and %s maps", len(matchRows), len(mapRows))
 			return True
 
 		except sqlite3.Error as e:
-			print("Error in inserting match to csgoDB:", e)
+			log.error("Error in inserting matches with maps to csgoDB: %s", e)
 			return False
 
-	# Insert multiple matches at once to DB
-	def InsertMatches(self, matchData, debug=False):
+	# Start batch of writes, matches added to batch are inserted together
+	# Parameters:
+	# flushSize: amount of matches inserted in one transaction, (int)
+	#
+	# Returns: WriteBatch, use as context manager to flush rest on exit
+	def WriteBatch(self, flushSize=FLUSHSIZE):
+		return WriteBatch(self, flushSize)
+
+	# Load IDs of all stored matches and maps to memory
+	# Missing ID checks are answered from memory afterwards, inserts keep sets in sync
+	def LoadKnownIDs(self):
 		try:
 			c = self.dbconn.cursor()
+			self.knownMatches = IDSet(r[0] for r in c.execute('''SELECT MatchID FROM MatchData'''))
+			self.knownMaps = IDSet(r[0] for r in c.execute('''SELECT MapID FROM MapData'''))
 
-			c.executemany('''INSERT OR IGNORE INTO MatchData VALUES (?, ?, ?, ?)''', matchData)
+			log.debug("Loaded %s match IDs and %s map IDs", len(self.knownMatches), len(self.knownMaps))
+			return True
 
-			self.dbconn.commit()
 		except sqlite3.Error as e:
-			print("Error in inserting multiple matches to csgoDB:", e)
+			log.error("Error in loading known IDs: %s", e)
+			self.knownMatches = None
+			self.knownMaps = None
 			return False
 
+	# Find which of given IDs are not stored in table
+	# Parameters:
+	# table: table name, (str)
+	# col  : ID column, (str)
+	# ids  : IDs to check, [(int)]
+	#
+	# Returns: list of missing IDs in same order as given
+	def getMissingIDs(self, table, col, ids):
+		found = set()
+		c = self.dbconn.cursor()
+		for i in range(0, len(ids), QUERYCHUNK):
+			chunk = ids[i:i + QUERYCHUNK]
+			query = "SELECT {} FROM {} WHERE {} IN ({})".format(col, table, col, ",".join("?" * len(chunk)))
+			found.update(r[0] for r in c.execute(query, chunk))
+		return [i for i in ids if i not in found]
+
+	# Find which of given matches are not in database
+	# Parameters:
+	# ids: matchIDs, [(int)]
+	#
+	# Returns: list of missing matchIDs in same order as given, None in case of Error
+	def GetMissingMatchIDs(self, ids):
+		if self.knownMatches != None:
+			return [i for i in ids if i not in self.knownMatches]
+		try:
+			res = self.getMissingIDs("MatchData", "MatchID", list(ids))
+			log.debug("Missing matches: %s", res)
+			return res
+
+		except sqlite3.Error as e:
+			log.error("Error in querying missing matchIDs: %s", e)
+			return None
+
+	# Find which of given maps are not in database
+	# Parameters:
+	# ids: mapIDs, [(int)]
+	#
+	# Returns: list of missing mapIDs in same order as given, None in case of Error
+	def GetMissingMapIDs(self, ids):
+		if self.knownMaps != None:
+			return [i for i in ids if i not in self.knownMaps]
+		try:
+			res = self.getMissingIDs("MapData", "MapID", list(ids))
+			log.debug("Missing maps: %s", res)
+			return res
+
+		except sqlite3.Error as e:
+			log.error("Error in querying missing mapIDs: %s", e)
+			return None
+
 	# Queries map by its ID
 	# Parameters:
 	# mID: mapID, integer
 	#
 	# Returns: mapdata list or None
-	def GetMapByID(self, mID, debug=False):
+	def GetMapByID(self, mID):
 		try:
-			if debug:
-				print("Querying map by ID:", mID)
+			log.debug("Querying map by ID: %s", mID)
 
 			c = self.dbconn.cursor()
-			res = c.execute('''SELECT * FROM MapData WHERE mapID = ?''', (mID,)).fetchone()
+			res = c.execute("SELECT " + MAPCOLUMNS + " FROM MapData WHERE MapID = ?", (mID,)).fetchone()
 
-			if debug:
-				print("Finished querying map, result:", res)
+			log.debug("Finished querying map, result: %s", res)
 			return res
 
 		except sqlite3.Error as e:
-			print("Error in querying map by ID:", mID, " error:", e)
+			log.error("Error in querying map by ID: %s error: %s", mID, e)
 			return None
 
 	# Queries maps by matchID
@@ -237,25 +540,18 @@ class DB:
 	# mID: matchID, (int)
 	#
 	# Returns: list of mapdata lists, [[mapdata]]
-	def GetMapsByMatchID(self, mID, debug=False):
+	def GetMapsByMatchID(self, mID):
 		try:
-			if debug:
-				print("Querying maps by matchID:", mID)
-
-			mmatch = GetMatchByID(mID, debug)
-			mapids = MapIDsToList(mmatch[3])
+			log.debug("Querying maps by matchID: %s", mID)
 
 			c = self.dbconn.cursor()
-			res = []
-			for mid in mapids:
-				res.append(c.execute('''SELECT * FROM MapData WHERE MapID = ?''', (mid,)).fetchone())
+			res = c.execute("SELECT " + MAPCOLUMNS + " FROM MapData WHERE MatchID = ? ORDER BY MapID", (mID,)).fetchall()
 
-			if debug:
-				print("Finished querying maps by matchID, result:", res)
+			log.debug("Finished querying maps by matchID, result: %s", res)
 			return res
 
 		except sqlite3.Error as e:
-			print("Error in querying maps by matchID:", mID, " error:", e)
+			log.error("Error in querying maps by matchID: %s error: %s", mID, e)
 			return None
 
 	# Queries match by its ID
@@ -263,20 +559,18 @@ class DB:
 	# mID: matchID, (int)
 	#
 	# Returns: matchdata list, [matchdata]
-	def GetMatchByID(self, mID, debug=False):
+	def GetMatchByID(self, mID):
 		try:
-			if debug:
-				print("Querying match by ID:", mID)
+			log.debug("Querying match by ID: %s", mID)
 
 			c = self.dbconn.cursor()
 			res = c.execute('''SELECT * FROM MatchData WHERE MatchID = ?''', (mID,)).fetchone()
 
-			if debug:
-				print("Finished querying match, result:", res)
+			log.debug("Finished querying match, result: %s", res)
 			return res
 
 		except sqlite3.Error as e:
-			print("Error in querying match by ID:", mID, " error:", e)
+			log.error("Error in querying match by ID: %s error: %s", mID, e)
 			return None
 
 	# Queries player stats by mapID
@@ -284,47 +578,96 @@ class DB:
 	# mID: mapID, (int)
 	#
 	# Returns: list of player stats
-	def GetPlayerStatsByMapID(self, mID, debug=False):
+	def GetPlayerStatsByMapID(self, mID):
 		try:
-			if debug:
-				print("Querying player stats by mapID:", mID)
+			log.debug("Querying player stats by mapID: %s", mID)
 
 			c = self.dbconn.cursor()
 			res = c.execute('''SELECT * FROM PlayerStats WHERE MapID = ?''', (mID,)).fetchone()
 
-			if debug:
-				print("Finished querying player stats, result:", res)
+			log.debug("Finished querying player stats, result: %s", res)
 			return res
 
 		except sqlite3.Error as e:
-			print("Error in querying player stats by mapID:", mID, "error:", e)
+			log.error("Error in querying player stats by mapID: %s error: %s", mID, e)
 			return None
 
 	# Queries player stats by matchID
 	# Parameters:
-	# mID: mapID, (int)
+	# mID: matchID, (int)
 	#
-	# Returns: list of player stats
-	def GetPlayerStatsByMatchID(self, mID, debug=False):
+	# Returns: list of player stats, one per map
+	def GetPlayerStatsByMatchID(self, mID):
 		try:
-			if debug:
-				print("Querying player stats by matchID", mID)
+			log.debug("Querying player stats by matchID %s", mID)
 
 			c = self.dbconn.cursor()
+			playerstats = c.execute('''SELECT p.* FROM PlayerStats p
+				JOIN MapData m ON m.MapID = p.MapID
+				WHERE m.MatchID = ? ORDER BY p.MapID''', (mID,)).fetchall()
 
-			match = GetMatchByID(mID)
-			mapids = MapIDsToList(match[3])
-			playerstats = []
-			for mid in mapids:
-				playerstats.append(GetPlayerStatsByMapID(mid))
-
-			if debug:
-				print("Finished querying player stats by matchID, result:", )
+			log.debug("Finished querying player stats by matchID, result: %s", playerstats)
 			return playerstats
 
 		except sqlite3.Error as e:
-			print("Error in querying player stats by matchID:", mID, " error:", e)
+			log.error("Error in querying player stats by matchID: %s error: %s", mID, e)
+			return None
+
+
+	# Queries player rows of map from PlayerMapStats
+	# Parameters:
+	# mID: mapID, (int)
+	#
+	# Returns: list of player rows ordered by team and slot
+	def GetPlayerMapStatsByMapID(self, mID):
+		try:
+			c = self.dbconn.cursor()
+			res = c.execute('''SELECT * FROM PlayerMapStats WHERE MapID = ? ORDER BY TeamIdx, Slot''', (mID,)).fetchall()
 
+			log.debug("Finished querying player map stats, result: %s", res)
+			return res
+
+		except sqlite3.Error as e:
+			log.error("Error in querying player map stats by mapID: %s error: %s", mID, e)
+			return None
+
+	# Queries all maps player has played
+	# Parameters:
+	# name: player name, (str)
+	#
+	# Returns: list of player row + map row of MapData, ordered by MapID
+	def GetMapsByPlayer(self, name):
+		try:
+			c = self.dbconn.cursor()
+			res = c.execute('''SELECT p.*, m.* FROM PlayerMapStats p
+				JOIN MapData m ON m.MapID = p.MapID
+				WHERE p.PlayerName = ? ORDER BY p.MapID''', (name,)).fetchall()
+
+			log.debug("Finished querying maps of player %s: %s maps", name, len(res))
+			return res
+
+		except sqlite3.Error as e:
+			log.error("Error in querying maps by player: %s error: %s", name, e)
+			return None
+
+	# Queries career averages of player
+	# Parameters:
+	# name: player name, (str)
+	#
+	# Returns: (maps, kills, assists, deaths, ADR, headshots, flash assists, first kill difference, rating) or None
+	def GetPlayerAverages(self, name):
+		try:
+			c = self.dbconn.cursor()
+			res = c.execute('''SELECT COUNT(*), AVG(Kills), AVG(Assists), AVG(Deaths), AVG(ADR), AVG(HeadShots),
+				AVG(FlashAssists), AVG(FirstKillDifference), AVG(Rating)
+				FROM PlayerMapStats WHERE PlayerName = ?''', (name,)).fetchone()
+
+			log.debug("Finished querying averages of player %s: %s", name, res)
+			return res
+
+		except sqlite3.Error as e:
+			log.error("Error in querying player averages: %s error: %s", name, e)
+			return None
 
 	def GetTesting(self):
 		try:
@@ -333,11 +676,193 @@ class DB:
 			res = c.execute('''SELECT * FROM MatchData''').fetchall()
 			res2 = c.execute('''SELECT * FROM MatchData WHERE EventName = ?''',("StarLadder Major Berlin 2019",)).fetchall()
 
-			print("SELECT * FROM MatchData WHERE EventName = StarLadder Major Berlin 2019", res2)
+			log.info("SELECT * FROM MatchData WHERE EventName = StarLadder Major Berlin 2019 %s", res2)
 
 			return res2
 		except sqlite3.Error as e:
-			print("Error:", e)
+			log.error("Error: %s", e)
+
+	#####################################################
+	#         Crawl state related stuff in csgoDB       #
+	#####################################################
+
+	# Queries miner checkpoint
+	# Parameters:
+	# key: checkpoint name, (str)
+	#
+	# Returns: checkpoint value or None
+	def GetCrawlState(self, key):
+		try:
+			res = self.dbconn.execute('''SELECT Value FROM CrawlState WHERE Key = ?''', (key,)).fetchone()
+			log.debug("Crawl state %s: %s", key, res)
+			return res[0] if res != None else None
+
+		except sqlite3.Error as e:
+			log.error("Error in querying crawl state: %s error: %s", key, e)
+			return None
+
+	# Store miner checkpoint
+	# Parameters:
+	# key:   checkpoint name, (str)
+	# value: checkpoint value, (int)
+	#
+	# Returns: True if success, False in case of Error
+	def SetCrawlState(self, key, value):
+		try:
+			with self.dbconn:
+				self.dbconn.execute('''INSERT OR REPLACE INTO CrawlState VALUES (?, ?)''', (key, value))
+			log.debug("Crawl state %s = %s", key, value)
+			return True
+
+		except sqlite3.Error as e:
+			log.error("Error in storing crawl state: %s error: %s", key, e)
+			return False
+
+	#####################################################
+	#           Rating related stuff in csgoDB          #
+	#####################################################
+
+	# Update ratings with inserted maps in match time order
+	# Parameters:
+	# c    : cursor of open transaction
+	# maps : inserted maps with times of their matches, [(MatchTime (str), MapRecord)]
+	def rateMaps(self, c, maps):
+		if not self.rateOnInsert:
+			self.markRatingsStale(c)
+			return
+		for matchTime, record in sorted(maps, key=lambda m: ratingOrder(m[0], m[1].mapID)):
+			self.updateRatings(c, record, matchTime)
+
+	# Ratings are replayed in time order by Rating.RebuildRatings, until then they are approximate
+	# Parameters:
+	# c : cursor or connection, write is part of its transaction
+	def markRatingsStale(self, c):
+		c.execute('''INSERT OR REPLACE INTO CrawlState VALUES (?, 1)''', (RATINGSSTALE,))
+
+	# Returns: True if stored ratings need Rating.RebuildRatings, (bool)
+	def RatingsStale(self):
+		return self.GetCrawlState(RATINGSSTALE) == 1
+
+	# Update stored team and player ratings with result of inserted map
+	# Maps already in RatingHistory are skipped, so re-inserting a map does not rate it twice.
+	# Map rated before last rated map of either team in ratingOrder is rated too, but marks ratings stale
+	# Parameters:
+	# c         : cursor of open transaction
+	# record    : inserted map, (MapRecord)
+	# matchTime : time of match of map, None if unknown, (str)
+	def updateRatings(self, c, record, matchTime=None):
+		mapID = record.mapID
+		if c.execute('''SELECT 1 FROM RatingHistory WHERE MapID = ? AND Kind = ?''', (mapID, Rating.TEAMRATING)).fetchone() != None:
+			return
+		last = c.execute('''SELECT mt.MatchTime, m.MapID FROM TeamRatings r
+			JOIN MapData m ON m.MapID = r.LastMapID LEFT JOIN MatchData mt ON mt.MatchID = m.MatchID
+			WHERE r.Name IN (?, ?)''', (record.team1, record.team2)).fetchall()
+		order = ratingOrder(matchTime, mapID)
+		if any(ratingOrder(t, i) > order for t, i in last):
+			log.debug("Map %s is older than last rated map of its teams, ratings are stale", mapID)
+			self.markRatingsStale(c)
+		result = float(Rating.MapResult(*record.Rounds()))
+
+		teams = (record.team1, record.team2)
+		r1, r2 = self.getRatings(c, "TeamRatings", teams)
+		n1, n2 = Rating.UpdatePair(r1, r2, result)
+		history = [(mapID, Rating.TEAMRATING, record.team1, r1, n1), (mapID, Rating.TEAMRATING, record.team2, r2, n2)]
+		self.storeRatings(c, "TeamRatings", mapID, teams, [n1, n2])
+
+		# Player names of both teams
+		p1 = [n for n in record.TeamPlayers(0) if n]
+		p2 = [n for n in record.TeamPlayers(1) if n]
+		if len(p1) > 0 and len(p2) > 0:
+			old1 = np.array(self.getRatings(c, "PlayerRatings", p1))
+			old2 = np.array(self.getRatings(c, "PlayerRatings", p2))
+			new1, new2 = Rating.UpdatePlayers(old1, old2, result)
+			for players, old, new in ((p1, old1, new1), (p2, old2, new2)):
+				history.extend((mapID, Rating.PLAYERRATING, n, float(o), float(r)) for n, o, r in zip(players, old, new))
+				self.storeRatings(c, "PlayerRatings", mapID, players, [float(r) for r in new])
+
+		c.executemany('''INSERT OR REPLACE INTO RatingHistory VALUES (?, ?, ?, ?, ?)''', history)
+
+	# Returns: current ratings of names, INITIAL for unrated names, [(float)]
+	def getRatings(self, c, table, names):
+		res = []
+		for name in names:
+			row = c.execute('''SELECT Rating FROM {} WHERE Name = ?'''.format(table), (name,)).fetchone()
+			res.append(row[0] if row != None else Rating.INITIAL)
+		return res
+
+	# Store new ratings of names after map
+	def storeRatings(self, c, table, mapID, names, ratings):
+		c.executemany('''INSERT INTO {} VALUES (?, ?, 1, ?)
+			ON CONFLICT (Name) DO UPDATE SET Rating = excluded.Rating, Maps = Maps + 1, LastMapID = excluded.LastMapID'''.format(table),
+			[(n, r, mapID) for n, r in zip(names, ratings)])
+
+	# Replace all ratings, used by Rating.RebuildRatings after full replay
+	# Parameters:
+	# teamRows    : [(name, rating, maps, lastMapID)]
+	# playerRows  : [(name, rating, maps, lastMapID)]
+	# historyRows : [(mapID, kind, name, ratingBefore, ratingAfter)]
+	#
+	# Returns: True if success, False in case of Error
+	def StoreRatings(self, teamRows, playerRows, historyRows):
+		try:
+			with self.dbconn:
+				c = self.dbconn.cursor()
+				c.execute('''DELETE FROM TeamRatings''')
+				c.execute('''DELETE FROM PlayerRatings''')
+				c.execute('''DELETE FROM RatingHistory''')
+				c.executemany('''INSERT INTO TeamRatings VALUES (?, ?, ?, ?)''', teamRows)
+				c.executemany('''INSERT INTO PlayerRatings VALUES (?, ?, ?, ?)''', playerRows)
+				c.executemany('''INSERT OR REPLACE INTO RatingHistory VALUES (?, ?, ?, ?, ?)''', historyRows)
+				c.execute('''DELETE FROM CrawlState WHERE Key = ?''', (RATINGSSTALE,))
+			log.debug("Stored %s team ratings, %s player ratings and %s history rows", len(teamRows), len(playerRows), len(historyRows))
+			return True
+
+		except sqlite3.Error as e:
+			log.error("Error in storing ratings: %s", e)
+			return False
+
+	# Query current rating of team
+	# Parameters:
+	# name: team name, (str)
+	#
+	# Returns: (Rating, Maps) or None if team is not rated
+	def GetTeamRating(self, name):
+		return self.getRating("TeamRatings", name)
+
+	# Query current rating of player
+	# Returns: (Rating, Maps) or None if player is not rated
+	def GetPlayerRating(self, name):
+		return self.getRating("PlayerRatings", name)
+
+	def getRating(self, table, name):
+		try:
+			res = self.dbconn.execute('''SELECT Rating, Maps FROM {} WHERE Name = ?'''.format(table), (name,)).fetchone()
+			log.debug("Rating of %s: %s", name, res)
+			return res
+
+		except sqlite3.Error as e:
+			log.error("Error in querying rating of %s error: %s", name, e)
+			return None
+
+	# Query current ratings of all teams
+	# Returns: {name: rating} or None in case of Error
+	def GetTeamRatings(self):
+		try:
+			return dict(self.dbconn.execute('''SELECT Name, Rating FROM TeamRatings'''))
+
+		except sqlite3.Error as e:
+			log.error("Error in querying team ratings: %s", e)
+			return None
+
+	# Query team ratings before every rated map
+	# Returns: [(MapID, Name, RatingBefore)] or None in case of Error
+	def GetTeamRatingHistory(self):
+		try:
+			return self.dbconn.execute('''SELECT MapID, Name, RatingBefore FROM RatingHistory WHERE Kind = ?''', (Rating.TEAMRATING,)).fetchall()
+
+		except sqlite3.Error as e:
+			log.error("Error in querying team rating history: %s", e)
+			return None
 
 	#####################################################
 	#           Event related stuff in csgoDB           #
@@ -345,50 +870,48 @@ class DB:
 
 	# Insert 1 event to csgodb
 	# Parameters:
-	# event: (4) length list containing event data
+	# event: (4) length list containing event data, typed columns are filled from it
 	#
 	# Returns: True is success, False in case of Error
-	def InsertEventToDB(self, event, debug=False):
+	def InsertEventToDB(self, event):
 		try:
-			if debug:
-				print("Inserting event:", event[0], "Teams:", event[1], "Prize:", event[2], "Type:", event[3])
+			log.debug("Inserting event: %s Teams: %s Prize: %s Type: %s", event[0], event[1], event[2], event[3])
 
 			c = self.dbconn.cursor()
 
-			c.execute('''INSERT OR IGNORE INTO Events VALUES (?, ?, ?, ?)''', event)
+			c.execute(EVENTINSERT, EventRow(event))
 			self.dbconn.commit()
 
-			if debug:
-				print("Finished inserting event", event[0], "to csgoDB")
+			log.debug("Finished inserting event %s to csgoDB", event[0])
 			return True
 
 		except sqlite3.Error as e:
-			print("Error in inserting single event to csgoDB:", e)
+			log.error("Error in inserting single event to csgoDB: %s", e)
 			return False
 
-	# Insert multiple events to csgoDB
+	# Insert multiple events to csgoDB in one transaction
 	# Parameters:
-	# events: list of (4) length lists containing event data
+	# events: list of (4) length lists containing event data, typed columns are filled from it
 	#
 	# Returns: True if success, False in case of Error
-	def InsertEventsToDB(self, events, debug=False):
+	def InsertEventsToDB(self, events):
 		try:
-			if debug:
-				print("Inserting multiple events to csgoDB")
+			if log.isEnabledFor(logging.DEBUG):
+				log.debug("Inserting multiple events to csgoDB")
 				for e in events:
-					print(e)
+					log.debug("%s", e)
 
 			c = self.dbconn.cursor()
 
-			c.executemany('''INSERT OR IGNORE INTO Events VALUES (?, ?, ?, ?)''', events)
-			self.dbconn.commit()
+			with Metrics.Timer("db_write_seconds", op="InsertEventsToDB"):
+				c.executemany(EVENTINSERT, [EventRow(e) for e in events])
+				self.dbconn.commit()
 
-			if debug:
-				print("Finished inserting {} events to csgoDB".format(len(events)))
+			log.debug("Finished inserting %s events to csgoDB", len(events))
 			return True
 
 		except sqlite3.Error as e:
-			print("Error in inserting event to csgoDB:", e)
+			log.error("Error in inserting event to csgoDB: %s", e)
 			return False
 
 	# Queries event by its name
@@ -396,49 +919,194 @@ class DB:
 	# ename: event name, (str)
 	#
 	# Returns: matching event or None
-	def GetEventByName(self, ename, debug=False):
+	def GetEventByName(self, ename):
 		try:
-			if debug:
-				print("Querying event by name", ename, "from csgoDB")
+			log.debug("Querying event by name %s from csgoDB", ename)
 
 			c = self.dbconn.cursor()
 
 			res = c.execute('''SELECT * FROM Events WHERE EventName = ?''', (ename,)).fetchall()
 
-			if debug:
-				print("Finished querying event", ename, "from csgoDB:", res)
+			log.debug("Finished querying event %s from csgoDB: %s", ename, res)
 			return res
 
 		except sqlite3.Error as e:
-			print("Error in querying event by name:", e)
+			log.error("Error in querying event by name: %s", e)
 			return None
 
 	# Queries all events from csgoDB
 	# Returns: list of all events in database
-	def GetAllEventsFromDB(self, debug=False):
+	def GetAllEventsFromDB(self):
 		try:
-			if debug:
-				print("Querying all events from csgoDB")
+			log.debug("Querying all events from csgoDB")
 
 			c = self.dbconn.cursor()
 
 			res = c.execute('''SELECT * FROM Events''').fetchall()
 
-			if debug:
-				print("Finished querying all events from csgoDB:")
+			if log.isEnabledFor(logging.DEBUG):
+				log.debug("Finished querying all events from csgoDB:")
 				for r in res:
-					print(r)
+					log.debug("%s", r)
+			return res
+
+		except sqlite3.Error as e:
+			log.error("Error in querying all events from DB: %s", e)
+			return None
+
+	# Queries matches of event, uses MatchDataEventName index
+	# Parameters:
+	# ename: event name, (str)
+	#
+	# Returns: list of matchdata rows or None
+	def GetMatchesByEvent(self, ename):
+		try:
+			res = self.dbconn.execute('''SELECT * FROM MatchData WHERE EventName = ? ORDER BY MatchTime''', (ename,)).fetchall()
+			log.debug("Matches of event %s: %s", ename, len(res))
+			return res
+
+		except sqlite3.Error as e:
+			log.error("Error in querying matches of event: %s", e)
+			return None
+
+	# Rate all events at once from typed columns
+	# Returns: {EventName: rating} or None in case of Error
+	def GetEventRatings(self):
+		try:
+			rows = self.dbconn.execute('''SELECT EventName, Teams, TeamsOpen, Prize, TypeID FROM Events''').fetchall()
+			if len(rows) == 0:
+				return {}
+			names, teams, teamsOpen, prize, typeID = zip(*rows)
+			ratings = RateEvents(teams, teamsOpen, prize, typeID)
+			log.debug("Rated %s events", len(names))
+			return dict(zip(names, ratings.tolist()))
+
+		except sqlite3.Error as e:
+			log.error("Error in rating events: %s", e)
+			return None
+
+	# Query event rating of every match, events are looked up by MatchData.EventName
+	# Returns: {MatchID: rating}, matches of unknown events are missing, or None in case of Error
+	def GetMatchEventRatings(self):
+		ratings = self.GetEventRatings()
+		if ratings == None:
+			return None
+		try:
+			res = {}
+			for matchID, ename in self.dbconn.execute('''SELECT MatchID, EventName FROM MatchData'''):
+				if ename in ratings:
+					res[matchID] = ratings[ename]
 			return res
 
 		except sqlite3.Error as e:
-			print("Error in querying all events from DB:", e)
+			log.error("Error in querying event ratings of matches: %s", e)
 			return None
 
 
+# Buffers parsed matches and inserts them with DB.InsertMatchesWithMaps
+# Usage:
+# with db.WriteBatch(100) as batch:
+#     batch.Add(match)
+class WriteBatch:
+	def __init__(self, db, flushSize=FLUSHSIZE):
+		self.db = db
+		self.flushSize = flushSize
+		self.matches = []
+		self.written = 0  # Matches in committed flushes
+		self.failed = 0   # Matches in flushes that were rolled back
+
+	# Add match to batch, flushes when batch is full
+	# Parameters:
+	# match: GetMatch result, (MatchRecord)
+	def Add(self, match):
+		self.matches.append(match)
+		if len(self.matches) >= self.flushSize:
+			self.Flush()
+
+	# Insert buffered matches
+	# Returns: True if success, False in case of Error
+	def Flush(self):
+		if len(self.matches) == 0:
+			return True
+		suc = self.db.InsertMatchesWithMaps(self.matches)
+		if suc:
+			self.written += len(self.matches)
+		else:
+			self.failed += len(self.matches)
+		self.matches = []
+		return suc
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, excType, excValue, tb):
+		self.Flush()
+		return False
+
+# Compact set of non-negative integer IDs
+# HLTV IDs are dense, so bitmap of 2.5 million matchIDs takes ~300KB
+class IDSet:
+	def __init__(self, ids=()):
+		self.bits = bytearray()
+		self.count = 0
+		self.AddMany(ids)
+
+	def Add(self, i):
+		byte = i >> 3
+		if byte >= len(self.bits):
+			self.bits.extend(bytes(max(byte + 1 - len(self.bits), len(self.bits) // 2)))
+		mask = 1 << (i & 7)
+		if not self.bits[byte] & mask:
+			self.bits[byte] |= mask
+			self.count += 1
+
+	def AddMany(self, ids):
+		for i in ids:
+			self.Add(i)
+
+	def __contains__(self, i):
+		byte = i >> 3
+		return 0 <= byte < len(self.bits) and bool(self.bits[byte] & (1 << (i & 7)))
+
+	def __len__(self):
+		return self.count
+
 #####################################################
 #              Some utility functions               #
 #####################################################
 
+# Normalize raw event strings of archive page to Events row
+# Parameters:
+# event: [Tournament name, Number of teams, Prize, Tournament Type], e.g. ["X", "16+", "$200,000", "Intl. LAN"]
+#
+# Returns: (name, teams, prize, type, Teams (int), TeamsOpen (0/1), Prize (int, None if not money), TypeID (int, None if unknown))
+def EventRow(event):
+	name, teams, prize, etype = [v.strip() if isinstance(v, str) else v for v in event[:4]]
+
+	nteams = None
+	teamsOpen = 0
+	if teams:
+		teamsOpen = 1 if teams.endswith("+") else 0
+		digits = teams.rstrip("+").strip()
+		nteams = int(digits) if digits.isdigit() else None
+
+	money = None
+	if prize:
+		digits = prize.replace("$", "").replace(",", "").strip()
+		money = int(digits) if digits.isdigit() else None
+
+	typeID = EVENTTYPES.index(etype) if etype in EVENTTYPES else None
+	return (name, teams, prize, etype, nteams, teamsOpen, money, typeID)
+
+# Order maps are rated in, same as DataLoader loads them for replay
+# Parameters:
+# matchTime : time of match, YYYY-MM-DD HH:MM or None if unknown, (str)
+# mapID     : hltv mapID, (int)
+#
+# Returns: sort key, maps of unknown time last and maps of same time by MapID, (tuple)
+def ratingOrder(matchTime, mapID):
+	return (matchTime == None, matchTime or "", mapID)
+
 # Convert list of mapIDs to string
 # Parameters:
 # mapIDs: list of integers
@@ -468,7 +1136,7 @@ def MapIDsToList(mapIDs):
 # Feature1: amount of teams
 # Feature2: prize
 # Feature3: event type
-def RateEventFromData(eventData, debug=False):
+def RateEventFromData(eventData):
 	featureWeights = [0.4, 0.2, 0.4]
 
 	# Teams 4-32
@@ -484,8 +1152,7 @@ def RateEventFromData(eventData, debug=False):
 	teamRating = featureWeights[0] * (teamAmount / maxTeams)
 	if teamAddition:
 		teamRating = teamRating + 0.2
-	if debug:
-		print("Teams in event:", teamAmount, " addition:", teamAddition, " teamRating:", teamRating)
+	log.debug("Teams in event: %s addition: %s teamRating: %s", teamAmount, teamAddition, teamRating)
 
 	# Prize scale from 0 to 1'500'000
 	# Normalize prize money to [0, 1]
@@ -504,21 +1171,44 @@ def RateEventFromData(eventData, debug=False):
 	else:
 		prizeRating = 0.5  # Other prize
 
-	if debug:
-		print("Prize in event:", prize, " moneyPrize:", moneyPrize, " prizeRating:", prizeRating)
+	log.debug("Prize in event: %s moneyPrize: %s prizeRating: %s", prize, moneyPrize, prizeRating)
 
 	# Feature3
 	# EventTypes from lowest to highest
 	typeRatings = {"Online" : 0.3, "Local LAN" : 0.5, "Reg. LAN" : 0.7, "Intl. LAN" : 0.9}
-	eventType = evenData[3]
+	eventType = eventData[3]
 	eventRating = featureWeights[2] * typeRatings[eventType]
-	if debug:
-		print("Event type:", eventType, " eventRating:", eventRating, " eventRating:", eventRating)
+	log.debug("Event type: %s eventRating: %s eventRating: %s", eventType, eventRating, eventRating)
 
 	# Rate event based on ratings and weights
 	finalRating = teamRating + prizeRating + eventRating
 
-	if debug:
-		print("Event:", eventData[0], "final rating:", finalRating)
+	log.debug("Event: %s final rating: %s", eventData[0], finalRating)
 
-	return finalRating
\ No newline at end of file
+	return finalRating
+
+# Rate many events at once, same rating as RateEventFromData from typed Events columns
+# Parameters:
+# teams     : amount of teams, None if unknown
+# teamsOpen : 1 if amount of teams is 'n+'
+# prize     : money prize, None if prize is not money
+# typeID    : index in EVENTTYPES, None if unknown
+#
+# Returns: ratings, (float array)
+def RateEvents(teams, teamsOpen, prize, typeID):
+	featureWeights = np.array([0.4, 0.2, 0.4])
+	maxTeams = 32.0
+	maxPrize = 1500000.0
+	typeRatings = np.array([0.3, 0.5, 0.7, 0.9])
+
+	teams = np.array(teams, dtype=np.float64)  # None -> nan
+	teamsOpen = np.array(teamsOpen, dtype=np.float64)
+	prize = np.array(prize, dtype=np.float64)
+	typeID = np.array(typeID, dtype=np.float64)
+
+	teamRating = featureWeights[0] * np.nan_to_num(teams) / maxTeams + 0.2 * np.nan_to_num(teamsOpen)
+	prizeRating = np.where(np.isnan(prize), 0.5, featureWeights[1] * np.nan_to_num(prize) / maxPrize)
+	known = ~np.isnan(typeID)
+	eventRating = np.zeros(len(typeID))
+	eventRating[known] = featureWeights[2] * typeRatings[typeID[known].astype(np.int64)]
+	return teamRating + prizeRating + eventRating
@@ -1,98 +1,191 @@
 # Own
 from ParseUtil import *
-from csgoDB import MapIDsToList, MapIDsToStr
+import HLTVClient
+import HLTVCache
+import Metrics
+import PageArchive
+from Records import *
 
 # pip
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 
 # Standard
-import requests
-import time
-import random
+import datetime
+import logging
+import re
 
 '''
 Simple API to mine data from hltv.org
 Important functions:
 1. GetMatchResults(X)   - returns list of match urls from page X of results
-2. GetMatch(matchURL)   - returns matchdata and list of mapdata
-3. GetMapStats(mapURL)  - returns mapdata data structure which is described below
+2. GetMatch(matchURL)   - returns MatchRecord with MapRecords of played maps
+3. GetMapStats(mapURL)  - returns MapRecord, see Records.py
 4. GetFinishedEvents(X) - returns finished events from hltv archive page X
-5. TODO: getUpcomingMatches() - return list of upcoming matchups
+5. GetUpcomingMatches()  - returns list of upcoming matchups
 '''
 
-
-# Form of tuple ([matchdata],[[mapdata]])
-# MatchData contains [MatchID (int), Time (DateTime (str, YYYY-MM-DD HH:MM), Event (str), MapIDs (str)]
-MATCHDATALENGTH = 4
-MATCHID    = 0 # MatchID, same as in hltv
-MATCHTIME  = 1 # Match time, form YYYY-MM-DD HH:MM
-MATCHEVENT = 2 # Event name
-MAPIDS     = 3 # 1-5 MapIDs as string separated by '_'
-
-# First 11 elements in mapdata list are some general data
-# Rest elements are player stats
-MAPDATALENGTH = 101  # Total length of mapdata
-MAPSTATOFFSET = 11   # Amount of map stat items in list
-PLAYERSTATCOUNT = 9  # Amount of stats per player
-
-# Indices in mapdata
-MAPID        = 0  # MapID, same as in hltv
-MAPNAME      = 1  # Map name
-TEAM1NAME    = 2  # Team1 name
-TEAM2NAME    = 3  # Team2 name
-FIRSTHALFT1  = 4  # First half Team1 rounds
-FIRSTHALFT2  = 5  # First half Team2 rounds
-SECONDHALFT1 = 6  # Second half Team1 rounds
-SECONDHALFT2 = 7  # Second half Team2 rounds
-OTROUNDST1   = 8  # Overtime Team1 rounds
-OTROUNDST2   = 9  # Overtime Team2 rounds
-STARTSIDET1  = 10 # Start side of Team1
-
-# Player stat indice offsets in mapdata
-# Idx = MAPSTATOFFSET + PX * PLAYERSTATCOUNT + Offset
-# PX 1-10
-PNAME    = 0 # Team1 player1 name
-PKILLS   = 1 # Team1 player1 kills
-PASSISTS = 2 # Team1 player1 assists
-PDEATHS  = 3 # Team1 player1 deaths
-PADR     = 4 # Team1 player1 AverageDamageperRound
-PHS      = 5 # Team1 player1 HeadShot %
-PFA      = 6 # Team1 player1 FlashAssists
-PFKDIFF  = 7 # Team1 player1 FirstKill difference
-PRATING  = 8 # Team1 player1 Rating
-#PIMPACT  = 9 # Team1 player1 Impact
+log = logging.getLogger(__name__)
+
+# Parsed matches are Records.MatchRecord with list of Records.MapRecord
+# Layout of matchdata and mapdata lists and their index constants are in Records.py
+
+# Upcoming match is list of
+# [MatchID (int), Time (str, YYYY-MM-DD HH:MM UTC), Team1 (str), Team2 (str), Event (str), Format (str, e.g. bo3), URL (str)]
+UPCOMINGDATALENGTH = 7
+UMATCHID = 0 # MatchID, same as in hltv
+UTIME    = 1 # Match start time, form YYYY-MM-DD HH:MM
+UTEAM1   = 2 # Team1 name
+UTEAM2   = 3 # Team2 name
+UEVENT   = 4 # Event name
+UFORMAT  = 5 # Best of, e.g. bo3
+UURL     = 6 # Match url
+
+# Parser backend of BeautifulSoup, lxml is several times faster than html.parser
+try:
+	import lxml
+	HTMLPARSER = "lxml"
+except ImportError:
+	HTMLPARSER = "html.parser"
+
+# Build only the subtrees parsers need instead of whole page
+SUBTREEPARSING = True
+
+# Strainer matching tags which have any of given classes
+# Class attribute is not split yet when strainer is applied, so match it with regex
+def classStrainer(tags, classes):
+	return SoupStrainer(tags, class_=re.compile(r"(^|\s)({})(\s|$)".format("|".join(classes))))
+
+# Subtrees needed from each page kind
+RESULTSSUBTREE    = classStrainer("div", ["result-con"])
+MAPSTATSSUBTREE   = classStrainer(["div", "table"], ["match-info-box-con", "stats-table"])
+MATCHSUBTREE      = classStrainer("div", ["stats-detailed-stats", "team1-gradient", "team2-gradient", "mapholder"])
+MATCHSTATSSUBTREE = classStrainer("div", ["match-info-box"])
+EVENTSSUBTREE     = classStrainer("a", ["small-event"])
+UPCOMINGSUBTREE   = classStrainer("a", ["upcoming-match"])
+
+# Select parser backend
+# Parameters:
+# parser   : "lxml" or "html.parser", (str)
+# subtrees : parse only needed subtrees of pages, (bool)
+def SetParser(parser, subtrees=True):
+	global HTMLPARSER, SUBTREEPARSING
+	HTMLPARSER = parser
+	SUBTREEPARSING = subtrees
+
+# Build soup of page content with selected backend
+# Parameters:
+# content  : raw html, (bytes)
+# strainer : subtrees to parse, (SoupStrainer)
+# parser   : backend overriding HTMLPARSER, (str)
+def makeSoup(content, strainer, parser=None):
+	if not SUBTREEPARSING:
+		strainer = None
+	return BeautifulSoup(content, parser or HTMLPARSER, parse_only=strainer)
+
+# Base url of all requests, can be pointed to local stand-in server
+HLTV_URL = "https://www.hltv.org"
+
+# Headers sent with every request
+HEADERS = {
+	"user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:70.0) Gecko/20100101 Firefox/70.0"
+}
+
+# Change base url of all requests
+# Parameters:
+# url : base url without trailing '/', (str)
+def SetBaseURL(url):
+	global HLTV_URL
+	HLTV_URL = url
 
 # Helper function to request htlv page
+# All requests go through shared pooled session of HLTVClient
+# Pages are served from HLTVCache.cache when it is enabled and page is still fresh
+# Pages are appended to PageArchive.archive when it is enabled, pages served from cache
+# only if they are not archived yet, e.g. cached before archiving was turned on
+# Parameters:
+# url : page url in hltv, (str)
+#
+# Returns: response or None if request failed
 def requestHLTV(url):
-	url = "https://www.hltv.org" + url
-	headers = {
-        "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:70.0) Gecko/20100101 Firefox/70.0"
-	}
-	return requests.get(url, headers=headers)
+	kind = HLTVCache.PageKind(url)
+	cache = HLTVCache.cache
+	entry = None
+	if cache != None:
+		entry = cache.Lookup(url)
+		if entry != None and (cache.offline or entry.IsFresh()):
+			Metrics.Inc("hltv_fetch_total", kind=kind, result="cached")
+			return archiveCached(url, entry.Response())
+		if cache.offline:
+			log.warning("Page not in cache, offline mode: %s", url)
+			Metrics.Inc("hltv_fetch_total", kind=kind, result="failed")
+			return None
+
+	headers = dict(HEADERS)
+	if entry != None:
+		headers.update(entry.ConditionalHeaders())
+
+	with Metrics.Timer("hltv_fetch_seconds", kind=kind):
+		res = HLTVClient.Get(HLTV_URL + url, headers=headers)
+	if res == None:
+		Metrics.Inc("hltv_fetch_total", kind=kind, result="failed")
+	elif res.status_code == 304:
+		Metrics.Inc("hltv_fetch_total", kind=kind, result="notmodified")
+	else:
+		Metrics.Inc("hltv_fetch_total", kind=kind, result="ok")
+		Metrics.Inc("hltv_fetch_bytes_total", len(res.content), kind=kind)
+		if PageArchive.archive != None:
+			PageArchive.archive.Add(url, res.content)
+
+	if cache == None:
+		return res
+	if res == None:
+		return archiveCached(url, entry.Response()) if entry != None else None  # Stale page is better than nothing
+	if res.status_code == 304 and entry != None:
+		cache.Touch(url)
+		return archiveCached(url, entry.Response())
+	cache.Store(url, res)
+	return res
+
+# Archive page served from cache unless archive already has it
+# Returns: res
+def archiveCached(url, res):
+	if PageArchive.archive != None:
+		PageArchive.archive.Add(url, res.content, replace=False)
+	return res
 
 # Returns match URLs from 1 result page
 # Parameters:
 # X : page number, (int)
 #
 # Returns: list of match urls, [(str)]
-def GetMatchResultsPage(X, debug=False):
+def GetMatchResultsPage(X):
 	url = "/results"
 	if X < 0:
 		return []
 	else:
 		url = url + "?offset=" + str(X * 100)
 	#print(url)
-	print("Parsing results page{}: {}".format(X, url))
+	log.info("Parsing results page %s: %s", X, url)
 	req = requestHLTV(url)
+	if req == None:
+		return []
 
-	bs = BeautifulSoup(req.content, "html.parser")
+	with Metrics.Timer("hltv_parse_seconds", function="GetMatchResultsPage"):
+		return ParseMatchResultsPage(req.content)
+
+# Parses match URLs from results page content
+# Parameters:
+# content : raw html of results page, (bytes)
+#
+# Returns: list of match urls, [(str)]
+def ParseMatchResultsPage(content):
+	bs = makeSoup(content, RESULTSSUBTREE)
 
 	urls = []
 
 	for rc in bs("div", "result-con"):
 		for rcc in rc.children:
-			if debug:
-				print("Result link on page {}:{}".format(X, rcc["href"]))
+			log.debug("Result link: %s", rcc["href"])
 			urls.append(rcc["href"])
 	return urls
 
@@ -100,108 +193,196 @@ def GetMatchResultsPage(X, debug=False):
 # Parameters:
 # mapURL : specific map url in hltv, (str)
 #
-# Returns: all map stats, [mapdata]
-def GetMapStats(mapURL, debug=False):
-	print("Parsing map stats page:", mapURL)
+# Returns: all map stats, MapRecord or None
+def GetMapStats(mapURL):
+	log.debug("Parsing map stats page: %s", mapURL)
 
 	req = requestHLTV(mapURL)
+	if req == None:
+		return None
 
-	bs = BeautifulSoup(req.content, "html.parser")
-	mapData = [None] * MAPDATALENGTH
+	with Metrics.Timer("hltv_parse_seconds", function="GetMapStats"):
+		return ParseMapStats(req.content, mapURL)
 
+# Parses map stats page content
+# Parameters:
+# content : raw html of map stats page, (bytes)
+# mapURL  : url the page was requested from, (str)
+#
+# Returns: all map stats, MapRecord or None
+def ParseMapStats(content, mapURL):
+	return ExtractMapStats(makeSoup(content, MAPSTATSSUBTREE), mapURL)
+
+# Player stat columns of stats table, (header class, PlayerLine field offsets, converter)
+# Column positions are resolved from header of each table, rows are then read by index
+STATCOLUMNS = [
+	("st-kills",   (PKILLS, PHS),     CellIntPair), # 'Kills (Headshots)'
+	("st-assists", (PASSISTS, PFA),   CellIntPair), # 'Assists (FlashAssists)'
+	("st-deaths",  (PDEATHS,),        CellInt),
+	("st-adr",     (PADR,),           CellFloat),
+	("st-fkdiff",  (PFKDIFF,),        CellInt),
+	("st-rating",  (PRATING,),        CellFloat),
+]
+
+# Scorebox spans of half scores, T1 first half, T2 first half, T1 second half, T2 second half
+SCOREBOXHALVES = (2, 3, 4, 5)
+OTSCORE = re.compile(r"(\d+)\s*:\s*(\d+)")
+
+# Resolve column positions of stats table from its header
+# Falls back to classes of first row if table has no header
+# Parameters:
+# table : stats table, (Tag)
+#
+# Returns: plan [(column index, PlayerLine field offsets, converter)] and player name column index
+def statsTablePlan(table):
+	cells = []
+	head = table.find("thead")
+	if head != None:
+		cells = head.find("tr").find_all(["th", "td"], recursive=False)
+	if len(cells) == 0:
+		cells = table.find("tbody").find("tr").find_all("td", recursive=False)
+	positions = {}
+	for i, cell in enumerate(cells):
+		for cls in cell.get("class", ()):
+			positions.setdefault(cls, i)
+
+	plan = []
+	for cls, offsets, conv in STATCOLUMNS:
+		idx = positions.get(cls)
+		if idx == None and cls == "st-fkdiff":
+			idx = len(cells) - 2  # First kill difference is second last column
+		if idx == None:
+			raise ValueError("Stats table has no column " + cls)
+		plan.append((idx, offsets, conv))
+	return plan, positions.get("st-player", 0)
+
+# Read round scores and start side from scorebox
+# Parameters:
+# right  : right side of first match info row, (Tag)
+# record : map record to fill, (MapRecord)
+def readScorebox(right, record):
+	spans = right.find_all("span", recursive=False)
+	t1totalscore = CellInt(spans[0])
+	t2totalscore = CellInt(spans[1])
+	record.t1FirstHalf, record.t2FirstHalf, record.t1SecondHalf, record.t2SecondHalf = [CellInt(spans[i]) for i in SCOREBOXHALVES]
+	record.t1Overtime = 0
+	record.t2Overtime = 0
+	if t1totalscore > 16 or t2totalscore > 16:  # If there was more than 16 rounds, read also overtime rounds
+		ot = OTSCORE.search(str(spans[-1].next_sibling or ""))
+		if ot != None:
+			record.t1Overtime = int(ot.group(1))
+			record.t2Overtime = int(ot.group(2))
+	record.t1StartSide = parseStartSide(spans[2]["class"][0])
+	return t1totalscore, t2totalscore
+
+# Extracts map data from parsed map stats page
+# Parameters:
+# bs     : soup of map stats page, (BeautifulSoup)
+# mapURL : specific map url in hltv, (str)
+#
+# Returns: all map stats, MapRecord or None
+def ExtractMapStats(bs, mapURL):
 	# First parse mapID
-	mapData[MAPID] = SToI(mapURL.split("/")[-2])
+	record = MapRecord(SToI(mapURL.split("/")[-2]))
 
 	# Parse teamnames, datetime and mapname
 	minfobox = bs.find("div", "match-info-box-con")
-	mapData[TEAM1NAME] = minfobox.find("div", "team-left").contents[0]["title"].strip("\n")
-	mapData[TEAM2NAME] = minfobox.find("div", "team-right").contents[0]["title"].strip("\n")
-	mapData[MAPNAME]   = minfobox.find("div", "small-text").next_sibling.strip()
+	if minfobox == None:
+		log.warning("Failed to locate map info box! mapURL: %s", mapURL)
+		return None
+	record.team1   = minfobox.find("div", "team-left").contents[0]["title"].strip("\n")
+	record.team2   = minfobox.find("div", "team-right").contents[0]["title"].strip("\n")
+	record.mapName = minfobox.find("div", "small-text").next_sibling.strip()
 	
 	# Debug print
-	if debug:
-		print("mapID: {}\nMap: {}\nTeams: {} - {}".format(
-			mapData[MAPID], mapData[MAPNAME],
-			mapData[TEAM1NAME], mapData[TEAM2NAME]))
+	log.debug("mapID: %s\nMap: %s\nTeams: %s - %s",
+		record.mapID, record.mapName,
+		record.team1, record.team2)
 
 	# Parse round scores and startside
-	scorebox = minfobox.find_all("div", "match-info-row")[0].find("div", "right").contents
-	t1totalscore          = SToI(scorebox[0].text)
-	t2totalscore          = SToI(scorebox[2].text)
-	mapData[FIRSTHALFT1]  = SToI(scorebox[4].text)
-	mapData[FIRSTHALFT2]  = SToI(scorebox[6].text)
-	mapData[SECONDHALFT1] = SToI(scorebox[8].text)
-	mapData[SECONDHALFT2] = SToI(scorebox[10].text)
-	mapData[OTROUNDST1]   = 0
-	mapData[OTROUNDST2]   = 0
-	if t1totalscore > 16 or t2totalscore > 16:  # If there was more than 16 rounds, read also overtime rounds
-		temp = SToIT(scorebox[11], ':')
-		mapData[OTROUNDST1] = temp[0]
-		mapData[OTROUNDST2] = temp[1]
-	mapData[STARTSIDET1]  = parseStartSide(scorebox[4]["class"][0])
+	t1totalscore, t2totalscore = readScorebox(minfobox.find("div", "match-info-row").find("div", "right"), record)
 
 	# Debug print
-	if debug:
-		print("Total: {} - {}\nFirst half: {} ({}) - {} ({})\nSecond half: {} ({}) - {} ({})\nOvertime: {} - {}".format(
+	if log.isEnabledFor(logging.DEBUG):
+		log.debug("Total: %s - %s\nFirst half: %s (%s) - %s (%s)\nSecond half: %s (%s) - %s (%s)\nOvertime: %s - %s",
 			t1totalscore, t2totalscore,
-			mapData[FIRSTHALFT1], mapData[STARTSIDET1],
-			15 - mapData[FIRSTHALFT1], ssNeg(mapData[STARTSIDET1]),
-			mapData[SECONDHALFT1], ssNeg(mapData[STARTSIDET1]),
-			mapData[SECONDHALFT2], mapData[STARTSIDET1],
-			mapData[OTROUNDST1], mapData[OTROUNDST2]))
+			record.t1FirstHalf, record.t1StartSide,
+			record.t2FirstHalf, ssNeg(record.t1StartSide),
+			record.t1SecondHalf, ssNeg(record.t1StartSide),
+			record.t2SecondHalf, record.t1StartSide,
+			record.t1Overtime, record.t2Overtime)
 
-	# Parse all player stats
+	# Parse all player stats, column positions are resolved once per table
 	statstable = bs.find_all("table", "stats-table")
-	playercount = 0
 	for i in range(0, 2):
-		tbl = statstable[i].find("tbody").find_all("tr")
-		
+		plan, nameIdx = statsTablePlan(statstable[i])
+		rows = statstable[i].find("tbody").find_all("tr", recursive=False)
+
 		for j in range(0, 5):
-			player = tbl[j]
-			mIdx = MAPSTATOFFSET + playercount * PLAYERSTATCOUNT
-
-			pkills   = SToIT(player.find("td", "st-kills").text, ' ')  # String 'Kills (Headshots)'
-			passists = SToIT(player.find("td", "st-assists").text, ' ') # String 'Assists (FlashAssists)'
-
-			mapData[mIdx + PNAME]    = player.find("a", href=True).text
-			mapData[mIdx + PKILLS]   = pkills[0]
-			mapData[mIdx + PHS]      = pkills[1]
-			mapData[mIdx + PASSISTS] = passists[0]
-			mapData[mIdx + PFA]      = passists[1]
-			mapData[mIdx + PDEATHS]  = SToI(player.find("td", "st-deaths").text)
-			mapData[mIdx + PADR]     = SToF(player.find("td", "st-adr").text)
-			mapData[mIdx + PFKDIFF]  = SToI(player.contents[-4].text)
-			mapData[mIdx + PRATING]  = SToF(player.find("td", "st-rating").text)
+			tds = rows[j].find_all("td", recursive=False)
+			player = record.Player(i * 5 + j)
+			player[PNAME] = tds[nameIdx].find("a", href=True).text
+			for idx, offsets, conv in plan:
+				value = conv(tds[idx])
+				if len(offsets) == 1:
+					player[offsets[0]] = value
+				else:
+					player[offsets[0]], player[offsets[1]] = value
 
 			# Debug print
-			if debug:
-				print("Player: {}, K {}, HS {}, A {}, FA {}, D {}, ADR {}, FKD {}, RA {}".format(
-					mapData[mIdx + PNAME], mapData[mIdx + PKILLS],
-					mapData[mIdx + PHS], mapData[mIdx + PASSISTS],
-					mapData[mIdx + PFA], mapData[mIdx + PDEATHS],
-					mapData[mIdx + PADR], mapData[mIdx + PFKDIFF],
-					mapData[mIdx + PRATING]))
-			playercount += 1
-	return mapData
+			log.debug("Player: %s", player)
+	return record
 
 # Requests, parses and returns match from hltv
 # Parameters:
 # matchURL : specific match url in hltv, (str)
 #
-# Returns: list of matchdata and list of mapdata lists, ([matchdata], [[mapdata]])
-def GetMatch(matchURL, debug=False):
-	print("Parsing match page:", matchURL)
-
-	# Get matchID from url
-	matchID = SToI(matchURL.split("/")[2])
+# Returns: MatchRecord or None
+def GetMatch(matchURL):
+	log.debug("Parsing match page: %s", matchURL)
 
 	# From first page parse match stats link and mapstat links
 	req = requestHLTV(matchURL)
-	bs = BeautifulSoup(req.content, "html.parser")
+	if req == None:
+		return None
+	with Metrics.Timer("hltv_parse_seconds", function="GetMatch"):
+		links = ParseMatchPage(req.content, matchURL)
+	if links == None:
+		return None
+	matchLink, mapLinks = links
+
+	# Request match stats page
+	mreq = requestHLTV(matchLink)
+	if mreq == None:
+		return None
+	with Metrics.Timer("hltv_parse_seconds", function="GetMatch"):
+		minfo = ParseMatchStatsPage(mreq.content)
+	if minfo == None:
+		log.warning("Failed to locate match info box! matchURL: %s", matchURL)
+		return None
+	mevent, mtime = minfo
+
+	maps = []
+	for ml in mapLinks:
+		record = GetMapStats(ml)
+		if record == None:  # Skip whole match if any of its maps failed
+			return None
+		maps.append(record)
+
+	return BuildMatchData(matchURL, mtime, mevent, maps)
+
+# Parses match stats link and map stats links from match page content
+# Parameters:
+# content  : raw html of match page, (bytes)
+# matchURL : url the page was requested from, (str)
+#
+# Returns: match stats link and list of map stats links, ((str), [(str)]) or None
+def ParseMatchPage(content, matchURL):
+	bs = makeSoup(content, MATCHSUBTREE)
 
 	ml = bs.find("div", "small-padding stats-detailed-stats")
 	if ml == None:
-		print("Failed to locate match data link! matchURL:", matchURL)
+		log.warning("Failed to locate match data link! matchURL: %s", matchURL)
 		return None
 	matchLink = ml.find("a")["href"]
 
@@ -220,62 +401,132 @@ def GetMatch(matchURL, debug=False):
 		link = m.find('a')
 		if link != None:
 			mapLinks.append(link["href"])
-		elif debug:
-			print("Failed to locate maplink!", link)
+		else:
+			log.debug("Failed to locate maplink! %s", link)
 
 	# Debug print
-	if debug:
-		print("Match link:", matchLink)
+	if log.isEnabledFor(logging.DEBUG):
+		log.debug("Match link: %s", matchLink)
 		for i in range(0, len(mapLinks)):
-			print(" Map{} stats link:{}".format(i+1, mapLinks[i]))
+			log.debug(" Map%s stats link:%s", i+1, mapLinks[i])
 
-	# Request match stats page
-	mreq = requestHLTV(matchLink)
-	mbs = BeautifulSoup(mreq.content, "html.parser")
+	return (matchLink, mapLinks)
+
+# Parses event name and match time from match stats page content
+# Parameters:
+# content : raw html of match stats page, (bytes)
+#
+# Returns: event name and match time, ((str), (str)) or None
+def ParseMatchStatsPage(content):
+	mbs = makeSoup(content, MATCHSTATSSUBTREE)
 
 	# Find match info box which contains all data we need
 	mbox = mbs.find("div", "match-info-box")
+	if mbox == None:
+		return None
 
 	# Find event and time
 	mevent = mbox.find("a", "block text-ellipsis").text
 	mtime = mbox.find("div", "small-text").contents[0].text
+	return (mevent, mtime)
 
-	mapDataList = []
-	for ml in mapLinks:
-		time.sleep(0.5*random.random())
-		mapDataList.append(GetMapStats(ml, debug))
+# Parses already fetched match stats page and map stats pages of one match
+# Parameters:
+# matchURL     : specific match url in hltv, (str)
+# statsContent : raw html of match stats page, (bytes)
+# mapPages     : list of (mapURL, raw html) of map stats pages, [((str), (bytes))]
+#
+# Returns: MatchRecord or None
+def ParseMatchPages(matchURL, statsContent, mapPages):
+	minfo = ParseMatchStatsPage(statsContent)
+	if minfo == None:
+		log.warning("Failed to locate match info box! matchURL: %s", matchURL)
+		return None
+	mevent, mtime = minfo
 
-	mapIDlist = []
-	for mdl in mapDataList:
-		mapIDlist.append(mdl[MAPID])
+	maps = []
+	for mapURL, content in mapPages:
+		record = ParseMapStats(content, mapURL)
+		if record == None:
+			return None
+		maps.append(record)
 
-	mapIDstr = MapIDsToStr(mapIDlist)
+	return BuildMatchData(matchURL, mtime, mevent, maps)
 
-	matchData = [None] * 4
-	matchData[MATCHID]    = matchID
-	matchData[MATCHTIME]  = mtime
-	matchData[MATCHEVENT] = mevent
-	matchData[MAPIDS]     = mapIDstr
+# Combines parsed match pages to match record
+# Parameters:
+# matchURL : specific match url in hltv, (str)
+# mtime    : match time, (str)
+# mevent   : event name, (str)
+# maps     : parsed map stats, [MapRecord]
+#
+# Returns: MatchRecord
+def BuildMatchData(matchURL, mtime, mevent, maps):
+	# Get matchID from url
+	match = MatchRecord(SToI(matchURL.split("/")[2]), mtime, mevent, maps)
 
-	if debug:
-		print("Finished parsing match:", matchURL)
-		print("MatchData:", matchData)
+	log.debug("Finished parsing match: %s", matchURL)
+	log.debug("MatchData: %s", match)
 
-	return (matchData, mapDataList)
+	return match
 
-#
+# Requests and parses upcoming matches from hltv
+# Returns: list of upcoming matches, [upcoming] or None if request failed
 def GetUpcomingMatches():
 	url = "/matches"
-	print("Parsing upcoming matches page")
+	log.debug("Parsing upcoming matches page")
+	req = requestHLTV(url)
+	if req == None:
+		return None
+
+	with Metrics.Timer("hltv_parse_seconds", function="GetUpcomingMatches"):
+		return ParseUpcomingMatches(req.content)
+
+# Parses upcoming matches from matches page content
+# Matches whose teams are not decided yet are skipped
+# Parameters:
+# content : raw html of matches page, (bytes)
+#
+# Returns: list of upcoming matches, [upcoming]
+def ParseUpcomingMatches(content):
+	# Match rows are tables inside <a>, lxml closes <a> before block level table
+	bs = makeSoup(content, UPCOMINGSUBTREE, "html.parser")
+
+	matches = []
+
+	for um in bs("a", "upcoming-match"):
+		teams = um.find_all("div", "team")
+		if len(teams) != 2:
+			continue
+		match = [None] * UPCOMINGDATALENGTH
+		match[UURL] = um["href"]
+		match[UMATCHID] = SToI(match[UURL].split("/")[2])
+		match[UTEAM1] = teams[0].text.strip()
+		match[UTEAM2] = teams[1].text.strip()
+
+		# Start time is unix milliseconds, shown time depends on timezone of browser
+		t = um.find("div", "time")
+		if t != None and t.has_attr("data-unix"):
+			start = datetime.datetime.fromtimestamp(SToI(t["data-unix"]) / 1000, datetime.timezone.utc)
+			match[UTIME] = start.strftime("%Y-%m-%d %H:%M")
+
+		e = um.find("span", "event-name")
+		match[UEVENT] = e.text.strip() if e != None else ""
+		f = um.find("div", "map-text")
+		match[UFORMAT] = f.text.strip() if f != None else ""
+
+		log.debug("Upcoming match: %s", match)
+		matches.append(match)
+
+	return matches
 
 # Requests, parses and returns list of finished events from hltv
 # Parameters:
 # X : page number, (int)
 #
 # Returns: [Tournament name, Number of teams, Prize, Tournament Type]
-def GetFinishedEvents(X, debug=False):
-	if debug:
-		print("Mining event data from HLTV archive page", X)
+def GetFinishedEvents(X):
+	log.debug("Mining event data from HLTV archive page %s", X)
 
 	url = "/events/archive"
 	if X < 0:
@@ -284,8 +535,19 @@ def GetFinishedEvents(X, debug=False):
 		url = url + "?offset=" + str(X * 50)
 
 	req = requestHLTV(url)
+	if req == None:
+		return []
 
-	bs = BeautifulSoup(req.content, "html.parser")
+	with Metrics.Timer("hltv_parse_seconds", function="GetFinishedEvents"):
+		return ParseFinishedEvents(req.content)
+
+# Parses finished events from archive page content
+# Parameters:
+# content : raw html of events archive page, (bytes)
+#
+# Returns: [Tournament name, Number of teams, Prize, Tournament Type]
+def ParseFinishedEvents(content):
+	bs = makeSoup(content, EVENTSSUBTREE)
 
 	events = []
 
@@ -299,7 +561,6 @@ def GetFinishedEvents(X, debug=False):
 
 		events.append(event)
 
-		if debug:
-			print("EventName: {}\nTeams: {}\nPrize: {}\nType: {}".format(event[0], event[1], event[2], event[3]))
+		log.debug("EventName: %s\nTeams: %s\nPrize: %s\nType: %s", event[0], event[1], event[2], event[3])
 
 	return events
\ No newline at end of file
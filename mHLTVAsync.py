@@ -0,0 +1,149 @@
+# Own
+import mHLTVAPI
+from mHLTVAPI import *
+import Metrics
+
+# Standard
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+'''
+Asyncio variants of mHLTVAPI functions.
+Requests are run in a shared worker pool, so the pool size is the global
+limit of concurrent requests no matter how many matches are fetched at once.
+Pages are parsed in event loop thread by default, callers with worker pool pass
+own parse coroutine, e.g. MinerPipeline parses in its process pool.
+Important functions:
+1. GetMatchResultsPageAsync(X)     - returns list of match urls from page X of results
+2. GetMatchAsync(matchURL, parse)  - returns MatchRecord, maps fetched concurrently
+3. GetMapStatsAsync(mapURL, parse) - returns MapRecord
+4. GetMatchesAsync(matchURLs)      - returns list of GetMatchAsync results, matches fetched concurrently
+5. GetFinishedEventsAsync(X)       - returns finished events from hltv archive page X
+'''
+
+log = logging.getLogger(__name__)
+
+MAXCONCURRENCY = 8  # Default maximum amount of requests in flight
+
+_executor = ThreadPoolExecutor(max_workers=MAXCONCURRENCY)
+
+# Set global limit of concurrent requests
+# Parameters:
+# limit : maximum amount of requests in flight, (int)
+def SetConcurrencyLimit(limit):
+	global _executor
+	old = _executor
+	_executor = ThreadPoolExecutor(max_workers=max(1, limit))
+	old.shutdown(wait=False)
+
+# Requests hltv page without blocking event loop
+# Parameters:
+# url : page url in hltv, (str)
+#
+# Returns: response of requestHLTV
+async def requestHLTVAsync(url):
+	loop = asyncio.get_running_loop()
+	return await loop.run_in_executor(_executor, mHLTVAPI.requestHLTV, url)
+
+# Async version of GetMatchResultsPage
+# Parameters:
+# X : page number, (int)
+#
+# Returns: list of match urls, [(str)]
+async def GetMatchResultsPageAsync(X):
+	if X < 0:
+		return []
+	url = "/results?offset=" + str(X * 100)
+	log.info("Parsing results page %s: %s", X, url)
+	req = await requestHLTVAsync(url)
+	if req == None:
+		return []
+	with Metrics.Timer("hltv_parse_seconds", function="GetMatchResultsPage"):
+		return ParseMatchResultsPage(req.content)
+
+# Parse page in calling thread, default parse of GetMatchAsync and GetMapStatsAsync
+# Parameters:
+# func : mHLTVAPI parse function, (function)
+# args : arguments of func
+#
+# Returns: result of func
+async def parseInline(func, *args):
+	with Metrics.Timer("hltv_parse_seconds", function=func.__name__):
+		return func(*args)
+
+# Async version of GetMapStats
+# Parameters:
+# mapURL : specific map url in hltv, (str)
+# parse  : coroutine called with (parse function, *args), (function)
+#
+# Returns: all map stats, MapRecord
+async def GetMapStatsAsync(mapURL, parse=parseInline):
+	log.debug("Parsing map stats page: %s", mapURL)
+	req = await requestHLTVAsync(mapURL)
+	if req == None:
+		return None
+	return await parse(ParseMapStats, req.content, mapURL)
+
+# Async version of GetMatch, match stats page and all map stats pages are requested concurrently
+# Parameters:
+# matchURL : specific match url in hltv, (str)
+# parse    : coroutine called with (parse function, *args), (function)
+#
+# Returns: MatchRecord
+async def GetMatchAsync(matchURL, parse=parseInline):
+	log.debug("Parsing match page: %s", matchURL)
+
+	req = await requestHLTVAsync(matchURL)
+	if req == None:
+		return None
+	links = await parse(ParseMatchPage, req.content, matchURL)
+	if links == None:
+		return None
+	matchLink, mapLinks = links
+
+	mreq, *maps = await asyncio.gather(
+		requestHLTVAsync(matchLink),
+		*[GetMapStatsAsync(ml, parse) for ml in mapLinks])
+	if mreq == None or None in maps:  # Skip whole match if any of its pages failed
+		return None
+	minfo = await parse(ParseMatchStatsPage, mreq.content)
+	if minfo == None:
+		log.warning("Failed to locate match info box! matchURL: %s", matchURL)
+		return None
+	mevent, mtime = minfo
+
+	return BuildMatchData(matchURL, mtime, mevent, maps)
+
+# Requests multiple matches concurrently
+# Parameters:
+# matchURLs : list of match urls in hltv, [(str)]
+# parse     : coroutine called with (parse function, *args), (function)
+#
+# Returns: list of GetMatchAsync results in same order as urls, None for failed matches
+async def GetMatchesAsync(matchURLs, parse=parseInline):
+	results = await asyncio.gather(
+		*[GetMatchAsync(u, parse) for u in matchURLs],
+		return_exceptions=True)
+
+	matches = []
+	for u, r in zip(matchURLs, results):
+		if isinstance(r, Exception):
+			log.warning("Failed to parse match %s: %s", u, r)
+			r = None
+		matches.append(r)
+	return matches
+
+# Async version of GetFinishedEvents
+# Parameters:
+# X : page number, (int)
+#
+# Returns: list of events, [[Tournament name, Number of teams, Prize, Tournament Type]], None if request failed
+async def GetFinishedEventsAsync(X):
+	if X < 0:
+		return []
+	req = await requestHLTVAsync("/events/archive?offset=" + str(X * 50))
+	if req == None:
+		return None
+	with Metrics.Timer("hltv_parse_seconds", function="GetFinishedEvents"):
+		return ParseFinishedEvents(req.content)
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Modules of the miner are top level files of repository
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FIXTUREDIR = os.path.join(ROOT, "fixtures")
@@ -0,0 +1,53 @@
+# Own
+from csgoDB import DB
+from Predictor import Predictor
+from Benchmarks import SyntheticMatch, SyntheticMatches
+from Records import MatchRecord
+import Rating
+
+# pip
+import numpy as np
+
+# Standard
+import os
+import random
+import warnings
+
+'''
+Predictor on empty and tiny databases.
+'''
+
+def test_empty_database_predicts_even(tmp_path):
+	db = DB(os.path.join(str(tmp_path), "empty.db"))
+	with warnings.catch_warnings():
+		warnings.simplefilter("error")
+		p = Predictor(db)
+		assert p.Predict("A", "B") == 0.5
+		assert p.Predict("A", "B", "Mirage") == 0.5
+	db.Close()
+
+def test_single_map_gives_finite_predictions(tmp_path):
+	db = DB(os.path.join(str(tmp_path), "single.db"))
+	match = SyntheticMatch(1, 1, random.Random(1))
+	with db.WriteBatch() as batch:
+		batch.Add(MatchRecord(match.matchID, match.time, match.event, match.maps[:1]))
+	t1, t2 = match.maps[0].team1, match.maps[0].team2
+	with warnings.catch_warnings():
+		warnings.simplefilter("error")
+		p = Predictor(db)
+		probs = p.PredictBatch([(t1, t2), (t2, t1), (t1, "unknown", "Mirage")])
+	assert np.all(np.isfinite(probs))
+	assert abs(probs[0] + probs[1] - 1.0) < 1e-9
+	assert np.all(np.isfinite(p.scale)) and np.all(p.scale > 0)
+	db.Close()
+
+def test_stored_ratings_match_replay(tmp_path):
+	db = DB(os.path.join(str(tmp_path), "maps.db"))
+	with db.WriteBatch() as batch:
+		for match in SyntheticMatches(200):
+			batch.Add(match)
+	stored = Predictor(db)
+	replayed = Predictor(db, k=Rating.K)
+	matchups = [("team1", "team2"), ("team3", "team4", "Mirage")]
+	assert np.allclose(stored.PredictBatch(matchups), replayed.PredictBatch(matchups))
+	db.Close()
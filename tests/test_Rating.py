@@ -0,0 +1,44 @@
+# Own
+from csgoDB import DB
+from DataLoader import LoadDataset
+from Benchmarks import SyntheticMatches
+from Records import MatchRecord
+import Rating
+
+# Standard
+import os
+
+'''
+Ratings updated on insert against ratings replayed from whole history.
+'''
+
+# Synthetic matches, every 7th without match time
+def matchesWithUnknownTimes(maps):
+	return [MatchRecord(m.matchID, None if m.matchID % 7 == 0 else m.time, m.event, m.maps) for m in SyntheticMatches(maps)]
+
+def rebuiltRatings(db):
+	Rating.RebuildRatings(db, LoadDataset(db))
+	return db.GetTeamRatings()
+
+def test_insert_ratings_match_replay_with_unknown_times(tmp_path):
+	db = DB(os.path.join(str(tmp_path), "ratings.db"))
+	with db.WriteBatch(10000) as batch:
+		for match in matchesWithUnknownTimes(300):
+			batch.Add(match)
+	assert not db.RatingsStale()
+	inserted = db.GetTeamRatings()
+	rebuilt = rebuiltRatings(db)
+	assert max(abs(inserted[n] - rebuilt[n]) for n in rebuilt) < 1e-9
+	db.Close()
+
+def test_known_time_after_unknown_time_marks_stale(tmp_path):
+	db = DB(os.path.join(str(tmp_path), "ratings.db"))
+	matches = matchesWithUnknownTimes(300)
+	# Unknown times are rated last within batch, so known times of later batches are out of order
+	with db.WriteBatch(10) as batch:
+		for match in matches:
+			batch.Add(match)
+	assert db.RatingsStale()
+	rebuiltRatings(db)
+	assert not db.RatingsStale()
+	db.Close()
@@ -0,0 +1,97 @@
+# Own
+from csgoDB import DB
+from DataLoader import LoadDataset
+import Rating
+
+# Standard
+import os
+import sqlite3
+
+'''
+Migrations of databases made with original csgoDB schema.
+'''
+
+# Player stat columns of original wide PlayerStats table, last rating column is named just Rating
+PLAYERCOLUMNS = ["Name varchar", "Kills integer", "Assists integer", "Deaths integer", "ADR real",
+	"HeadShots integer", "FlashAssists integer", "FirstKillDifference integer", "Rating real"]
+
+# Create database with original schema, one best of two match and one event
+def baselineDB(path):
+	conn = sqlite3.connect(path)
+	conn.execute('''CREATE TABLE MatchData (
+		MatchID integer primary key unique,
+		MatchTime varchar,
+		EventName varchar,
+		MapIDs varchar)''')
+	conn.execute('''CREATE TABLE MapData (
+		MapID integer primary key unique,
+		MapName varchar,
+		Team1 varchar,
+		Team2 varchar,
+		T1firsthalf integer,
+		T2firsthalf integer,
+		T1secondhalf integer,
+		T2secondhalf integer,
+		T1overtime integer,
+		T2overtime integer,
+		T1startside varchar)''')
+	cols = []
+	for i in range(0, 10):
+		for c in PLAYERCOLUMNS:
+			cols.append(c if i == 9 and c.startswith("Rating") else "P{}{}".format(i, c))
+	conn.execute("CREATE TABLE PlayerStats (MapID integer unique, {})".format(", ".join(cols)))
+	conn.execute('''CREATE TABLE Events (
+		EventName varchar primary key unique,
+		EventTeams varchar,
+		EventPrize varchar,
+		EventType varchar)''')
+
+	conn.execute("INSERT INTO MatchData VALUES (100, '2020-01-01 12:00', 'Major', '1_2')")
+	for mapID in (1, 2):
+		conn.execute("INSERT INTO MapData VALUES (?, 'Mirage', 'A', 'B', 9, 6, 7, 4, 0, 0, 'ct')", (mapID,))
+		values = [mapID]
+		for i in range(0, 10):
+			values += ["p{}".format(i), 10 + i, 3, 15, 70.5 + i, 5, 1, i - 5, 1.0 + i / 10]
+		conn.execute("INSERT INTO PlayerStats VALUES ({})".format(",".join("?" * len(values))), values)
+	conn.execute("INSERT INTO Events VALUES ('Major', '16+', '$1,000,000', 'Intl. LAN')")
+	conn.commit()
+	conn.close()
+
+def test_baseline_database_is_migrated(tmp_path):
+	path = os.path.join(str(tmp_path), "baseline.db")
+	baselineDB(path)
+	db = DB(path)
+	conn = db.dbconn
+	assert conn.execute("PRAGMA user_version").fetchone()[0] == 4
+
+	# MatchID of maps is filled from MapIDs of match
+	assert conn.execute("SELECT MapID, MatchID FROM MapData ORDER BY MapID").fetchall() == [(1, 100), (2, 100)]
+
+	# Wide player rows are split to one row per player
+	assert conn.execute("SELECT COUNT(*) FROM PlayerMapStats").fetchone()[0] == 20
+	assert conn.execute('''SELECT PlayerName, Kills, Assists, Deaths, ADR, HeadShots, FlashAssists, FirstKillDifference, Rating
+		FROM PlayerMapStats WHERE MapID = 2 AND TeamIdx = 1 AND Slot = 4''').fetchone() == ("p9", 19, 3, 15, 79.5, 5, 1, 4, 1.9)
+	assert conn.execute('''SELECT DISTINCT TeamIdx FROM PlayerMapStats WHERE PlayerName IN ('p0', 'p4')''').fetchall() == [(0,)]
+
+	# Typed event columns are filled from raw strings
+	assert conn.execute("SELECT Teams, TeamsOpen, Prize, TypeID FROM Events").fetchone() == (16, 1, 1000000, 3)
+
+	# Existing maps were never rated
+	assert db.RatingsStale()
+	db.Close()
+
+def test_reopening_migrated_database_is_noop(tmp_path):
+	path = os.path.join(str(tmp_path), "baseline.db")
+	baselineDB(path)
+	db = DB(path)
+	Rating.RebuildRatings(db, LoadDataset(db))
+	tables = ["MatchData", "MapData", "PlayerMapStats", "Events", "RatingHistory"]
+	before = {t: db.dbconn.execute("SELECT * FROM {} ORDER BY 1".format(t)).fetchall() for t in tables}
+	db.Close()
+
+	db = DB(path)
+	assert db.dbconn.execute("PRAGMA user_version").fetchone()[0] == 4
+	assert {t: db.dbconn.execute("SELECT * FROM {} ORDER BY 1".format(t)).fetchall() for t in tables} == before
+	# Migration 4 would mark rebuilt ratings stale again
+	assert not db.RatingsStale()
+	db.Close()
@@ -0,0 +1,117 @@
+# Own
+from conftest import FIXTUREDIR
+import mHLTVAPI
+import mHLTVAsync
+from FixtureServer import FixturePath, ServeFixtures
+from ParseBenchmark import LoadFixtures
+from MinerPipeline import MinerPipeline
+import RateLimiter
+import HLTVCache
+
+# pip
+import pytest
+
+# Standard
+import asyncio
+import os
+import threading
+import time
+
+'''
+mHLTVAsync against FixtureServer serving committed fixtures.
+'''
+
+@pytest.fixture(scope="module")
+def server():
+	oldURL = mHLTVAPI.HLTV_URL
+	oldCache = HLTVCache.cache
+	HLTVCache.cache = None
+	RateLimiter.limiter.Configure(rate=1000.0, burst=1000, adaptive=False)
+	server = ServeFixtures(FIXTUREDIR)
+	yield server
+	server.shutdown()
+	mHLTVAPI.SetBaseURL(oldURL)
+	HLTVCache.cache = oldCache
+	RateLimiter.limiter.Configure(RateLimiter.TARGETRATE, RateLimiter.BURST, True)
+
+# Wraps requestHLTV to record most requests in flight at once
+class InFlight:
+	def __init__(self, request, delay=0.05):
+		self.request = request
+		self.delay = delay  # Keeps requests open long enough to overlap
+		self.lock = threading.Lock()
+		self.current = 0
+		self.max = 0
+		self.maxMapStats = 0
+		self.mapStats = 0
+
+	def __call__(self, url):
+		mapStats = "/mapstatsid/" in url
+		with self.lock:
+			self.current += 1
+			self.mapStats += mapStats
+			self.max = max(self.max, self.current)
+			self.maxMapStats = max(self.maxMapStats, self.mapStats)
+		try:
+			time.sleep(self.delay)
+			return self.request(url)
+		finally:
+			with self.lock:
+				self.current -= 1
+				self.mapStats -= mapStats
+
+@pytest.fixture
+def inflight(server, monkeypatch):
+	counter = InFlight(mHLTVAPI.requestHLTV)
+	monkeypatch.setattr(mHLTVAPI, "requestHLTV", counter)
+	yield counter
+	mHLTVAsync.SetConcurrencyLimit(mHLTVAsync.MAXCONCURRENCY)
+
+# First best of three match of fixtures
+def bestOfThree():
+	for url, content in LoadFixtures(FIXTUREDIR)["match"]:
+		if len(mHLTVAPI.ParseMatchPage(content, url)[1]) == 3:
+			return url
+
+def test_match_maps_fetched_concurrently(inflight):
+	match = asyncio.run(mHLTVAsync.GetMatchAsync(bestOfThree()))
+	assert match != None
+	assert len(match.maps) == 3
+	assert inflight.maxMapStats == 3
+
+def test_match_requests_capped_by_concurrency_limit(inflight):
+	mHLTVAsync.SetConcurrencyLimit(2)
+	match = asyncio.run(mHLTVAsync.GetMatchAsync(bestOfThree()))
+	assert len(match.maps) == 3
+	assert inflight.max == 2
+
+def test_pipeline_mines_fixtures_under_limit(inflight, tmp_path):
+	mHLTVAsync.SetConcurrencyLimit(3)
+	pipeline = MinerPipeline(os.path.join(str(tmp_path), "miner.db"), parsers=2)
+	try:
+		asyncio.run(pipeline.RunBackfill(1))
+	finally:
+		pipeline.Close()
+	assert pipeline.matchesWritten == len(LoadFixtures(FIXTUREDIR)["match"])
+	assert pipeline.matchesFailed == 0
+	assert inflight.max == 3
+
+def test_results_page(server):
+	urls = asyncio.run(mHLTVAsync.GetMatchResultsPageAsync(0))
+	assert len(urls) == len(LoadFixtures(FIXTUREDIR)["match"])
+	assert all(u.startswith("/matches/") for u in urls)
+	assert asyncio.run(mHLTVAsync.GetMatchResultsPageAsync(-1)) == []
+
+def test_finished_events(server):
+	events = asyncio.run(mHLTVAsync.GetFinishedEventsAsync(0))
+	assert len(events) > 0
+	assert events[0] == ["Event 0", "8", "Other", "Online"]
+
+def test_concurrent_requests_return_fixture_pages(server):
+	urls = asyncio.run(mHLTVAsync.GetMatchResultsPageAsync(0))
+	async def fetchAll():
+		return await asyncio.gather(*[mHLTVAsync.requestHLTVAsync(u) for u in urls])
+	for url, res in zip(urls, asyncio.run(fetchAll())):
+		assert res.status_code == 200
+		with open(FixturePath(FIXTUREDIR, url), "rb") as f:
+			assert res.content == f.read()
@@ -0,0 +1,60 @@
+# Own
+from conftest import FIXTUREDIR
+import mHLTVAPI
+from ParseBenchmark import LoadFixtures, CheckExtractors
+from FixtureServer import WriteSyntheticCorpus
+
+# Standard
+import filecmp
+
+'''
+Parsers over committed synthetic fixtures.
+'''
+
+def test_fixtures_cover_every_parsed_page_kind():
+	pages = LoadFixtures(FIXTUREDIR)
+	for kind in ["results", "match", "matchstats", "mapstats", "events", "upcoming"]:
+		assert len(pages.get(kind, [])) > 0, kind
+
+def test_table_plan_matches_per_row_extraction():
+	assert CheckExtractors(FIXTUREDIR) == []
+
+def test_match_pages_link_to_fixtures():
+	pages = LoadFixtures(FIXTUREDIR)
+	urls = {url for kind in pages for url, _ in pages[kind]}
+	for url, content in pages["match"]:
+		matchLink, mapLinks = mHLTVAPI.ParseMatchPage(content, url)
+		for link in [matchLink] + mapLinks:
+			assert link in urls
+
+def test_map_scores_match_series_score():
+	pages = LoadFixtures(FIXTUREDIR)
+	mapPages = dict(pages["mapstats"])
+	for url, content in pages["match"]:
+		matchLink, mapLinks = mHLTVAPI.ParseMatchPage(content, url)
+		wins = [0, 0]
+		for link in mapLinks:
+			record = mHLTVAPI.ParseMapStats(mapPages[link], link)
+			rounds1 = record[mHLTVAPI.FIRSTHALFT1] + record[mHLTVAPI.SECONDHALFT1]
+			rounds2 = record[mHLTVAPI.FIRSTHALFT2] + record[mHLTVAPI.SECONDHALFT2]
+			if record[mHLTVAPI.OTROUNDST1] + record[mHLTVAPI.OTROUNDST2] > 0:
+				assert rounds1 == rounds2 == 15
+				rounds1 += record[mHLTVAPI.OTROUNDST1]
+				rounds2 += record[mHLTVAPI.OTROUNDST2]
+			assert max(rounds1, rounds2) in (16, 19) and rounds1 != rounds2
+			wins[rounds2 > rounds1] += 1
+		if len(mapLinks) > 1:
+			assert max(wins) == 2 and min(wins) == len(mapLinks) - 2
+
+def test_upcoming_page_skips_undecided_matches():
+	url, content = LoadFixtures(FIXTUREDIR)["upcoming"][0]
+	matches = mHLTVAPI.ParseUpcomingMatches(content)
+	assert len(matches) == content.count(b'class="upcoming-match"') - 1
+	assert all(m[mHLTVAPI.UTIME] != None for m in matches)
+
+def test_committed_fixtures_are_synthetic_corpus(tmp_path):
+	WriteSyntheticCorpus(str(tmp_path))
+	cmp = filecmp.dircmp(FIXTUREDIR, str(tmp_path))
+	def diffs(c):
+		return c.left_only + c.right_only + c.diff_files + [d for sub in c.subdirs.values() for d in diffs(sub)]
+	assert diffs(cmp) == []